@@ -0,0 +1,227 @@
+"""
+첨부 파일 저장소 (Content-Addressed Blob Store)
+
+역할:
+- 텔레그램 첨부 파일을 SHA-256 기준으로 한 번만 저장
+- file_unique_id → blob 매핑으로 재전송/전달된 파일은 다운로드 생략
+- tasks/msg_{id}/ 폴더에는 blob의 하드링크(불가 시 복사본)만 생성
+- 캐시 적중률 통계 제공
+  - 적중/미스는 메모리에 모아 두었다가 그룹 커밋(폴링/웹훅 배치) 끝에 한 번만 기록 (조회마다 index.json을 쓰지 않음)
+- index.json은 잠금 안에서 읽기-수정-쓰기 (리스너와 에이전트가 동시에 저장해도 항목이 사라지지 않음)
+
+저장 구조:
+    attachments/
+    ├── index.json              # file_unique_id → {sha256, size, ext} + 통계
+    └── blobs/ab/abcdef...      # SHA-256 파일명 (앞 2글자로 폴더 분산)
+
+사용법:
+    python attachment_store.py    # 저장소 통계 출력
+"""
+
+import os
+import atexit
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+
+from state_store import JsonStateFile, after_group_commit
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STORE_DIR = os.path.join(_BASE_DIR, "attachments")
+BLOBS_DIR = os.path.join(STORE_DIR, "blobs")
+STORE_INDEX_FILE = os.path.join(STORE_DIR, "index.json")
+
+
+def _empty_index():
+    return {"files": {}, "stats": {"hits": 0, "misses": 0, "bytes_saved": 0}}
+
+
+# 파일이 바뀌지 않았으면 다시 읽지 않음 (다른 프로세스가 저장하면 다음 조회 때 반영)
+_index_file = JsonStateFile(STORE_INDEX_FILE, default_factory=_empty_index)
+
+# 아직 기록하지 않은 적중/미스 통계 (flush_stats()로 index.json에 합침)
+_pending_stats = {"hits": 0, "misses": 0, "bytes_saved": 0}
+_pending_lock = threading.Lock()
+
+
+def load_store_index():
+    """저장소 인덱스 로드 (캐시 - 수정은 update_store_index 사용)"""
+    return _index_file.load()
+
+
+def update_store_index(fn):
+    """
+    저장소 인덱스 수정 (잠금 안에서 최신 내용에 fn(index) 적용 후 저장)
+
+    Returns:
+        fn의 반환값
+    """
+    return _index_file.update(fn)
+
+
+def save_store_index(index):
+    """저장소 인덱스 전체 저장 (임시 파일 작성 후 교체)"""
+    _index_file.replace(index)
+
+
+def blob_path(sha256):
+    """SHA-256 해시에 해당하는 blob 경로"""
+    return os.path.join(BLOBS_DIR, sha256[:2], sha256)
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def lookup(file_unique_id):
+    """
+    file_unique_id로 저장된 blob 조회
+
+    Returns:
+        dict or None: {"sha256", "size", "ext", "path"} (없거나 손상 시 None)
+    """
+    if not file_unique_id:
+        return None
+
+    entry = load_store_index()["files"].get(file_unique_id)
+    if not entry:
+        return None
+
+    path = blob_path(entry["sha256"])
+    # blob이 삭제되었거나 크기가 다르면 (외부 수정) 무효 처리
+    if not os.path.exists(path) or os.path.getsize(path) != entry["size"]:
+        return None
+
+    return {**entry, "path": path}
+
+
+def put(file_unique_id, src_path, ext=""):
+    """
+    다운로드된 파일을 저장소로 이동 (동일 내용 blob이 있으면 원본 삭제)
+
+    Args:
+        file_unique_id: 텔레그램 file_unique_id (없으면 내용 해시로만 저장)
+        src_path: 다운로드된 임시 파일 경로
+        ext: 원본 확장자 (예: ".jpg")
+
+    Returns:
+        str: blob 경로
+    """
+    sha256 = _sha256_of(src_path)
+    size = os.path.getsize(src_path)
+    path = blob_path(sha256)
+
+    if os.path.exists(path):
+        # 다른 file_unique_id로 이미 같은 내용이 저장됨
+        os.remove(src_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+
+    if file_unique_id:
+        def _register(index):
+            index["files"][file_unique_id] = {
+                "sha256": sha256,
+                "size": size,
+                "ext": ext,
+                "stored_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        update_store_index(_register)
+
+    return path
+
+
+def link_into(src_blob, dest_path):
+    """
+    blob을 작업 폴더에 하드링크로 연결 (하드링크 불가 시 복사)
+
+    Returns:
+        str: dest_path
+    """
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+    if os.path.exists(dest_path):
+        os.remove(dest_path)
+
+    try:
+        os.link(src_blob, dest_path)
+    except OSError:
+        # 다른 드라이브/하드링크 미지원 파일시스템
+        shutil.copy2(src_blob, dest_path)
+
+    return dest_path
+
+
+def _add_stats(**counts):
+    """통계를 메모리에 더함 (그룹 커밋 중이면 배치 끝에 한 번만, 아니면 바로 기록)"""
+    with _pending_lock:
+        for key, value in counts.items():
+            _pending_stats[key] += value
+    if not after_group_commit(flush_stats):
+        flush_stats()
+
+
+def flush_stats():
+    """모아 둔 적중/미스 통계를 index.json에 기록 (잠금 안에서 한 번에 합침)"""
+    with _pending_lock:
+        pending = dict(_pending_stats)
+        _pending_stats.update(hits=0, misses=0, bytes_saved=0)
+    if not any(pending.values()):
+        return
+
+    def _record(index):
+        for key, value in pending.items():
+            index["stats"][key] += value
+    update_store_index(_record)
+
+
+# 배치가 끝난 뒤에 기록된 통계(백그라운드 미리 받기 등)도 종료 시 남김
+atexit.register(flush_stats)
+
+
+def record_hit(size):
+    """캐시 적중 기록 (다운로드 생략)"""
+    _add_stats(hits=1, bytes_saved=size or 0)
+
+
+def record_miss():
+    """캐시 미스 기록 (실제 다운로드)"""
+    _add_stats(misses=1)
+
+
+def get_store_stats():
+    """
+    저장소 통계 (아직 기록하지 않은 이 프로세스의 통계 포함)
+
+    Returns:
+        dict: {"hits", "misses", "hit_rate", "bytes_saved", "files"}
+    """
+    index = load_store_index()
+    with _pending_lock:
+        stats = {key: index["stats"][key] + value for key, value in _pending_stats.items()}
+    total = stats["hits"] + stats["misses"]
+
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "hit_rate": stats["hits"] / total if total else 0.0,
+        "bytes_saved": stats["bytes_saved"],
+        "files": len(index["files"])
+    }
+
+
+if __name__ == "__main__":
+    stats = get_store_stats()
+    print("=" * 60)
+    print("첨부 파일 저장소 통계")
+    print("=" * 60)
+    print(f"저장된 파일: {stats['files']}개")
+    print(f"적중: {stats['hits']}회 / 미스: {stats['misses']}회")
+    print(f"적중률: {stats['hit_rate'] * 100:.1f}%")
+    print(f"절약한 다운로드: {stats['bytes_saved'] / 1024 / 1024:.1f} MB")
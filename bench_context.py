@@ -0,0 +1,129 @@
+"""
+24시간 컨텍스트 생성 벤치마크
+
+기존 방식(대기 메시지마다 전체 기록 순회 + strptime)과
+build_24h_contexts()(1회 순회 + 캐시된 타임스탬프 + bisect)를 비교합니다.
+두 방식의 결과가 같은지도 함께 확인합니다.
+
+사용법:
+    python bench_context.py                 # 10,000 / 100,000개 메시지, 대기 20개
+    python bench_context.py 50000 --pending=100
+"""
+
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+
+from telegram_context import build_24h_contexts, parse_epoch
+
+
+def legacy_24h_context(messages, current_message_id, now):
+    """기존 get_24h_context() 구현 (비교 기준 - 기준 시각 now는 고정하여 비교)"""
+    cutoff_time = now - timedelta(hours=24)
+
+    context_lines = ["=== 최근 24시간 대화 내역 ===\n"]
+
+    for msg in messages:
+        if msg.get("type") == "user" and msg["message_id"] == current_message_id:
+            break
+
+        msg_time = datetime.strptime(msg["timestamp"], "%Y-%m-%d %H:%M:%S")
+        if msg_time < cutoff_time:
+            continue
+
+        msg_type = msg.get("type", "user")
+
+        if msg_type == "user":
+            user_name = msg.get("first_name", "사용자")
+            text = msg.get("text", "")
+            files = msg.get("files", [])
+            file_info = f" [첨부: {len(files)}개 파일]" if files else ""
+            location = msg.get("location")
+            location_info = f" [위치: {location['latitude']}, {location['longitude']}]" if location else ""
+            context_lines.append(f"[{msg['timestamp']}] {user_name}: {text}{file_info}{location_info}")
+
+        elif msg_type == "bot":
+            text = msg.get("text", "")
+            text_preview = text[:150] + "..." if len(text) > 150 else text
+            files = msg.get("files", [])
+            file_info = f" [전송: {', '.join(files)}]" if files else ""
+            context_lines.append(f"[{msg['timestamp']}] 🤖 소놀봇: {text_preview}{file_info}")
+
+    if len(context_lines) == 1:
+        return "최근 24시간 이내 대화 내역이 없습니다."
+
+    return "\n".join(context_lines)
+
+
+def make_messages(count, pending_count, span_days=30):
+    """span_days 동안 고르게 분포한 사용자/봇 메시지 생성 (마지막 pending_count개는 미처리)"""
+    start = datetime.now() - timedelta(days=span_days)
+    step = timedelta(days=span_days) / count
+    messages = []
+
+    for i in range(count):
+        timestamp = (start + step * i).strftime("%Y-%m-%d %H:%M:%S")
+        if i % 2 == 0 or i >= count - pending_count:
+            messages.append({
+                "message_id": i,
+                "type": "user",
+                "chat_id": 1,
+                "text": f"요청 {i}",
+                "first_name": "사용자",
+                "files": [{"type": "photo"}] if random.random() < 0.1 else [],
+                "timestamp": timestamp,
+                "processed": i < count - pending_count
+            })
+        else:
+            messages.append({
+                "message_id": f"bot_{i - 1}",
+                "type": "bot",
+                "chat_id": 1,
+                "text": "작업 완료 " * random.randint(1, 40),
+                "files": [],
+                "timestamp": timestamp,
+                "processed": True
+            })
+
+    return messages
+
+
+def run(count, pending_count):
+    messages = make_messages(count, pending_count)
+    pending_ids = [msg["message_id"] for msg in messages if not msg["processed"]]
+    now = datetime.now()
+
+    started = time.perf_counter()
+    legacy = {message_id: legacy_24h_context(messages, message_id, now) for message_id in pending_ids}
+    legacy_seconds = time.perf_counter() - started
+
+    parse_epoch.cache_clear()
+    started = time.perf_counter()
+    indexed = build_24h_contexts(messages, pending_ids, now=now.timestamp())
+    cold_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    build_24h_contexts(messages, pending_ids, now=now.timestamp())
+    warm_seconds = time.perf_counter() - started
+
+    same = "일치" if legacy == indexed else "불일치"
+    print(f"메시지 {count:,}개 / 대기 {len(pending_ids)}개 - 결과 {same}")
+    print(f"  기존 방식        : {legacy_seconds * 1000:9.1f} ms")
+    print(f"  1회 순회 (첫 실행): {cold_seconds * 1000:9.1f} ms  ({legacy_seconds / cold_seconds:.1f}배)")
+    print(f"  1회 순회 (캐시)   : {warm_seconds * 1000:9.1f} ms  ({legacy_seconds / warm_seconds:.1f}배)")
+    return legacy == indexed
+
+
+if __name__ == "__main__":
+    pending_count = 20
+    counts = []
+    for arg in sys.argv[1:]:
+        if arg.startswith("--pending="):
+            pending_count = int(arg.split("=", 1)[1])
+        else:
+            counts.append(int(arg))
+
+    random.seed(0)
+    ok = all([run(count, pending_count) for count in (counts or [10_000, 100_000])])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,84 @@
+"""
+메모리 전문 검색 벤치마크
+
+임시 폴더에 작업 N개를 색인한 뒤 BM25 검색(TaskIndex.search)과
+기존 부분 문자열 검색(search_keyword)의 응답 시간을 비교합니다.
+작업마다 흔한 단어(작업 종류) + 드문 단어(주제)를 섞어 만들고,
+흔한 단어만으로 된 검색어(최악 - 후보가 수만 개)와 주제 검색어를 모두 측정합니다.
+
+사용법:
+    python bench_search.py            # 10,000 / 100,000개 작업
+    python bench_search.py 50000
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from task_index import TaskIndex
+
+_WORDS = ["보고서", "작성", "엑셀", "정리", "이미지", "변환", "요약", "번역", "메일", "일정",
+          "회의록", "PDF", "차트", "데이터", "분석", "스크립트", "배포", "서버", "로그", "백업"]
+
+_SYLLABLES = "가나다라마바사아자차카타파하고노도로모보소오조초코토포호구누두루무부수우주추쿠투푸후"
+
+
+def make_topics(count=5000):
+    """주제 단어 (세 글자 무작위 조합)"""
+    return ["".join(random.choice(_SYLLABLES) for _ in range(3)) for _ in range(count)]
+
+
+def make_tasks(count, topics):
+    start = datetime.now() - timedelta(days=365)
+    tasks = []
+    for i in range(count):
+        words = random.sample(_WORDS, 4)
+        topic = topics[min(int(random.paretovariate(1.2)) - 1, len(topics) - 1)]  # 일부 주제에 몰리는 분포
+        tasks.append({
+            "message_id": i + 1,
+            "timestamp": (start + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M:%S"),
+            "instruction": f"{topic} 관련 {words[0]}을 {words[1]}해서 {words[2]}로 만들어줘",
+            "keywords": [],
+            "result_summary": f"{words[3]} 완료",
+            "result_text": f"{topic} {' '.join(random.sample(_WORDS, 6))} 작업을 완료했습니다.",
+            "files": [],
+            "chat_id": 1,
+            "task_dir": None
+        })
+    return tasks
+
+
+def run(count):
+    with tempfile.TemporaryDirectory() as folder:
+        index = TaskIndex(os.path.join(folder, "index.db"))
+
+        started = time.perf_counter()
+        topics = make_topics()
+        tasks = make_tasks(count, topics)
+        for i in range(0, count, 1000):
+            index.upsert_many(tasks[i:i + 1000])
+        build_seconds = time.perf_counter() - started
+
+        print(f"작업 {count:,}개 - 색인 {build_seconds:.1f}초 (FTS5: {'사용' if index.fts_enabled else '없음'})")
+        queries = ["보고서 작성", "엑셀 차트로 정리해줘", "pdf 변환", "백업",
+                   f"{topics[0]} 보고서", f"{topics[50]} 회의록 요약해줘", topics[500]]
+        for query in queries:
+            started = time.perf_counter()
+            ranked = index.search(query, top_k=10)
+            ranked_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            index.search_keyword(query.split()[0])
+            like_ms = (time.perf_counter() - started) * 1000
+
+            print(f"  {query:<16} BM25 {ranked_ms:7.1f} ms ({len(ranked)}개)  |  부분 문자열 {like_ms:7.1f} ms")
+        index._conn.close()
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    for count in [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]:
+        run(count)
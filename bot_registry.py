@@ -0,0 +1,97 @@
+"""
+봇 레지스트리 (여러 봇 토큰 / 메시지 파티션)
+
+역할:
+- TELEGRAM_BOT_TOKEN(기본 봇)과 TELEGRAM_BOT_TOKENS(팀별 봇)를 하나의 목록으로 관리
+- 봇(파티션)별 파일 경로 결정 - 메시지 로그, 오프셋 체크포인트, 작업 폴더 등
+
+설정 (.env):
+    TELEGRAM_BOT_TOKEN=123:ABC                      # 기본 봇 (기존 경로 그대로 사용)
+    TELEGRAM_BOT_TOKENS=team_a=456:DEF,team_b=789:GHI  # 팀별 봇 (이름=토큰, 쉼표 구분)
+
+파티션 경로:
+    default  → telegram_messages/, telegram_offset.json, tasks/{샤드}/msg_*
+    team_a   → telegram_messages/team_a/, telegram_offset_team_a.json, tasks/team_a/{샤드}/msg_*
+    (작업 폴더 샤딩은 task_layout.py)
+
+환경 변수는 호출 시점에 읽으므로 load_dotenv() 이후 언제든 사용할 수 있습니다.
+"""
+
+import os
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_PARTITION = "default"
+TASKS_DIR = os.path.join(_BASE_DIR, "tasks")
+
+_PLACEHOLDER_TOKENS = ("", "YOUR_BOT_TOKEN", "your_bot_token_here")
+
+
+def load_bots():
+    """
+    설정된 봇 목록
+
+    Returns:
+        list: [{"name": str, "token": str}, ...] (기본 봇이 있으면 맨 앞)
+    """
+    bots = []
+
+    default_token = os.getenv("TELEGRAM_BOT_TOKEN", "")
+    extra = os.getenv("TELEGRAM_BOT_TOKENS", "")
+
+    # 팀별 봇만 설정한 경우가 아니면 기본 봇 포함 (토큰 미설정 상태도 포함 - 설정 안내용)
+    if default_token not in _PLACEHOLDER_TOKENS or not extra.strip():
+        bots.append({"name": DEFAULT_PARTITION, "token": default_token})
+
+    for item in extra.split(","):
+        name, _, token = item.strip().partition("=")
+        name, token = name.strip(), token.strip()
+        if not name or not token:
+            continue
+        if not name.replace("_", "").replace("-", "").isalnum() or name == DEFAULT_PARTITION:
+            print(f"⚠️ TELEGRAM_BOT_TOKENS: 사용할 수 없는 봇 이름 '{name}' (영문/숫자/-/_만 가능)")
+            continue
+        if len(name) == 2 and all(c in "0123456789abcdef" for c in name.lower()):
+            # tasks/ 아래 작업 폴더 샤드(00~ff)와 겹침
+            print(f"⚠️ TELEGRAM_BOT_TOKENS: 사용할 수 없는 봇 이름 '{name}' (16진수 두 글자는 작업 폴더용)")
+            continue
+        bots.append({"name": name, "token": token})
+
+    return bots
+
+
+def partition_names():
+    """설정된 파티션(봇) 이름 목록"""
+    return [bot["name"] for bot in load_bots()]
+
+
+def get_token(partition=DEFAULT_PARTITION):
+    """파티션의 봇 토큰 (없으면 None)"""
+    for bot in load_bots():
+        if bot["name"] == partition:
+            return bot["token"] if bot["token"] not in _PLACEHOLDER_TOKENS else None
+    return None
+
+
+def partition_file(path, partition=DEFAULT_PARTITION):
+    """
+    파티션별 파일 경로 (기본 파티션은 기존 경로 그대로)
+
+    예: telegram_offset.json → telegram_offset_team_a.json
+    """
+    if not partition or partition == DEFAULT_PARTITION:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{partition}{ext}"
+
+
+def partition_dir(path, partition=DEFAULT_PARTITION):
+    """파티션별 하위 폴더 (기본 파티션은 기존 폴더 그대로)"""
+    if not partition or partition == DEFAULT_PARTITION:
+        return path
+    return os.path.join(path, partition)
+
+
+def task_root(partition=DEFAULT_PARTITION):
+    """파티션의 작업 폴더 루트 (tasks/ 또는 tasks/{partition}/)"""
+    return partition_dir(TASKS_DIR, partition)
@@ -0,0 +1,173 @@
+"""
+채팅별 작업자 스케줄러
+
+역할:
+- 대기 메시지를 채팅(봇 + chat_id)별로 나눠 채팅마다 작업자 프로세스를 1개씩 실행
+  → 한 사용자의 긴 작업이 다른 사용자의 요청을 막지 않음
+- 동시에 실행하는 작업자 수는 MYBOT_MAX_WORKERS 이하 (넘는 채팅은 오래된 메시지 순으로 대기)
+- 채팅 안에서는 순서대로(FIFO) 합산 처리
+  - 작업자는 맡은 채팅(MYBOT_WORKER_CHAT)의 메시지만 받아 합산 (check_telegram / combine_tasks)
+  - 작업 대기열의 채팅별 잠금으로 같은 채팅의 다음 작업은 다른 작업자가 가져가지 않음
+  - 작업 중 같은 채팅에 온 메시지는 그 작업자가 진행 중 작업에 합침
+- 작업자마다 작업자 ID(MYBOT_WORKER_ID=chat-봇-chat_id)와 채팅별 폴더(chats/chat_123/worker.log)
+- 작업자 감시: 스케줄러가 작업자 대신 하트비트 스레드를 실행 (소유 프로세스 = 작업자 프로세스)
+  - 작업자 프로세스가 비정상 종료(종료 코드 0이 아님)했는데 작업이 남아 있으면 바로 회수 후 채팅에 알림
+  - 정상 종료 후 남은 작업은 하트비트가 멈춰 짧은 임대(MYBOT_HEARTBEAT_TTL)가 만료될 때 회수
+  - 스케줄러까지 죽으면 짧은 임대가 만료된 뒤 회수
+
+작업자 명령 (MYBOT_WORKER_COMMAND, 필수):
+    작업이 끝날 때까지 실행되는 에이전트(Claude Code 등) 명령 - 작업자 안에서 check_telegram()이
+    맡은 채팅의 메시지만 반환하므로 기존 처리 절차(확인 → 합산 → 잠금 → ... → 완료)를 그대로 사용
+    (process_telegram.py는 작업 정보만 출력하고 끝나므로 작업자 명령으로 쓸 수 없음 - 설정하지 않으면 시작하지 않음)
+
+사용법:
+    python chat_scheduler.py          # 한 번 실행 (작업자를 실행하고 모두 끝날 때까지 대기)
+    python chat_scheduler.py --loop   # 계속 실행 (작업자가 끝나는 대로 다음 채팅 실행)
+
+종료 코드 (한 번 실행):
+    0: 대기 메시지 없음
+    1: 작업자 실행함
+    2: MYBOT_WORKER_COMMAND 미설정
+"""
+
+import os
+import sys
+import time
+import subprocess
+from datetime import datetime
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAX_WORKERS = int(os.getenv("MYBOT_MAX_WORKERS", "3"))  # 동시에 실행하는 채팅 작업자 수
+WORKER_COMMAND = os.getenv("MYBOT_WORKER_COMMAND", "")  # 작업자 명령 (작업이 끝날 때까지 실행되는 에이전트, 필수)
+LOOP_INTERVAL = float(os.getenv("MYBOT_SCHEDULER_INTERVAL", "10"))  # --loop 확인 간격 (초)
+
+SCHEDULER_WORKER_ID = "scheduler"  # 스케줄러 자신의 작업자 ID (작업을 직접 가져가지 않음)
+
+
+def worker_id(bot, chat_id):
+    """채팅 작업자 ID"""
+    return f"chat-{bot}-{chat_id}"
+
+
+def start_worker(bot, chat_id):
+    """
+    채팅 작업자 프로세스 실행
+
+    Returns:
+        subprocess.Popen: 작업자 프로세스 (출력은 chats/chat_123/worker.log)
+    """
+    from task_layout import chat_dir
+
+    env = dict(os.environ, MYBOT_WORKER_ID=worker_id(bot, chat_id), MYBOT_WORKER_CHAT=f"{bot}:{chat_id}",
+               MYBOT_SUPERVISED="1")  # 하트비트는 스케줄러가 대신 실행 → 작업자는 짧은 임대 사용
+
+    with open(os.path.join(chat_dir(chat_id, bot), "worker.log"), "a", encoding="utf-8") as log:
+        log.write(f"===== {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} 작업자 시작 =====\n")
+        log.flush()
+        return subprocess.Popen(WORKER_COMMAND, cwd=_BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                                shell=True)
+
+
+class ChatScheduler:
+    """채팅별 작업자 관리 (채팅당 1개, 전체 max_workers개 이하)"""
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        from job_queue import open_job_queue
+
+        self.max_workers = max(1, max_workers)
+        self.queue = open_job_queue()
+        self.running = {}  # (봇, chat_id) → (Popen, Heartbeat)
+
+    def reap(self):
+        """
+        끝난 작업자 정리
+
+        비정상 종료(종료 코드 0이 아님)면 남은 작업을 바로 회수합니다. 정상 종료면 하트비트만 멈추고
+        남은 작업은 임대가 만료될 때 회수합니다. (작업자가 다른 프로세스에 작업을 넘긴 경우 등)
+        """
+        from telegram_bot import notify_requeued_jobs
+
+        for (bot, chat_id), (proc, heartbeat) in list(self.running.items()):
+            code = proc.poll()
+            if code is None:
+                continue
+            heartbeat.stop()
+            del self.running[(bot, chat_id)]
+            print(f"🏁 작업자 종료: [{bot}] chat {chat_id} (exit {code})")
+            if code == 0:
+                continue
+
+            requeued = self.queue.requeue_worker(heartbeat.worker)
+            if requeued:
+                print(f"♻️ 끝나지 않은 작업 {len(requeued)}개 회수")
+                notify_requeued_jobs(requeued)
+
+    def dispatch(self):
+        """
+        대기 메시지가 있는 채팅에 작업자 배정
+
+        Returns:
+            int: 새로 실행한 작업자 수
+        """
+        from telegram_bot import check_telegram, group_tasks_by_chat
+        from job_queue import Heartbeat, owner_info
+
+        self.reap()
+        if len(self.running) >= self.max_workers:
+            return 0
+
+        # 다른 작업자가 작업 중인 채팅은 check_telegram()이 제외
+        started = 0
+        for bot, chat_id, tasks in group_tasks_by_chat(check_telegram()):
+            if len(self.running) >= self.max_workers:
+                print(f"⏳ 작업자 {self.max_workers}개 실행 중 - 나머지 채팅은 대기")
+                break
+            if (bot, chat_id) in self.running:
+                continue
+            proc = start_worker(bot, chat_id)
+            heartbeat = Heartbeat(self.queue, worker_id(bot, chat_id), owner=owner_info(proc.pid)).start()
+            self.running[(bot, chat_id)] = (proc, heartbeat)
+            print(f"🚀 작업자 시작: [{bot}] chat {chat_id} (메시지 {len(tasks)}개)")
+            started += 1
+        return started
+
+    def wait(self):
+        """모든 작업자가 끝날 때까지 대기"""
+        while self.running:
+            time.sleep(1)
+            self.reap()
+
+
+if __name__ == "__main__":
+    os.chdir(_BASE_DIR)
+    os.environ["MYBOT_WORKER_ID"] = SCHEDULER_WORKER_ID
+
+    if not WORKER_COMMAND:
+        print("❌ MYBOT_WORKER_COMMAND 미설정. 작업이 끝날 때까지 실행되는 에이전트 명령을 .env에 설정하세요.")
+        sys.exit(2)
+
+    scheduler = ChatScheduler()
+
+    if "--loop" in sys.argv[1:]:
+        print(f"🔁 채팅별 작업자 스케줄러 시작 (최대 {scheduler.max_workers}개, {LOOP_INTERVAL:g}초 간격)")
+        try:
+            while True:
+                scheduler.dispatch()
+                # 작업자 종료는 1초마다 확인 (비정상 종료 작업을 바로 회수)
+                deadline = time.time() + LOOP_INTERVAL
+                while time.time() < deadline:
+                    time.sleep(1)
+                    scheduler.reap()
+        except KeyboardInterrupt:
+            # 작업자는 계속 진행 - 하트비트는 멈추지만 작업자 프로세스가 살아 있는 동안은 회수하지 않음
+            print(f"\n⏹️ 스케줄러 종료 (실행 중인 작업자 {len(scheduler.running)}개는 계속 진행)")
+        sys.exit(0)
+
+    if not scheduler.dispatch():
+        sys.exit(0)
+    scheduler.wait()
+    sys.exit(1)
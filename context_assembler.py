@@ -0,0 +1,192 @@
+"""
+토큰 예산 기반 대화 컨텍스트 조립 (combine_tasks용)
+
+역할:
+- 에이전트 프롬프트에 붙는 24시간 대화 내역을 토큰 예산(TELEGRAM_CONTEXT_TOKEN_BUDGET) 이내로 제한
+- 우선순위: 현재 요청(항상 포함, 호출 측에서 예산 차감) → 최근 대화 원문 → 이전 대화 요약 → 생략 표시
+- 같은 봇 응답이 여러 번 있으면 마지막 것만 남기고 횟수 표시
+- 원문에 못 들어간 이전 대화는 1시간 단위로 한 줄 요약
+  - 요약은 context_summaries.json에 캐시 (시간대 + 메시지 수/마지막 ID가 같으면 다시 만들지 않음)
+- 예산 안에 모두 들어가면 기존 24시간 대화 내역과 같은 형식 (반복 응답 정리만 적용)
+
+토큰 수는 토크나이저 없이 추정합니다. (ASCII 4글자 ≈ 1토큰, 한글 등 그 외 1글자 ≈ 1토큰 - 넉넉하게 계산)
+
+사용법:
+    from context_assembler import assemble_context, estimate_tokens
+
+    context = assemble_context(messages, message_id, budget=4000)
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+from bot_registry import DEFAULT_PARTITION, partition_file
+from state_store import atomic_write_json
+from telegram_context import CONTEXT_HEADER, EMPTY_CONTEXT, format_context_line, window_messages
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SUMMARY_CACHE_FILE = os.path.join(_BASE_DIR, "context_summaries.json")
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("TELEGRAM_CONTEXT_TOKEN_BUDGET", "6000"))  # 요청 + 대화 내역 전체
+RECENT_SHARE = 0.6  # 예산 초과 시 최근 대화 원문에 쓰는 비율 (나머지는 이전 대화 요약)
+SUMMARY_CACHE_HOURS = 48  # 이보다 오래된 시간대 요약은 캐시에서 정리
+
+_SUMMARY_REQUESTS = 3  # 요약 한 줄에 보여줄 요청 수
+_SUMMARY_PREVIEW = 40  # 요약에 보여줄 글자 수
+
+
+def estimate_tokens(text):
+    """토큰 수 추정 (ASCII 4글자당 1, 그 외 글자당 1)"""
+    ascii_count = sum(1 for ch in text if ord(ch) < 128)
+    return (ascii_count + 3) // 4 + (len(text) - ascii_count)
+
+
+def _preview(text, limit=_SUMMARY_PREVIEW):
+    text = " ".join((text or "").split())
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def _dedupe_bot_replies(window):
+    """
+    같은 봇 응답(텍스트/전송 파일 동일)은 마지막 것만 남김
+
+    Returns:
+        list: [(msg, 반복 횟수), ...] (저장 순서)
+    """
+    kept = []
+    seen = {}
+    for msg in reversed(window):
+        if msg.get("type") == "bot":
+            key = (" ".join((msg.get("text") or "").split()), tuple(msg.get("files") or []))
+            if key in seen:
+                kept[seen[key]][1] += 1
+                continue
+            seen[key] = len(kept)
+        kept.append([msg, 1])
+    kept.reverse()
+    return [(msg, count) for msg, count in kept]
+
+
+def _format_entry(msg, count):
+    line = format_context_line(msg)
+    return f"{line} (같은 응답 {count}회)" if count > 1 else line
+
+
+def _summarize_hour(hour, msgs):
+    """1시간 구간 요약 한 줄"""
+    requests = [msg for msg in msgs if msg.get("type", "user") == "user"]
+    replies = [msg for msg in msgs if msg.get("type") == "bot"]
+
+    parts = [f"[{hour}시] 요청 {len(requests)}건 / 응답 {len(replies)}건"]
+    if requests:
+        shown = " / ".join(f'"{_preview(msg.get("text")) or "(첨부)"}"' for msg in requests[:_SUMMARY_REQUESTS])
+        more = f" 외 {len(requests) - _SUMMARY_REQUESTS}건" if len(requests) > _SUMMARY_REQUESTS else ""
+        parts.append(f"- {shown}{more}")
+    if replies:
+        parts.append(f'→ 🤖 마지막 응답: "{_preview(replies[-1].get("text"))}"')
+    return " ".join(parts)
+
+
+class SummaryCache:
+    """시간대 요약 캐시 (파티션별 JSON 파일)"""
+
+    def __init__(self, partition=DEFAULT_PARTITION):
+        self.path = partition_file(SUMMARY_CACHE_FILE, partition)
+        self.entries = {}
+        self.dirty = False
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                print(f"⚠️ {os.path.basename(self.path)} 읽기 오류: {e} (다시 생성)")
+
+    def summary(self, hour, msgs):
+        key = f"{hour}|{len(msgs)}|{msgs[-1]['message_id']}"
+        line = self.entries.get(key)
+        if line is None:
+            line = self.entries[key] = _summarize_hour(hour, msgs)
+            self.dirty = True
+        return line
+
+    def save(self):
+        if not self.dirty:
+            return
+        cutoff = datetime.fromtimestamp(time.time() - SUMMARY_CACHE_HOURS * 3600).strftime("%Y-%m-%d %H")
+        self.entries = {key: line for key, line in self.entries.items() if key[:13] >= cutoff}
+        atomic_write_json(self.path, self.entries)
+        self.dirty = False
+
+
+def assemble_context(messages, message_id, budget=None, partition=DEFAULT_PARTITION, now=None):
+    """
+    토큰 예산 안에서 24시간 대화 내역 생성
+
+    Args:
+        messages: 전체 메시지 리스트 (저장 순서)
+        message_id: 현재 요청의 첫 메시지 키 (chat_id, message_id) 또는 ID (이 메시지 이전 대화만 사용)
+        budget: 대화 내역에 쓸 토큰 수 (None이면 CONTEXT_TOKEN_BUDGET)
+        partition: 봇 (요약 캐시 파일 구분)
+        now: 기준 시각 (epoch 초, 기본값 현재 시각)
+
+    Returns:
+        str: 대화 내역 텍스트 (대화가 없으면 EMPTY_CONTEXT)
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    window = window_messages(messages, message_id, now)
+    if not window:
+        return EMPTY_CONTEXT
+
+    entries = _dedupe_bot_replies(window)
+    lines = [_format_entry(msg, count) for msg, count in entries]
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    used = estimate_tokens(CONTEXT_HEADER) + 1
+
+    # 모두 들어가면 그대로
+    if used + sum(costs) <= budget:
+        return "\n".join([CONTEXT_HEADER] + lines)
+
+    # 구분 줄([이전 대화 요약], [최근 대화], 생략 표시) 몫
+    used += estimate_tokens("[이전 대화 요약]\n\n[최근 대화]\n(더 이전 대화 0000개 생략)") + 3
+    if budget <= used:
+        return f"(대화 내역 {len(window)}개 생략 - 토큰 예산 부족)"
+
+    # 1. 최근 대화 원문 (최신부터 RECENT_SHARE만큼)
+    recent_limit = used + (budget - used) * RECENT_SHARE
+    split = len(lines)
+    while split > 0 and used + costs[split - 1] <= recent_limit:
+        split -= 1
+        used += costs[split]
+
+    # 2. 이전 대화는 1시간 단위 요약 (최신 시간대부터 남은 예산만큼)
+    hours = {}
+    for msg, _ in entries[:split]:
+        hours.setdefault(msg["timestamp"][:13], []).append(msg)
+
+    cache = SummaryCache(partition)
+    summaries = []
+    omitted = 0
+    for hour in sorted(hours, reverse=True):
+        line = cache.summary(hour, hours[hour])
+        cost = estimate_tokens(line) + 1
+        if omitted or used + cost > budget:
+            omitted += len(hours[hour])
+            continue
+        summaries.append(line)
+        used += cost
+    cache.save()
+    summaries.reverse()
+
+    parts = [CONTEXT_HEADER]
+    if omitted:
+        parts.append(f"(더 이전 대화 {omitted}개 생략)")
+    if summaries:
+        parts.append("[이전 대화 요약]")
+        parts.extend(summaries)
+        parts.append("")
+        parts.append("[최근 대화]")
+    parts.extend(lines[split:])
+    return "\n".join(parts)
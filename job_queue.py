@@ -0,0 +1,653 @@
+"""
+작업 대기열 (SQLite 영속 작업 큐)
+
+역할:
+- working.json(한 번에 작업 1개) 대신 메시지별 작업(job)을 SQLite(WAL)에 저장
+- 상태: queued(대기) → leased(작업자가 가져감) → running(작업 중) → done(완료) / failed(실패)
+- 작업 가져오기는 한 트랜잭션(BEGIN IMMEDIATE)에서 "queued 확인 + leased로 변경"
+  → 작업자 여러 개가 동시에 가져가도 같은 메시지를 두 번 처리하지 않음
+- 채팅별 잠금: 한 채팅의 작업은 한 작업자만 진행 (다른 작업자는 그 채팅의 다음 작업을 가져가지 않음)
+  → 채팅 안에서는 순서대로(FIFO), 채팅끼리는 병렬로 처리 (chat_scheduler.py)
+- 임대(lease)에는 만료 시각이 있고 작업자가 하트비트로 연장
+  만료된 임대는 다시 queued (재시도 횟수 증가, MAX_ATTEMPTS 초과 시 failed)
+- 하트비트 스레드(Heartbeat): HEARTBEAT_INTERVAL마다 임대를 HEARTBEAT_TTL만큼 연장하고
+  소유 프로세스(PID/호스트/프로세스 시작 시각)를 기록
+  → 임대가 만료되지 않았으면(하트비트/경과 보고로 연장 중) 소유 프로세스가 종료되었어도 진행 중으로 판단
+  → 만료 후 같은 컴퓨터의 소유 프로세스가 살아 있으면 OWNER_ALIVE_GRACE까지 더 기다림 (job_stopped)
+    (PID 재사용은 시작 시각으로 구분)
+  → 하트비트 스레드가 없는 작업자(에이전트가 단계마다 python을 따로 실행)는 기존처럼 긴 임대 + 경과 보고
+- 완료/실패 작업은 JOB_KEEP_DAYS 후 정리
+- 작업은 메시지 키 (봇, chat_id, message_id)로 구분 (Telegram message_id는 채팅 안에서만 고유)
+
+작업자 ID:
+    MYBOT_WORKER_ID 환경 변수 (기본 "default") - 작업자(에이전트 세션)마다 다르게 설정하면 병렬 처리
+    MYBOT_WORKER_CHAT 환경 변수 ("봇:chat_id") - 작업자가 맡은 채팅 (chat_scheduler.py가 설정)
+
+저장 구조:
+    jobs.db   # jobs(id, bot, message_id, chat_id, state, worker, summary, attempts, 시각들, error)
+              # UNIQUE (bot, chat_id, message_id)
+
+사용법:
+    python job_queue.py                      # 상태별 작업 수 / 진행 중 작업
+    python job_queue.py requeue              # 만료된 임대 즉시 회수
+    python job_queue.py exited [--worker=ID] # 작업자 프로세스 종료 후 남은 작업 회수 (mybot_autoexecutor.bat)
+"""
+
+import os
+import sys
+import time
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from bot_registry import DEFAULT_PARTITION
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+JOBS_DB_FILE = os.path.join(_BASE_DIR, "jobs.db")
+DEFAULT_WORKER = "default"
+MAX_ATTEMPTS = 3  # 임대 만료(중단) 후 재시도 횟수 - 초과하면 failed
+JOB_KEEP_DAYS = 30  # 완료/실패 작업 보관 기간
+HEARTBEAT_INTERVAL = float(os.getenv("MYBOT_HEARTBEAT_INTERVAL", "5"))  # 하트비트 스레드 갱신 간격 (초)
+HEARTBEAT_TTL = float(os.getenv("MYBOT_HEARTBEAT_TTL", "30"))  # 하트비트 스레드가 있을 때의 임대 유지 시간 (초)
+OWNER_ALIVE_GRACE = 1800  # 소유 프로세스가 살아 있으면 임대 만료 후 더 기다리는 시간 (멈춘 프로세스 대비 상한)
+
+STATES = ("queued", "leased", "running", "done", "failed")
+ACTIVE_STATES = ("leased", "running")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bot TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    chat_id INTEGER,
+    state TEXT NOT NULL DEFAULT 'queued',
+    worker TEXT,
+    summary TEXT NOT NULL DEFAULT '',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    leased_at REAL,
+    heartbeat_at REAL,
+    lease_expires REAL,
+    finished_at REAL,
+    error TEXT,
+    owner_pid INTEGER,
+    owner_host TEXT,
+    owner_started REAL,
+    UNIQUE (bot, chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_worker ON jobs (worker, state);
+"""
+
+_COLUMNS = ("id", "bot", "message_id", "chat_id", "state", "worker", "summary", "attempts",
+            "created_at", "leased_at", "heartbeat_at", "lease_expires", "finished_at", "error",
+            "owner_pid", "owner_host", "owner_started")
+_OWNER_COLUMNS = {"owner_pid": "INTEGER", "owner_host": "TEXT", "owner_started": "REAL"}
+_LEGACY_UNIQUE = "UNIQUE (bot, message_id)"  # 이전 jobs.db의 작업 구분 (chat_id 없음)
+
+
+def current_worker():
+    """이 프로세스의 작업자 ID (MYBOT_WORKER_ID, 기본 "default")"""
+    return os.getenv("MYBOT_WORKER_ID", DEFAULT_WORKER).strip() or DEFAULT_WORKER
+
+
+def assigned_chat():
+    """
+    이 작업자가 맡은 채팅 (MYBOT_WORKER_CHAT="봇:chat_id")
+
+    Returns:
+        tuple or None: (봇, chat_id) - 설정되지 않으면 None (모든 채팅)
+    """
+    value = os.getenv("MYBOT_WORKER_CHAT", "").strip()
+    if not value:
+        return None
+    bot, _, chat_id = value.rpartition(":")
+    return (bot or DEFAULT_PARTITION), int(chat_id)
+
+
+_PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+_STILL_ACTIVE = 259
+_ERROR_ACCESS_DENIED = 5
+
+
+def _open_process(pid):
+    """Windows 프로세스 핸들 열기 → (kernel32, 핸들 또는 None)"""
+    import ctypes
+    from ctypes import wintypes
+
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    kernel32.OpenProcess.restype = wintypes.HANDLE
+    kernel32.OpenProcess.argtypes = (wintypes.DWORD, wintypes.BOOL, wintypes.DWORD)
+    return kernel32, kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+
+
+def process_start_time(pid):
+    """
+    프로세스 시작 시각 (epoch 초, PID 재사용 구분용)
+
+    Returns:
+        float or None: 알 수 없으면 None (Windows/Linux만 지원)
+    """
+    try:
+        if os.name == "nt":
+            import ctypes
+            from ctypes import wintypes
+
+            kernel32, handle = _open_process(pid)
+            if not handle:
+                return None
+            try:
+                times = [wintypes.FILETIME() for _ in range(4)]
+                if not kernel32.GetProcessTimes(handle, *[ctypes.byref(t) for t in times]):
+                    return None
+                created = (times[0].dwHighDateTime << 32) | times[0].dwLowDateTime
+                return created / 10_000_000 - 11644473600  # 1601-01-01 기준 100ns → epoch 초
+            finally:
+                kernel32.CloseHandle(handle)
+
+        with open(f"/proc/{pid}/stat", "r") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat", "r") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration, AttributeError):
+        return None
+
+
+def process_alive(pid, started=None):
+    """
+    프로세스가 살아 있는지 (같은 컴퓨터)
+
+    Args:
+        pid: 프로세스 ID
+        started: 기록된 시작 시각 - 다르면 PID가 다른 프로세스에 재사용된 것으로 판단
+    """
+    if os.name == "nt":
+        import ctypes
+
+        kernel32, handle = _open_process(pid)
+        if not handle:
+            return ctypes.get_last_error() == _ERROR_ACCESS_DENIED  # 접근 거부 = 다른 사용자의 살아 있는 프로세스
+        try:
+            code = ctypes.c_ulong()
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+            if code.value != _STILL_ACTIVE:
+                return False
+        finally:
+            kernel32.CloseHandle(handle)
+    else:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+
+    if started:
+        current = process_start_time(pid)
+        if current is not None and abs(current - started) > 2:
+            return False
+    return True
+
+
+def owner_info(pid=None):
+    """임대 소유 프로세스 정보 (pid, 호스트, 시작 시각) - 기본값은 현재 프로세스"""
+    pid = os.getpid() if pid is None else pid
+    return {"owner_pid": pid, "owner_host": socket.gethostname(), "owner_started": process_start_time(pid)}
+
+
+def owner_alive(job):
+    """
+    작업의 소유 프로세스가 살아 있는지
+
+    소유 프로세스가 기록되지 않았거나 다른 컴퓨터이면 확인할 수 없으므로 True (임대 만료로 판단)
+    """
+    if not job.get("owner_pid") or job.get("owner_host") != socket.gethostname():
+        return True
+    return process_alive(job["owner_pid"], job.get("owner_started"))
+
+
+def job_stopped(job, now=None):
+    """
+    작업이 중단되었는지 (회수 대상)
+
+    - 임대가 만료되지 않음 → 진행 중 (소유 프로세스가 종료되었어도 다른 프로세스가 하트비트/경과 보고로 연장 중)
+    - 같은 컴퓨터의 소유 프로세스가 살아 있음 → 하트비트가 끊겨도 OWNER_ALIVE_GRACE까지 기다림 (예: 감시 스케줄러만 종료)
+    - 그 밖에는 임대 만료 시 중단
+    """
+    now = time.time() if now is None else now
+    expires = job["lease_expires"] or 0
+    if job.get("owner_pid") and job.get("owner_host") == socket.gethostname() and owner_alive(job):
+        expires += OWNER_ALIVE_GRACE
+    return expires < now
+
+
+def job_key(job):
+    """작업의 메시지 키 (chat_id, message_id)"""
+    return (job["chat_id"], job["message_id"])
+
+
+def format_time(epoch):
+    """epoch 초 → "%Y-%m-%d %H:%M:%S" (없으면 None)"""
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%d %H:%M:%S") if epoch else None
+
+
+class JobQueue:
+    """작업 대기열 (SQLite 연결은 프로세스 내에서 공유)"""
+
+    def __init__(self, db_path=JOBS_DB_FILE):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        # isolation_level=None: 트랜잭션을 직접 BEGIN IMMEDIATE로 시작 (다른 프로세스와 원자적 가져오기)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        # 이전 jobs.db에 소유 프로세스 컬럼 추가
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in _OWNER_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+        self._migrate_unique_key()
+
+    def _migrate_unique_key(self):
+        """이전 jobs.db의 UNIQUE (bot, message_id)를 (bot, chat_id, message_id)로 (테이블 다시 만들기)"""
+        row = self._conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone()
+        if not row or _LEGACY_UNIQUE not in row[0]:
+            return
+        with self._transaction() as conn:
+            row = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jobs'").fetchone()
+            if _LEGACY_UNIQUE not in row[0]:
+                return  # 다른 프로세스가 먼저 이전함
+            conn.execute("ALTER TABLE jobs RENAME TO jobs_legacy")
+            conn.execute("DROP INDEX IF EXISTS idx_jobs_state")  # 이름이 같은 인덱스는 새 테이블에 다시 만듦
+            conn.execute("DROP INDEX IF EXISTS idx_jobs_worker")
+            for statement in _SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f"INSERT INTO jobs ({', '.join(_COLUMNS)}) SELECT {', '.join(_COLUMNS)} FROM jobs_legacy")
+            conn.execute("DROP TABLE jobs_legacy")
+        print("📦 작업 대기열: 작업 구분을 (봇, chat_id, message_id)로 변경")
+
+    @contextmanager
+    def _transaction(self):
+        """쓰기 잠금을 먼저 잡는 트랜잭션 (읽고 바꾸는 사이에 다른 작업자가 끼어들지 못함)"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _select(self, conn, where, params=()):
+        rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs {where}", params).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def _select_keys(self, conn, bot, keys):
+        """메시지 키 (chat_id, message_id) → 작업 (등록되지 않은 메시지는 없음)"""
+        keys = set(keys)
+        ids = list({message_id for _, message_id in keys})
+        if not ids:
+            return {}
+        jobs = self._select(conn, f"WHERE bot = ? AND message_id IN ({', '.join('?' * len(ids))})", [bot, *ids])
+        return {job_key(job): job for job in jobs if job_key(job) in keys}
+
+    # ------------------------------------------------------------------
+    # 등록 / 조회
+    # ------------------------------------------------------------------
+
+    def enqueue(self, bot, messages):
+        """
+        메시지들을 작업으로 등록 (이미 등록된 메시지는 무시)
+
+        Args:
+            bot: 봇 (파티션)
+            messages: 메시지 리스트 (message_id, chat_id, text) - 같은 채팅의 같은 message_id만 같은 작업
+
+        Returns:
+            int: 새로 등록된 작업 수
+        """
+        if not messages:
+            return 0
+        now = time.time()
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (bot, message_id, chat_id, summary, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(bot, msg["message_id"], msg.get("chat_id"), (msg.get("text") or "").replace("\n", " ")[:50], now)
+                 for msg in messages]
+            )
+            return conn.total_changes - before
+
+    def jobs_for(self, bot, keys):
+        """
+        메시지 키 → 작업 (등록되지 않은 메시지는 없음)
+
+        Args:
+            bot: 봇 (파티션)
+            keys: 메시지 키 (chat_id, message_id) 리스트
+
+        Returns:
+            dict: {(chat_id, message_id): 작업}
+        """
+        with self._lock:
+            return self._select_keys(self._conn, bot, keys)
+
+    def queued(self, bot=None):
+        """대기 중인 작업 (등록 순)"""
+        with self._lock:
+            if bot is None:
+                return self._select(self._conn, "WHERE state = 'queued' ORDER BY id")
+            return self._select(self._conn, "WHERE state = 'queued' AND bot = ? ORDER BY id", (bot,))
+
+    def active(self, worker):
+        """작업자가 가져간(leased/running) 작업"""
+        with self._lock:
+            return self._select(self._conn, "WHERE worker = ? AND state IN ('leased', 'running') ORDER BY id",
+                                (worker,))
+
+    def busy_chats(self, exclude_worker=None):
+        """
+        진행 중 작업이 있는 채팅 (채팅별 잠금)
+
+        Args:
+            exclude_worker: 이 작업자의 작업은 제외 (자기 채팅은 잠금 대상 아님)
+
+        Returns:
+            set: {(봇, chat_id), ...}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT bot, chat_id FROM jobs WHERE state IN ('leased', 'running') AND worker IS NOT ?",
+                (exclude_worker,)
+            ).fetchall()
+        return set(rows)
+
+    def stats(self):
+        """상태별 작업 수"""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in STATES}
+
+    # ------------------------------------------------------------------
+    # 임대 (작업 가져가기)
+    # ------------------------------------------------------------------
+
+    def lease(self, worker, bot, keys, ttl, summary=None, owner=None):
+        """
+        지정한 메시지들의 작업을 한꺼번에 가져감 (전부 가능할 때만)
+
+        다른 작업자가 가져갔거나 이미 끝난 메시지가 하나라도 있으면, 또는 같은 채팅에서
+        다른 작업자가 작업 중이면(채팅별 잠금) 아무것도 바꾸지 않습니다.
+        등록되지 않은 메시지는 등록과 동시에 가져갑니다.
+
+        Args:
+            worker: 작업자 ID
+            bot: 봇 (파티션)
+            keys: 메시지 키 (chat_id, message_id) 리스트
+            ttl: 임대 유지 시간 (초, 하트비트마다 연장)
+            summary: 작업 요약 (표시용)
+            owner: 소유 프로세스 (owner_info(), 하트비트 스레드가 있을 때만)
+
+        Returns:
+            bool: 가져오기 성공 여부
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+
+        with self._transaction() as conn:
+            jobs = self._select_keys(conn, bot, keys)
+
+            for job in jobs.values():
+                own = job["worker"] == worker and job["state"] in ACTIVE_STATES
+                if job["state"] != "queued" and not own:
+                    return False
+
+            # 채팅별 잠금: 같은 채팅에서 다른 작업자가 작업 중이면 가져가지 않음
+            chats = {chat_id for chat_id, _ in keys}
+            chats.discard(None)
+            if chats and conn.execute(
+                f"SELECT 1 FROM jobs WHERE bot = ? AND chat_id IN ({', '.join('?' * len(chats))}) "
+                f"AND state IN ('leased', 'running') AND worker != ? LIMIT 1",
+                [bot, *chats, worker]
+            ).fetchone():
+                return False
+
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (bot, message_id, chat_id, created_at) VALUES (?, ?, ?, ?)",
+                [(bot, message_id, chat_id, now) for chat_id, message_id in keys if (chat_id, message_id) not in jobs]
+            )
+            job_ids = [job["id"] for job in self._select_keys(conn, bot, keys).values()]
+            owner = owner or {}
+            conn.execute(
+                f"UPDATE jobs SET state = CASE WHEN state = 'running' THEN 'running' ELSE 'leased' END, "
+                f"worker = ?, leased_at = COALESCE(leased_at, ?), heartbeat_at = ?, lease_expires = ?, "
+                f"summary = COALESCE(?, summary), owner_pid = COALESCE(?, owner_pid), "
+                f"owner_host = COALESCE(?, owner_host), owner_started = COALESCE(?, owner_started) "
+                f"WHERE id IN ({', '.join('?' * len(job_ids))})",
+                [worker, now, now, now + ttl, summary, owner.get("owner_pid"), owner.get("owner_host"),
+                 owner.get("owner_started"), *job_ids]
+            )
+        return True
+
+    def lease_next(self, worker, ttl, bot=None):
+        """
+        가장 오래된 대기 작업 하나를 가져감 (원자적, 다른 작업자가 작업 중인 채팅은 건너뜀)
+
+        Returns:
+            dict or None: 가져간 작업
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            where = ("WHERE state = 'queued'" + (" AND bot = ?" if bot is not None else "") +
+                     " AND NOT EXISTS (SELECT 1 FROM jobs AS busy WHERE busy.bot = jobs.bot"
+                     " AND busy.chat_id IS jobs.chat_id AND busy.state IN ('leased', 'running'))"
+                     " ORDER BY id LIMIT 1")
+            jobs = self._select(conn, where, (bot,) if bot is not None else ())
+            if not jobs:
+                return None
+            job = jobs[0]
+            conn.execute(
+                "UPDATE jobs SET state = 'leased', worker = ?, leased_at = ?, heartbeat_at = ?, lease_expires = ? "
+                "WHERE id = ?",
+                (worker, now, now, now + ttl, job["id"])
+            )
+        job.update(state="leased", worker=worker, leased_at=now, heartbeat_at=now, lease_expires=now + ttl)
+        return job
+
+    def start(self, worker):
+        """가져간 작업을 running으로 (작업 시작)"""
+        with self._transaction() as conn:
+            return conn.execute("UPDATE jobs SET state = 'running' WHERE worker = ? AND state = 'leased'",
+                                (worker,)).rowcount
+
+    def heartbeat(self, worker, ttl, owner=None):
+        """
+        작업자의 임대 연장 (하트비트 스레드 / 경과 보고 때 호출)
+
+        Args:
+            worker: 작업자 ID
+            ttl: 지금부터의 임대 유지 시간 (초)
+            owner: 소유 프로세스 (owner_info(), 생략하면 기록된 값 유지)
+
+        Returns:
+            int: 연장된 작업 수
+        """
+        now = time.time()
+        owner = owner or {}
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET heartbeat_at = ?, lease_expires = ?, owner_pid = COALESCE(?, owner_pid), "
+                "owner_host = COALESCE(?, owner_host), owner_started = COALESCE(?, owner_started) "
+                "WHERE worker = ? AND state IN ('leased', 'running')",
+                (now, now + ttl, owner.get("owner_pid"), owner.get("owner_host"), owner.get("owner_started"), worker)
+            ).rowcount
+
+    # ------------------------------------------------------------------
+    # 종료
+    # ------------------------------------------------------------------
+
+    def complete(self, bot, keys):
+        """메시지들(메시지 키 (chat_id, message_id))의 작업 완료 (상태와 관계없이 done)"""
+        with self._transaction() as conn:
+            job_ids = [job["id"] for job in self._select_keys(conn, bot, keys).values()]
+            if not job_ids:
+                return 0
+            return conn.execute(
+                f"UPDATE jobs SET state = 'done', finished_at = ? "
+                f"WHERE id IN ({', '.join('?' * len(job_ids))}) AND state != 'done'",
+                [time.time(), *job_ids]
+            ).rowcount
+
+    def fail(self, worker, error):
+        """작업자의 진행 중 작업을 실패 처리 (다시 시도하지 않음)"""
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET state = 'failed', finished_at = ?, error = ? "
+                "WHERE worker = ? AND state IN ('leased', 'running')",
+                (time.time(), str(error)[:500], worker)
+            ).rowcount
+
+    def release(self, worker):
+        """
+        작업자의 남은 임대 반납 (끝나지 않은 작업은 다시 queued)
+
+        Returns:
+            int: 반납한 작업 수
+        """
+        with self._transaction() as conn:
+            return conn.execute(
+                "UPDATE jobs SET state = 'queued', worker = NULL, leased_at = NULL, heartbeat_at = NULL, "
+                "lease_expires = NULL, owner_pid = NULL, owner_host = NULL, owner_started = NULL "
+                "WHERE worker = ? AND state IN ('leased', 'running')",
+                (worker,)
+            ).rowcount
+
+    def _requeue(self, conn, jobs, now):
+        """중단된 작업을 재시도 횟수를 늘려 queued로 (MAX_ATTEMPTS 도달 시 failed)"""
+        for job in jobs:
+            job["new_state"] = "failed" if job["attempts"] + 1 >= MAX_ATTEMPTS else "queued"
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, worker = NULL, lease_expires = NULL, "
+                "owner_pid = NULL, owner_host = NULL, owner_started = NULL, "
+                "finished_at = CASE WHEN ? = 'failed' THEN ? ELSE NULL END, "
+                "error = CASE WHEN ? = 'failed' THEN '작업 중단 반복' ELSE error END WHERE id = ?",
+                (job["new_state"], job["new_state"], now, job["new_state"], job["id"])
+            )
+        return jobs
+
+    def requeue_expired(self, now=None):
+        """
+        중단된 작업 회수 (임대 만료 - 소유 프로세스가 살아 있으면 OWNER_ALIVE_GRACE 후)
+
+        재시도 횟수를 늘려 queued로 되돌리고, MAX_ATTEMPTS에 도달하면 failed로 표시합니다.
+        오래된 완료/실패 작업도 함께 정리합니다.
+
+        Returns:
+            list: 회수한 작업 (회수 전 정보 + "new_state")
+        """
+        now = time.time() if now is None else now
+        with self._transaction() as conn:
+            active = self._select(conn, "WHERE state IN ('leased', 'running') AND lease_expires < ? ORDER BY id",
+                                  (now,))
+            stopped = [job for job in active if job_stopped(job, now)]
+            self._requeue(conn, stopped, now)
+            conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND finished_at < ?",
+                         (now - JOB_KEEP_DAYS * 24 * 60 * 60,))
+        return stopped
+
+    def requeue_worker(self, worker):
+        """
+        작업자 프로세스가 끝났는데 남아 있는 작업 회수 (비정상 종료)
+
+        Returns:
+            list: 회수한 작업 (회수 전 정보 + "new_state")
+        """
+        with self._transaction() as conn:
+            jobs = self._select(conn, "WHERE worker = ? AND state IN ('leased', 'running') ORDER BY id", (worker,))
+            return self._requeue(conn, jobs, time.time())
+
+
+class Heartbeat:
+    """
+    백그라운드 하트비트 스레드
+
+    작업자의 임대를 interval마다 ttl만큼 연장하고 소유 프로세스를 기록합니다.
+    이 스레드를 실행한 프로세스(또는 감시 중인 자식 프로세스)가 죽으면 하트비트가 멈추고,
+    마지막 연장 후 ttl이 지나면 회수됩니다.
+    """
+
+    def __init__(self, queue, worker, owner=None, interval=HEARTBEAT_INTERVAL, ttl=HEARTBEAT_TTL):
+        self.queue = queue
+        self.worker = worker
+        self.owner = owner or owner_info()
+        self.interval = interval
+        self.ttl = ttl
+        self._stop = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        """임대 1회 연장"""
+        try:
+            return self.queue.heartbeat(self.worker, self.ttl, owner=self.owner)
+        except Exception as e:
+            print(f"⚠️ 하트비트 오류 ({self.worker}): {e}")
+            return 0
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.beat()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.worker}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=self.interval + 1)
+
+
+# 경로 → JobQueue (프로세스 내 공유)
+_open_queues = {}
+_open_queues_lock = threading.Lock()
+
+
+def open_job_queue(db_path=JOBS_DB_FILE):
+    """작업 대기열 열기 (jobs.db)"""
+    with _open_queues_lock:
+        queue = _open_queues.get(db_path)
+        if queue is None:
+            queue = _open_queues[db_path] = JobQueue(db_path)
+        return queue
+
+
+if __name__ == "__main__":
+    queue = open_job_queue()
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--worker=")]
+    worker = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--worker=")), current_worker())
+
+    if args and args[0] in ("requeue", "exited"):
+        jobs = queue.requeue_worker(worker) if args[0] == "exited" else queue.requeue_expired()
+        for job in jobs:
+            print(f"♻️ [{job['bot']}] msg_{job['message_id']} ({job['worker']}) → {job['new_state']}")
+        sys.exit(0)
+
+    print(f"작업 대기열: {queue.db_path}")
+    print("  " + " / ".join(f"{state} {count}" for state, count in queue.stats().items()))
+    with queue._lock:
+        running = queue._select(queue._conn, "WHERE state IN ('leased', 'running') ORDER BY id")
+    for job in running:
+        owner = f" pid {job['owner_pid']}@{job['owner_host']}" if job["owner_pid"] else ""
+        print(f"  [{job['state']}] {job['worker']}{owner} [{job['bot']}] msg_{job['message_id']} "
+              f"하트비트 {format_time(job['heartbeat_at'])} (만료 {format_time(job['lease_expires'])}) {job['summary']}")
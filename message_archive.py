@@ -0,0 +1,270 @@
+"""
+월별 압축 아카이브 (보관 기간이 지난 대화 내역)
+
+역할:
+- 보관 기간(TELEGRAM_RETENTION_DAYS)이 지난 메시지를 월별 압축 파일에 저장
+  - 기본 gzip, zstandard 패키지가 있고 TELEGRAM_ARCHIVE_CODEC=zstd면 zstd
+  - 정리 작업마다 압축 블록(member/frame)을 이어 붙임 (기존 내용 다시 압축 안 함)
+- 작은 사이드카 인덱스(index.json): message_id → 월, 월별 개수/기간
+- 조회는 필요한 달의 파일만 풀어서 읽음 (메시지 확인 경로에서는 읽지 않음)
+
+저장 구조:
+    telegram_archive/
+    ├── 2026-08.jsonl.gz
+    ├── 2026-09.jsonl.zst
+    └── index.json      # {"messages": {"123": "2026-09"}, "months": {"2026-09": {...}}}
+
+사용법:
+    python message_archive.py                  # 월별 현황
+    python message_archive.py get 123          # 메시지 하나 조회
+    python message_archive.py search 키워드     # 텍스트 검색 (최신 달부터)
+    (팀별 봇은 마지막 인자로 --bot=이름)
+"""
+
+import os
+import sys
+import gzip
+import json
+from functools import lru_cache
+
+from bot_registry import DEFAULT_PARTITION, partition_dir
+from state_store import atomic_write_json
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ARCHIVE_DIR = os.path.join(_BASE_DIR, "telegram_archive")
+ARCHIVE_CODEC = os.getenv("TELEGRAM_ARCHIVE_CODEC", "gzip").lower()  # gzip | zstd
+
+_EXTENSIONS = {"gzip": ".jsonl.gz", "zstd": ".jsonl.zst"}
+
+
+def archive_dir(partition=DEFAULT_PARTITION):
+    """파티션(봇)의 아카이브 폴더 (팀별 봇은 telegram_archive/{봇이름}/)"""
+    return partition_dir(ARCHIVE_DIR, partition)
+
+
+def _codec():
+    if ARCHIVE_CODEC == "zstd":
+        if zstandard is not None:
+            return "zstd"
+        print("⚠️ zstandard 패키지 미설치 - gzip으로 아카이브합니다. (pip install zstandard)")
+    return "gzip"
+
+
+def _compress(data, codec):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _month_path(folder, month):
+    """해당 월의 기존 아카이브 파일 (없으면 현재 코덱의 새 경로)"""
+    for codec, ext in _EXTENSIONS.items():
+        path = os.path.join(folder, month + ext)
+        if os.path.exists(path):
+            return path, codec
+    codec = _codec()
+    return os.path.join(folder, month + _EXTENSIONS[codec]), codec
+
+
+@lru_cache(maxsize=8)
+def _read_month_cached(path, mtime_ns):
+    """월 파일 전체 해제 → 메시지 리스트 (파일이 바뀌면 mtime으로 캐시 무효화)"""
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{os.path.basename(path)}을 읽으려면 zstandard 패키지가 필요합니다.")
+        with open(path, "rb") as f:
+            with zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True) as reader:
+                data = reader.read()
+    else:
+        with gzip.open(path, "rb") as f:
+            data = f.read()
+
+    messages = []
+    for line in data.splitlines():
+        if line.strip():
+            messages.append(json.loads(line))
+    return tuple(messages)
+
+
+class MessageArchive:
+    """파티션 하나의 월별 압축 아카이브 + 사이드카 인덱스"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_file = os.path.join(folder, "index.json")
+        self.index = self._load_index()
+        self._migrate_plain_months()
+
+    def _load_index(self):
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"⚠️ 아카이브 index.json 읽기 오류: {e} (다시 생성)")
+                return self.rebuild_index()
+        return {"messages": {}, "months": {}}
+
+    def _save_index(self):
+        os.makedirs(self.folder, exist_ok=True)
+        atomic_write_json(self.index_file, self.index)
+
+    def _index_messages(self, month, messages):
+        info = self.index["months"].setdefault(month, {"count": 0, "first": None, "last": None})
+        for msg in messages:
+            key = str(msg["message_id"])
+            if self.index["messages"].get(key) != month:
+                info["count"] += 1
+            self.index["messages"][key] = month
+            timestamp = msg.get("timestamp")
+            if timestamp:
+                info["first"] = min(info["first"] or timestamp, timestamp)
+                info["last"] = max(info["last"] or timestamp, timestamp)
+
+    def _migrate_plain_months(self):
+        """압축 전 형식(YYYY-MM.jsonl)이 남아 있으면 압축 아카이브로 옮기기"""
+        if not os.path.isdir(self.folder):
+            return
+        plain = sorted(name for name in os.listdir(self.folder)
+                       if name.endswith(".jsonl") and len(name) == len("YYYY-MM.jsonl"))
+        for name in plain:
+            path = os.path.join(self.folder, name)
+            with open(path, "r", encoding="utf-8") as f:
+                messages = [json.loads(line) for line in f if line.strip()]
+            self.add(messages)
+            os.remove(path)
+            print(f"🗜️ 아카이브 {name} → 압축 형식으로 변환 ({len(messages)}개)")
+
+    def add(self, messages):
+        """
+        메시지들을 월별 파일에 추가 (timestamp의 YYYY-MM 기준)
+
+        압축 블록을 파일 끝에 이어 붙인 뒤(fsync) 인덱스를 갱신합니다.
+        """
+        if not messages:
+            return
+
+        by_month = {}
+        for msg in messages:
+            by_month.setdefault(msg["timestamp"][:7], []).append(msg)
+
+        os.makedirs(self.folder, exist_ok=True)
+        for month, month_messages in sorted(by_month.items()):
+            path, codec = _month_path(self.folder, month)
+            data = "".join(json.dumps(msg, ensure_ascii=False) + "\n" for msg in month_messages)
+            with open(path, "ab") as f:
+                f.write(_compress(data.encode("utf-8"), codec))
+                f.flush()
+                os.fsync(f.fileno())
+            self._index_messages(month, month_messages)
+
+        self._save_index()
+
+    def months(self):
+        """아카이브된 월 목록 (오래된 순)"""
+        return sorted(self.index["months"])
+
+    def _read_month(self, month):
+        path, _ = _month_path(self.folder, month)
+        if not os.path.exists(path):
+            return ()
+        return _read_month_cached(path, os.stat(path).st_mtime_ns)
+
+    def get(self, message_id):
+        """message_id로 메시지 하나 조회 (해당 월 파일만 읽음, 없으면 None)"""
+        month = self.index["messages"].get(str(message_id))
+        if month is None:
+            return None
+        found = None
+        for msg in self._read_month(month):
+            if msg["message_id"] == message_id:
+                found = msg  # 중복 기록이면 마지막 것 사용
+        return found
+
+    def iter_messages(self, since=None, until=None, newest_first=False):
+        """
+        기간 내 메시지 순회 (겹치는 달만 읽음)
+
+        Args:
+            since: 시작 시각 문자열 (포함, 예: "2026-08-01")
+            until: 끝 시각 문자열 (포함, 예: "2026-08-31 23:59:59")
+            newest_first: 최신 달부터 순회
+        """
+        months = self.months()
+        if newest_first:
+            months.reverse()
+        for month in months:
+            info = self.index["months"][month]
+            if since and info["last"] and info["last"] < since:
+                continue
+            if until and info["first"] and info["first"] > until:
+                continue
+            for msg in self._read_month(month):
+                timestamp = msg.get("timestamp", "")
+                if (since and timestamp < since) or (until and timestamp > until):
+                    continue
+                yield msg
+
+    def search(self, keyword, since=None, until=None, limit=20):
+        """텍스트에 keyword가 포함된 메시지 (최신 달부터 limit개)"""
+        keyword_lower = keyword.lower()
+        matches = []
+        for msg in self.iter_messages(since, until, newest_first=True):
+            if keyword_lower in (msg.get("text") or "").lower():
+                matches.append(msg)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def rebuild_index(self):
+        """월 파일들을 모두 읽어 인덱스 재생성"""
+        self.index = {"messages": {}, "months": {}}
+        for name in sorted(os.listdir(self.folder)):
+            for ext in _EXTENSIONS.values():
+                if name.endswith(ext):
+                    month = name[:-len(ext)]
+                    self._index_messages(month, self._read_month(month))
+        self._save_index()
+        return self.index
+
+
+def open_archive(partition=DEFAULT_PARTITION):
+    """파티션(봇)의 아카이브 열기"""
+    return MessageArchive(archive_dir(partition))
+
+
+if __name__ == "__main__":
+    partition = DEFAULT_PARTITION
+    for arg in list(sys.argv[1:]):
+        if arg.startswith("--bot="):
+            partition = arg.split("=", 1)[1]
+            sys.argv.remove(arg)
+
+    archive = open_archive(partition)
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+
+    if command == "get" and len(sys.argv) > 2:
+        message_id = int(sys.argv[2]) if sys.argv[2].isdigit() else sys.argv[2]
+        msg = archive.get(message_id)
+        print(json.dumps(msg, ensure_ascii=False, indent=2) if msg else f"⚠️ 아카이브에 없음: {message_id}")
+    elif command == "search" and len(sys.argv) > 2:
+        for msg in archive.search(sys.argv[2]):
+            print(f"[{msg['timestamp']}] {msg['message_id']}: {(msg.get('text') or '')[:80]}")
+    elif command == "rebuild":
+        archive.rebuild_index()
+        print(f"✅ 인덱스 재생성: {len(archive.index['messages'])}개")
+    else:
+        print("=" * 60)
+        print(f"메시지 아카이브 ({archive.folder})")
+        print("=" * 60)
+        for month in archive.months():
+            info = archive.index["months"][month]
+            path, codec = _month_path(archive.folder, month)
+            size_kb = os.path.getsize(path) / 1024 if os.path.exists(path) else 0
+            print(f"{month}: {info['count']}개 ({info['first']} ~ {info['last']}) {codec} {size_kb:.1f} KB")
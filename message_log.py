@@ -0,0 +1,597 @@
+"""
+텔레그램 메시지 로그 (Append-only Segmented JSONL)
+
+역할:
+- telegram_messages.json 전체를 매번 다시 쓰는 대신 변경분만 한 줄씩 추가
+- 메시지 추가/처리 완료 표시/삭제가 전체 기록 크기와 무관하게 O(1)
+- 메시지 키 (chat_id, message_id) → (세그먼트, 오프셋) 메모리 인덱스
+  - Telegram message_id는 채팅 안에서만 고유하므로 다른 채팅의 같은 ID 메시지를 덮어쓰지 않음
+  - message_id만 주면 그 ID의 가장 최근 메시지 (채팅이 하나인 기존 호출 호환)
+- media_group_id → 앨범 대표 메시지 키 메모리 인덱스 (재시작 후에도 로그 재생으로 복원)
+- 미처리(processed=False) 메시지 키 집합 - 대기 메시지 확인이 전체 메시지 수와 무관
+- 오래된 세그먼트는 백그라운드에서 스냅샷으로 압축
+- 추가/압축/전체 교체는 폴더 잠금(telegram_messages.lock, state_store.file_lock)으로 프로세스 간 직렬화
+- 기존 telegram_messages.json 형식으로 가져오기/내보내기
+- open_message_log()는 프로세스 내 캐시: 처음 한 번만 전체를 읽고, 이후에는
+  세그먼트 파일의 inode/크기/수정 시각을 비교하여 다른 프로세스가 추가한 부분만 읽음
+
+저장 구조:
+    telegram_messages/
+    ├── seg_000001.jsonl
+    └── seg_000002.jsonl     # 가장 번호가 큰 세그먼트에만 추가
+
+레코드 형식 (한 줄에 하나):
+    {"op": "add", "msg": {...}}                                          # 메시지 추가 (같은 키면 교체)
+    {"op": "set", "id": 123, "chat_id": 111, "fields": {"processed": true}} # 일부 필드 갱신
+    {"op": "del", "id": 123, "chat_id": 111}                             # 메시지 삭제
+    (chat_id가 없는 이전 set/del 레코드는 그 시점의 같은 ID 메시지에 적용)
+    {"op": "meta", "last_update_id": 456}                 # 마지막 update_id
+    {"op": "snapshot"}                                    # 이전 상태 초기화 (압축 세그먼트 시작)
+
+사용법:
+    python message_log.py export [telegram_messages.json]   # 기존 JSON 형식으로 내보내기
+    python message_log.py import telegram_messages.json     # 기존 JSON 가져오기 (전체 교체)
+    python message_log.py compact                           # 수동 압축
+    (팀별 봇 파티션은 마지막 인자로 --bot=이름)
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+from bot_registry import DEFAULT_PARTITION, partition_dir
+from state_store import file_lock, sync_file, sync_in_group
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LEGACY_MESSAGES_FILE = os.path.join(_BASE_DIR, "telegram_messages.json")
+MESSAGES_LOG_DIR = os.path.join(_BASE_DIR, "telegram_messages")
+SEGMENT_MAX_BYTES = int(os.getenv("TELEGRAM_LOG_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+COMPACT_MIN_SEGMENTS = 2  # 압축 대상 세그먼트가 이 개수 이상일 때만 압축
+COMPACT_KEEP_SEGMENTS = 2  # 최신 세그먼트 N개는 다른 프로세스가 추가 중일 수 있으므로 압축 제외
+
+
+def _segment_name(seg_no):
+    return f"seg_{seg_no:06d}.jsonl"
+
+
+def _encode(record):
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def message_key(msg):
+    """메시지 키 (chat_id, message_id) - message_id는 채팅 안에서만 고유"""
+    return (msg.get("chat_id"), msg["message_id"])
+
+
+class MessageLog:
+    """
+    세그먼트 JSONL 메시지 로그
+
+    메모리에 전체 메시지 상태(삽입 순서 유지)와 메시지 키별 최신 레코드 위치를
+    유지하며, 모든 변경은 마지막 세그먼트에 한 줄 추가로 기록됩니다.
+
+    메시지를 가리키는 인자(ref)는 메시지 키 (chat_id, message_id) 또는 message_id입니다.
+    message_id만 주면 그 ID의 가장 최근 메시지를 가리킵니다.
+    """
+
+    def __init__(self, log_dir=MESSAGES_LOG_DIR, legacy_file=LEGACY_MESSAGES_FILE,
+                 segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.log_dir = log_dir
+        self.legacy_file = legacy_file
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.RLock()
+        self._compactor = None
+
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        # 최초 실행: 기존 telegram_messages.json 가져오기 (동시에 시작한 프로세스 중 한 곳만)
+        if not self._segment_numbers() and legacy_file and os.path.exists(legacy_file):
+            with file_lock(self.log_dir):
+                if not self._segment_numbers() and os.path.exists(legacy_file):
+                    self._import_legacy_file(legacy_file)
+
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 세그먼트 읽기
+    # ------------------------------------------------------------------
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.log_dir):
+            if name.startswith("seg_") and name.endswith(".jsonl"):
+                try:
+                    numbers.append(int(name[4:-6]))
+                except ValueError:
+                    continue
+        return sorted(numbers)
+
+    def _segment_path(self, seg_no):
+        return os.path.join(self.log_dir, _segment_name(seg_no))
+
+    def _reset_state(self):
+        self._messages = {}      # (chat_id, message_id) → 메시지 (삽입 순서 유지)
+        self._offsets = {}       # (chat_id, message_id) → (세그먼트 번호, 바이트 오프셋)
+        self._pending = {}       # 미처리 메시지 키 (dict를 순서 있는 집합으로 사용)
+        self._media_groups = {}  # media_group_id → 앨범 대표 메시지 키
+        self._by_id = {}         # message_id → {메시지 키: None} (message_id만 주는 호출/이전 레코드용)
+        self._record_counts = {}  # 세그먼트 번호 → 레코드 수 (압축 판단용)
+        self._seen = {}          # 세그먼트 번호 → (inode, 읽은 바이트 수, mtime_ns) (변경 감지용)
+        self.last_update_id = 0
+
+    def _apply(self, record, seg_no, offset):
+        """레코드 하나를 메모리 상태에 반영"""
+        op = record.get("op")
+
+        if op == "add":
+            msg = record["msg"]
+            key = message_key(msg)
+            self._messages[key] = msg
+            self._offsets[key] = (seg_no, offset)
+            self._by_id.setdefault(msg["message_id"], {}).pop(key, None)
+            self._by_id[msg["message_id"]][key] = None
+            self._track_pending(key, msg)
+            if msg.get("media_group_id"):
+                self._media_groups[msg["media_group_id"]] = key
+        elif op == "set":
+            key = self._record_key(record)
+            msg = self._messages.get(key)
+            if msg is not None:
+                msg.update(record["fields"])
+                self._offsets[key] = (seg_no, offset)
+                if "processed" in record["fields"]:
+                    self._track_pending(key, msg)
+        elif op == "del":
+            key = self._record_key(record)
+            msg = self._messages.pop(key, None)
+            self._offsets.pop(key, None)
+            self._pending.pop(key, None)
+            keys = self._by_id.get(record["id"], {})
+            keys.pop(key, None)
+            if not keys:
+                self._by_id.pop(record["id"], None)
+            if msg is not None and self._media_groups.get(msg.get("media_group_id")) == key:
+                del self._media_groups[msg["media_group_id"]]
+        elif op == "meta":
+            self.last_update_id = max(self.last_update_id, record.get("last_update_id", 0))
+        elif op == "snapshot":
+            self._messages = {}
+            self._offsets = {}
+            self._pending = {}
+            self._media_groups = {}
+            self._by_id = {}
+            self.last_update_id = 0
+
+    def _record_key(self, record):
+        """set/del 레코드의 메시지 키 (chat_id가 없는 이전 레코드는 그 시점의 같은 ID 메시지)"""
+        if "chat_id" in record:
+            return (record["chat_id"], record["id"])
+        return self._resolve(record["id"])
+
+    def _resolve(self, ref):
+        """메시지 키 또는 message_id → 메시지 키 (message_id만 주면 가장 최근 메시지, 없으면 None)"""
+        if isinstance(ref, tuple):
+            return ref
+        keys = self._by_id.get(ref)
+        return next(reversed(keys)) if keys else None
+
+    def _track_pending(self, key, msg):
+        if msg.get("processed", False):
+            self._pending.pop(key, None)
+        else:
+            self._pending[key] = None
+
+    def _replay_segment(self, seg_no, start=0):
+        """세그먼트 하나를 start 바이트부터 재생 (0이면 처음부터)"""
+        path = self._segment_path(seg_no)
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                offset = start
+                count = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # 다른 프로세스가 쓰는 중인 마지막 줄 - 다음 refresh()에서 다시 읽음
+                        break
+                    if line.strip():
+                        try:
+                            self._apply(json.loads(line), seg_no, offset)
+                            count += 1
+                        except (ValueError, KeyError) as e:
+                            # 비정상 종료로 잘린 줄 등
+                            print(f"⚠️ {_segment_name(seg_no)} 손상된 레코드 건너뜀 (offset {offset}): {e}")
+                    offset += len(line)
+                st = os.fstat(f.fileno())
+            self._record_counts[seg_no] = self._record_counts.get(seg_no, 0) + count if start else count
+            self._seen[seg_no] = (st.st_ino, offset, st.st_mtime_ns)
+        except FileNotFoundError:
+            # 다른 프로세스가 압축 중 삭제한 세그먼트 (이후 스냅샷에 포함됨)
+            pass
+
+    def _load(self):
+        with self._lock:
+            self._reset_state()
+            for seg_no in self._segment_numbers():
+                self._replay_segment(seg_no)
+
+    def refresh(self):
+        """
+        다른 프로세스의 변경 반영 (변경이 없으면 파일을 읽지 않음)
+
+        - 세그먼트 끝에 추가만 된 경우: 추가된 부분만 읽음
+        - 세그먼트가 삭제/교체된 경우 (압축, replace_all): 전체 다시 읽음
+
+        Returns:
+            str: "unchanged" | "tail" | "reload"
+        """
+        with self._lock:
+            try:
+                numbers = self._segment_numbers()
+            except FileNotFoundError:
+                os.makedirs(self.log_dir, exist_ok=True)
+                numbers = []
+
+            known = sorted(self._seen)
+            if known and (not set(known) <= set(numbers) or numbers[:len(known)] != known):
+                self._load()
+                return "reload"
+
+            tails = []
+            for seg_no in known:
+                try:
+                    st = os.stat(self._segment_path(seg_no))
+                except FileNotFoundError:
+                    self._load()
+                    return "reload"
+                ino, consumed, mtime_ns = self._seen[seg_no]
+                if st.st_ino != ino or st.st_size < consumed or \
+                        (st.st_size == consumed and st.st_mtime_ns != mtime_ns):
+                    self._load()
+                    return "reload"
+                if st.st_size > consumed:
+                    tails.append((seg_no, consumed))
+
+            tails.extend((seg_no, 0) for seg_no in numbers[len(known):])
+            for seg_no, start in tails:
+                self._replay_segment(seg_no, start)
+
+            return "tail" if tails else "unchanged"
+
+    # ------------------------------------------------------------------
+    # 쓰기
+    # ------------------------------------------------------------------
+
+    def _active_segment(self):
+        """추가 대상 세그먼트 번호 (크기 초과 시 다음 번호)"""
+        numbers = self._segment_numbers()
+        if not numbers:
+            return 1
+        last = numbers[-1]
+        try:
+            if os.path.getsize(self._segment_path(last)) >= self.segment_max_bytes:
+                return last + 1
+        except FileNotFoundError:
+            pass
+        return last
+
+    def _append_records(self, records):
+        """레코드들을 마지막 세그먼트에 추가하고 메모리 상태에 반영 (write-through)"""
+        # 폴더 잠금: 다른 프로세스의 추가/압축/전체 교체와 겹치지 않음 (한 레코드 묶음이 섞이지 않음)
+        with self._lock, file_lock(self.log_dir):
+            # 다른 프로세스가 추가한 레코드를 먼저 반영 (레코드 순서 유지)
+            self.refresh()
+            seg_no = self._active_segment()
+            with open(self._segment_path(seg_no), "ab") as f:
+                f.seek(0, os.SEEK_END)
+                start = offset = f.tell()
+                for record in records:
+                    line = _encode(record)
+                    f.write(line)
+                    self._apply(record, seg_no, offset)
+                    offset += len(line)
+                f.flush()
+                st = os.fstat(f.fileno())
+            # 그룹 커밋 중(리스너 배치)이면 체크포인트 전진 전에 fsync
+            sync_in_group(self._segment_path(seg_no))
+            self._record_counts[seg_no] = self._record_counts.get(seg_no, 0) + len(records)
+
+            # 읽은 위치 바로 뒤에 썼으면 다시 읽을 필요 없음 (아니면 다음 refresh()가 사이 구간부터 재생 - 재적용해도 결과 동일)
+            seen = self._seen.get(seg_no)
+            if (seen[1] if seen else 0) == start:
+                self._seen[seg_no] = (st.st_ino, offset, st.st_mtime_ns)
+
+    def append(self, msg):
+        """메시지 추가 (같은 채팅의 같은 message_id가 있으면 교체 - 다른 채팅의 같은 ID는 별개 메시지)"""
+        self._append_records([{"op": "add", "msg": msg}])
+
+    def append_many(self, msgs, last_update_id=None):
+        """여러 메시지를 한 번의 쓰기로 추가 (선택적으로 last_update_id도 함께 기록)"""
+        records = [{"op": "add", "msg": msg} for msg in msgs]
+        if last_update_id is not None and last_update_id > self.last_update_id:
+            records.append({"op": "meta", "last_update_id": last_update_id})
+        if records:
+            self._append_records(records)
+
+    def _existing_keys(self, refs):
+        """ref 목록 → 로그에 있는 메시지 키 목록 (중복/없는 메시지 제외)"""
+        with self._lock:
+            keys = (self._resolve(ref) for ref in refs)
+            return list(dict.fromkeys(key for key in keys if key in self._messages))
+
+    def update(self, ref, **fields):
+        """
+        메시지 일부 필드 갱신 (예: processed=True)
+
+        Args:
+            ref: 메시지 키 (chat_id, message_id) 또는 message_id
+
+        Returns:
+            bool: 해당 메시지 존재 여부
+        """
+        return self.update_many([ref], **fields) == 1
+
+    def update_many(self, refs, **fields):
+        """
+        여러 메시지에 같은 필드 갱신
+
+        Args:
+            refs: 메시지 키 (chat_id, message_id) 또는 message_id 리스트
+
+        Returns:
+            int: 갱신된 메시지 수
+        """
+        records = [{"op": "set", "id": message_id, "chat_id": chat_id, "fields": fields}
+                   for chat_id, message_id in self._existing_keys(refs)]
+        if records:
+            self._append_records(records)
+        return len(records)
+
+    def delete_many(self, refs):
+        """메시지 삭제 (삭제 레코드 추가, 실제 공간은 압축 시 회수)"""
+        records = [{"op": "del", "id": message_id, "chat_id": chat_id}
+                   for chat_id, message_id in self._existing_keys(refs)]
+        if records:
+            self._append_records(records)
+        return len(records)
+
+    def set_last_update_id(self, last_update_id):
+        if last_update_id > self.last_update_id:
+            self._append_records([{"op": "meta", "last_update_id": last_update_id}])
+
+    # ------------------------------------------------------------------
+    # 읽기
+    # ------------------------------------------------------------------
+
+    def __contains__(self, ref):
+        with self._lock:
+            return self._resolve(ref) in self._messages
+
+    def __len__(self):
+        return len(self._messages)
+
+    def get(self, ref):
+        """메시지 키 (chat_id, message_id) 또는 message_id로 조회 (없으면 None)"""
+        with self._lock:
+            return self._messages.get(self._resolve(ref))
+
+    def media_group_leader(self, media_group_id):
+        """앨범(media_group_id)의 대표 레코드 (없으면 None - 로그에서 다시 만드는 색인이므로 재시작 후에도 유지)"""
+        with self._lock:
+            return self._messages.get(self._media_groups.get(media_group_id))
+
+    def get_many(self, refs):
+        """여러 메시지 조회 (주어진 순서, 없는 메시지는 제외)"""
+        with self._lock:
+            return [self._messages[key] for key in map(self._resolve, refs) if key in self._messages]
+
+    def pending_keys(self):
+        """미처리 메시지 키 (chat_id, message_id) 리스트"""
+        with self._lock:
+            return list(self._pending)
+
+    def pending_messages(self):
+        """미처리 메시지 리스트 (전체 메시지를 순회하지 않음)"""
+        with self._lock:
+            return [self._messages[key] for key in self._pending]
+
+    def messages(self):
+        """전체 메시지 리스트 (저장 순서)"""
+        with self._lock:  # 백그라운드 정리 스레드와 동시에 호출될 수 있음
+            return list(self._messages.values())
+
+    def to_dict(self):
+        """기존 telegram_messages.json 형식"""
+        return {"messages": self.messages(), "last_update_id": self.last_update_id}
+
+    def disk_size(self):
+        """세그먼트 파일 전체 크기 (바이트)"""
+        total = 0
+        for seg_no in self._segment_numbers():
+            try:
+                total += os.path.getsize(self._segment_path(seg_no))
+            except FileNotFoundError:
+                pass
+        return total
+
+    # ------------------------------------------------------------------
+    # 스냅샷 / 압축
+    # ------------------------------------------------------------------
+
+    def _write_snapshot(self, path, messages, last_update_id):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_encode({"op": "snapshot"}))
+            f.write(_encode({"op": "meta", "last_update_id": last_update_id}))
+            for msg in messages:
+                f.write(_encode({"op": "add", "msg": msg}))
+            sync_file(f, path)
+        os.replace(tmp_path, path)
+
+    def replace_all(self, data):
+        """
+        전체 상태를 data({"messages", "last_update_id"})로 교체
+
+        새 스냅샷 세그먼트를 쓴 뒤 이전 세그먼트를 삭제합니다.
+        (기존 save_telegram_messages() 호환용 - 일반 경로에서는 append/update 사용)
+        """
+        with self._lock, file_lock(self.log_dir):
+            old_numbers = self._segment_numbers()
+            seg_no = (old_numbers[-1] + 1) if old_numbers else 1
+            self._write_snapshot(self._segment_path(seg_no), data.get("messages", []),
+                                 data.get("last_update_id", 0))
+            for old in old_numbers:
+                try:
+                    os.remove(self._segment_path(old))
+                except FileNotFoundError:
+                    pass
+            self._load()
+
+    def _dead_ratio(self, numbers):
+        """세그먼트들 중 더 이상 최신이 아닌 레코드 비율"""
+        targets = set(numbers)
+        total = sum(self._record_counts.get(n, 0) for n in numbers)
+        if not total:
+            return 0.0
+        live = sum(1 for seg_no, _ in self._offsets.values() if seg_no in targets)
+        return 1.0 - live / total
+
+    def compact(self, force=False):
+        """
+        오래된 세그먼트들을 하나의 스냅샷 세그먼트로 압축
+
+        최신 COMPACT_KEEP_SEGMENTS개 세그먼트는 추가 중일 수 있으므로 제외합니다.
+        스냅샷은 {"op": "snapshot"}으로 시작하므로 이전 세그먼트 삭제 전에
+        중단되어도 재생 결과는 동일합니다.
+
+        Returns:
+            int: 압축된 세그먼트 수
+        """
+        with self._lock, file_lock(self.log_dir):
+            # 다른 프로세스가 추가한 레코드까지 반영한 뒤 판단
+            self._load()
+            numbers = self._segment_numbers()
+            targets = numbers[:-COMPACT_KEEP_SEGMENTS] if len(numbers) > COMPACT_KEEP_SEGMENTS else []
+            if not targets:
+                return 0
+            if not force and len(targets) < COMPACT_MIN_SEGMENTS and self._dead_ratio(targets) < 0.5:
+                return 0
+
+            # 압축 대상 세그먼트만 재생한 상태 계산
+            partial = MessageLog.__new__(MessageLog)
+            partial.log_dir = self.log_dir
+            partial._lock = threading.RLock()
+            partial._reset_state()
+            for seg_no in targets:
+                partial._replay_segment(seg_no)
+
+            last = targets[-1]
+            self._write_snapshot(self._segment_path(last), partial.messages(), partial.last_update_id)
+            for seg_no in targets[:-1]:
+                try:
+                    os.remove(self._segment_path(seg_no))
+                except FileNotFoundError:
+                    pass
+
+            # 오프셋이 바뀌었으므로 인덱스 재구성
+            self._load()
+
+        print(f"🗜️ 메시지 로그 압축: 세그먼트 {len(targets)}개 → 1개")
+        return len(targets)
+
+    def start_background_compaction(self, interval=300):
+        """백그라운드 스레드에서 주기적으로 압축 (상주 모드용)"""
+        if self._compactor is not None:
+            return
+
+        def _run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"⚠️ 메시지 로그 압축 오류: {e}")
+
+        self._compactor = threading.Thread(target=_run, name="message-log-compactor", daemon=True)
+        self._compactor.start()
+
+    # ------------------------------------------------------------------
+    # 기존 JSON 형식 가져오기/내보내기
+    # ------------------------------------------------------------------
+
+    def _import_legacy_file(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self._write_snapshot(self._segment_path(1), data.get("messages", []), data.get("last_update_id", 0))
+        # 다시 가져오지 않도록 원본 이름 변경 (삭제하지 않음)
+        os.replace(path, path + ".imported")
+        print(f"📥 {os.path.basename(path)} → 메시지 로그로 가져오기 완료 ({len(data.get('messages', []))}개)")
+
+    def import_legacy(self, path):
+        """기존 JSON 파일 내용으로 전체 교체"""
+        with open(path, "r", encoding="utf-8") as f:
+            self.replace_all(json.load(f))
+
+    def export_legacy(self, path):
+        """기존 telegram_messages.json 형식으로 내보내기"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+
+# 파티션 → MessageLog (프로세스 내 공유 캐시)
+_open_logs = {}
+_open_logs_lock = threading.Lock()
+
+
+def open_message_log(partition=DEFAULT_PARTITION):
+    """
+    파티션(봇)의 메시지 로그 열기
+
+    기본 파티션은 telegram_messages/, 팀별 봇은 telegram_messages/{partition}/
+
+    같은 프로세스에서는 같은 객체를 돌려주며, 호출할 때마다 refresh()로
+    다른 프로세스의 변경만 반영합니다. (변경이 없으면 stat만 하고 파일은 읽지 않음)
+    """
+    with _open_logs_lock:
+        log = _open_logs.get(partition)
+        if log is None:
+            if partition == DEFAULT_PARTITION:
+                log = MessageLog()
+            else:
+                log = MessageLog(log_dir=partition_dir(MESSAGES_LOG_DIR, partition), legacy_file=None)
+            _open_logs[partition] = log
+            return log
+
+    log.refresh()
+    return log
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("export", "import", "compact"):
+        print("사용법: python message_log.py export [파일] | import <파일> | compact")
+        sys.exit(1)
+
+    partition = DEFAULT_PARTITION
+    for arg in list(sys.argv[2:]):
+        if arg.startswith("--bot="):
+            partition = arg.split("=", 1)[1]
+            sys.argv.remove(arg)
+
+    log = open_message_log(partition)
+    command = sys.argv[1]
+
+    if command == "export":
+        out_path = sys.argv[2] if len(sys.argv) > 2 else LEGACY_MESSAGES_FILE
+        log.export_legacy(out_path)
+        print(f"✅ 내보내기 완료: {out_path} ({len(log)}개)")
+    elif command == "import":
+        if len(sys.argv) < 3:
+            print("사용법: python message_log.py import <파일>")
+            sys.exit(1)
+        log.import_legacy(sys.argv[2])
+        print(f"✅ 가져오기 완료: {len(log)}개")
+    else:
+        compacted = log.compact(force=True)
+        print(f"✅ 압축 완료: 세그먼트 {compacted}개")
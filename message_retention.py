@@ -0,0 +1,171 @@
+"""
+메시지 보관 정책 작업 (Retention)
+
+역할:
+- 처리 완료 후 RETENTION_DAYS가 지난 메시지를 메시지 로그에서 아카이브로 이동
+- 메시지 확인 경로(check_telegram)와 분리된 별도 작업으로 실행
+  - 상주/폴링 수집기: 백그라운드 스레드가 주기적으로 확인
+  - 스케줄러: mybot_autoexecutor.bat이 새 메시지가 없을 때 실행
+- 실행 조건: 마지막 실행 후 RETENTION_INTERVAL 경과(타이머) 또는
+  메시지 로그 크기가 RETENTION_MAX_LOG_BYTES 초과(크기) - 둘 다 아니면 아무것도 읽지 않음
+
+저장 구조:
+    telegram_archive/2026-09.jsonl.gz  # 월별 압축 아카이브 (message_archive.py)
+    retention_state.json               # 마지막 실행 시각/결과
+
+처리 순서:
+    1. 만료 메시지를 월별 압축 아카이브에 추가 (fsync 후 인덱스 갱신)
+    2. 메시지 로그에서 삭제 후 압축
+    1~2 사이에 중단되면 다음 실행에서 같은 메시지가 다시 아카이브될 수 있습니다.
+    (아카이브 조회 시 같은 message_id는 마지막 기록 사용)
+
+사용법:
+    python message_retention.py            # 실행 조건을 만족하는 봇만 정리
+    python message_retention.py --force    # 조건과 관계없이 정리
+    python message_retention.py --bot=이름  # 특정 봇만
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from datetime import datetime
+from dotenv import load_dotenv
+
+from bot_registry import DEFAULT_PARTITION, partition_names, partition_file
+from message_archive import open_archive
+from message_log import open_message_log, message_key
+from state_store import atomic_write_json
+from telegram_context import parse_epoch
+
+# .env 파일 로드 (스케줄러에서 단독 실행되는 경우)
+load_dotenv()
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RETENTION_STATE_FILE = os.path.join(_BASE_DIR, "retention_state.json")
+
+RETENTION_DAYS = float(os.getenv("TELEGRAM_RETENTION_DAYS", "30"))  # 24h 이내는 컨텍스트용, 이 기간까지 참조용 보관
+RETENTION_INTERVAL = float(os.getenv("TELEGRAM_RETENTION_INTERVAL", "3600"))  # 타이머 실행 간격 (초)
+RETENTION_MAX_LOG_BYTES = int(os.getenv("TELEGRAM_RETENTION_MAX_LOG_BYTES", str(16 * 1024 * 1024)))  # 크기 기준
+
+
+def _load_state(partition):
+    path = partition_file(RETENTION_STATE_FILE, partition)
+    if not os.path.exists(path):
+        return {"last_run_at": 0.0}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ {os.path.basename(path)} 읽기 오류: {e}")
+        return {"last_run_at": 0.0}
+
+
+def retention_due(partition=DEFAULT_PARTITION):
+    """
+    정리 실행 조건 확인
+
+    Returns:
+        str or None: "timer" | "size" (실행 필요) 또는 None
+    """
+    if time.time() - _load_state(partition).get("last_run_at", 0.0) >= RETENTION_INTERVAL:
+        return "timer"
+    if open_message_log(partition).disk_size() > RETENTION_MAX_LOG_BYTES:
+        return "size"
+    return None
+
+
+def archive_expired(partition=DEFAULT_PARTITION, days=RETENTION_DAYS):
+    """
+    처리 완료 후 days일이 지난 메시지를 아카이브로 이동
+
+    Returns:
+        int: 이동한 메시지 수
+    """
+    log = open_message_log(partition)
+    cutoff = time.time() - days * 24 * 60 * 60
+
+    expired = [
+        msg for msg in log.messages()
+        if msg.get("processed", False) and parse_epoch(msg["timestamp"]) <= cutoff
+    ]
+    if not expired:
+        return 0
+
+    open_archive(partition).add(expired)
+    removed = log.delete_many([message_key(msg) for msg in expired])
+    # 삭제 레코드가 쌓인 오래된 세그먼트 회수
+    log.compact()
+    return removed
+
+
+def run_retention(partition=DEFAULT_PARTITION, force=False):
+    """
+    실행 조건을 만족하면 만료 메시지 정리
+
+    Args:
+        partition: 봇 (파티션)
+        force: 조건과 관계없이 실행
+
+    Returns:
+        int or None: 이동한 메시지 수 (실행하지 않았으면 None)
+    """
+    reason = "force" if force else retention_due(partition)
+    if reason is None:
+        return None
+
+    started = time.perf_counter()
+    moved = archive_expired(partition)
+    elapsed = time.perf_counter() - started
+
+    atomic_write_json(partition_file(RETENTION_STATE_FILE, partition), {
+        "last_run_at": time.time(),
+        "last_run_at_str": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "reason": reason,
+        "archived": moved,
+        "elapsed_seconds": round(elapsed, 3)
+    })
+    if moved:
+        print(f"🧹 [{partition}] {RETENTION_DAYS:g}일 초과 메시지 {moved}개 아카이브 이동 ({reason}, {elapsed:.2f}초)")
+    return moved
+
+
+def start_background_retention(partitions=None, check_interval=60):
+    """
+    백그라운드 스레드에서 주기적으로 실행 조건 확인 (수집기용)
+
+    Args:
+        partitions: 대상 봇 목록 (None이면 설정된 모든 봇)
+        check_interval: 조건 확인 간격 (초)
+
+    Returns:
+        threading.Thread
+    """
+    names = partitions or partition_names()
+
+    def _run():
+        while True:
+            for name in names:
+                try:
+                    run_retention(name)
+                except Exception as e:
+                    print(f"⚠️ [{name}] 메시지 정리 오류: {e}")
+            time.sleep(check_interval)
+
+    thread = threading.Thread(target=_run, name="message-retention", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    force = "--force" in sys.argv[1:]
+    names = [arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--bot=")] or partition_names()
+
+    for name in names:
+        moved = run_retention(name, force=force)
+        if moved is None:
+            print(f"⏭️ [{name}] 정리 조건 미충족 (다음 실행 대기)")
+        else:
+            print(f"✅ [{name}] 정리 완료: {moved}개 이동")
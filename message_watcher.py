@@ -0,0 +1,229 @@
+"""
+작업 중 새 메시지 감시 (백그라운드 확인 + 작업자별 감시 상태 파일)
+
+역할:
+- 작업 중 같은 채팅에 온 새 메시지를 백그라운드 스레드에서 확인
+  - 확인(Telegram 폴링 1회 + 미처리 메시지 확인)은 최소 MYBOT_WATCH_INTERVAL초 간격
+  - 간격 안에 여러 번 요청(poke)되면 간격이 끝날 때 한 번만 확인 (디바운스)
+  - 전송이 없으면 확인하지 않음 (경과 보고가 뜸한 작업에 불필요한 폴링을 하지 않음)
+- 감시 상태 파일 (watch_state.json, 작업자별): 마지막 확인 시각 / 커서 / 찾았지만 아직 보고하지 않은 메시지
+  - 한 번만 전송하고 끝나는 프로세스(python -c ...)가 이어져도 최소 간격이 프로세스 사이에서 유지됨
+    (다른 프로세스가 간격 안에 확인했으면 폴링하지 않고 그 결과를 이어받음)
+  - 마지막 확인 시각은 확인이 끝난 뒤에 기록 - 확인 중에는 짧은 예약(CLAIM_TTL)만 기록하므로
+    확인 도중 프로세스가 끝나도 다른 프로세스가 간격 내내 건너뛰지 않음
+  - Telegram 폴링은 대기 없이(timeout=0) 한 번만 - 전송 경로를 오래 붙잡지 않음
+  - 커서: 채팅별 마지막으로 확인한 message_id - 커서 이후 메시지만 확인
+  - 종료 전에 보고하지 못한 메시지는 다음 프로세스의 첫 전송에서 보고
+- 전송 경로(send_message_sync)는 new_count()만 읽음 (파일/네트워크 접근 없음, 상태 파일은 처음 한 번만 읽음)
+  - 0이 아닐 때만 take() → telegram_bot.claim_new_messages()로 진행 중 작업에 합침
+- 감시는 찾기만 하고 작업을 가져가지(임대) 않음 → 프로세스가 끝나도 메시지는 대기열에 남음
+  (프로세스 종료 시 진행 중인 확인은 최대 EXIT_WAIT초 기다림 - 그래도 못 끝내면 커서가 그대로라 다음 확인에서 다시 찾음)
+
+사용법:
+    from message_watcher import get_watcher
+
+    watcher = get_watcher()
+    if watcher.new_count():
+        new_msgs = claim_new_messages(watcher.take())
+    watcher.poke()   # 다음 확인 요청 (간격이 지나지 않았으면 간격 끝에 확인)
+"""
+
+import os
+import json
+import time
+import threading
+
+from bot_registry import partition_file
+from job_queue import current_worker
+from state_store import read_json, update_json
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WATCH_STATE_FILE = os.path.join(_BASE_DIR, "watch_state.json")
+WATCH_INTERVAL = float(os.getenv("MYBOT_WATCH_INTERVAL", "15"))  # 새 메시지 확인 최소 간격 (초)
+CLAIM_TTL = 30  # 확인 예약 유지 시간 (초) - 확인 도중 프로세스가 끝나면 이 시간 후 다른 프로세스가 확인
+EXIT_WAIT = 10  # 프로세스 종료 시 진행 중인 확인을 기다리는 최대 시간 (초)
+
+
+def _cursor_key(key):
+    """(봇, chat_id) → 상태 파일의 커서 키 (JSON 문자열)"""
+    return json.dumps(list(key))
+
+
+def _merge_state(data, cursor=None, found=None):
+    """상태 파일 내용에 커서/찾은 메시지를 합침 (커서는 큰 값 유지)"""
+    saved_cursor = data.setdefault("cursor", {})
+    for key, message_id in (cursor or {}).items():
+        key = _cursor_key(key)
+        saved_cursor[key] = max(saved_cursor.get(key, 0), message_id)
+    saved_found = data.setdefault("found", {})
+    for msg in found or []:
+        saved_found[str(msg["message_id"])] = msg
+
+
+class NewMessageWatcher:
+    """작업 중 새 메시지 백그라운드 감시 (프로세스당 1개, get_watcher())"""
+
+    def __init__(self, interval=WATCH_INTERVAL, state_file=None):
+        self.interval = interval
+        self.state_file = state_file or partition_file(WATCH_STATE_FILE, current_worker())
+        self.cursor = {}  # (봇, chat_id) → 마지막으로 확인한 message_id
+        self.last_check = None  # 마지막 확인 시각 (time.time, 다른 프로세스의 확인 포함)
+        self.checks = 0  # 이 프로세스가 실제로 폴링한 횟수
+        self._found = {}  # message_id → 메시지 (찾았지만 아직 take()하지 않은 것)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()  # 백그라운드 확인이 진행 중이 아님
+        self._idle.set()
+        self._thread = None
+        self._load(read_json(self.state_file, {}))
+
+    def _load(self, data):
+        """상태 파일 내용을 메모리에 반영 (커서는 큰 값 유지)"""
+        with self._lock:
+            if data.get("last_check") is not None:
+                self.last_check = max(self.last_check or 0, data["last_check"])
+            for key, message_id in data.get("cursor", {}).items():
+                key = tuple(json.loads(key))
+                self.cursor[key] = max(self.cursor.get(key, 0), message_id)
+            for msg in data.get("found", {}).values():
+                self._found[msg["message_id"]] = msg
+
+    def new_count(self):
+        """찾아 둔 새 메시지 수 (메모리 값만 읽음)"""
+        return len(self._found)
+
+    def take(self):
+        """
+        찾아 둔 새 메시지를 꺼냄 (꺼낸 메시지는 다시 보고하지 않음)
+
+        Returns:
+            list: 메시지 리스트 (message_id 순)
+        """
+        with self._lock:
+            found, self._found = self._found, {}
+        if found:
+            def remove(data):
+                for message_id in found:
+                    data.get("found", {}).pop(str(message_id), None)
+
+            update_json(self.state_file, remove, default={}, fsync=False)
+        return [found[message_id] for message_id in sorted(found)]
+
+    def poke(self):
+        """확인 요청 (백그라운드 스레드가 간격에 맞춰 확인)"""
+        self._start()
+        self._wake.set()
+
+    def check_once(self, force=False):
+        """
+        한 번 확인 (커서 이후 같은 채팅의 미처리 메시지)
+
+        다른 프로세스가 간격 안에 이미 확인했으면 폴링하지 않고 상태 파일의 결과를 이어받습니다.
+
+        Args:
+            force: 간격과 관계없이 확인
+
+        Returns:
+            int: 새로 찾은 메시지 수
+        """
+        from telegram_bot import find_new_messages
+
+        # 확인 차례 예약 (잠금 안에서 마지막 확인 시각/다른 프로세스의 예약을 보고 짧게 예약
+        # → 여러 프로세스가 동시에 폴링하지 않음, 예약한 프로세스가 확인 도중 끝나면 CLAIM_TTL 후 만료)
+        def claim(data):
+            now = time.time()
+            last = data.get("last_check")
+            if not force and ((last is not None and now - last < self.interval)
+                              or data.get("checking_until", 0) > now):
+                return dict(data)
+            data["checking_until"] = now + CLAIM_TTL
+            return None
+
+        skipped = update_json(self.state_file, claim, default={}, fsync=False)
+        if skipped is not None:
+            self._load(skipped)
+            return 0
+
+        self.checks += 1
+        with self._lock:
+            cursor = dict(self.cursor)
+        try:
+            messages = find_new_messages(cursor, timeout=0)
+        except Exception:
+            update_json(self.state_file, lambda data: data.pop("checking_until", None), default={}, fsync=False)
+            raise
+
+        # 확인이 끝난 뒤에 마지막 확인 시각 기록 (예약 해제)
+        checked_at = time.time()
+
+        def finish(data):
+            _merge_state(data, cursor, messages)
+            data["last_check"] = max(data.get("last_check") or 0, checked_at)
+            data.pop("checking_until", None)
+
+        update_json(self.state_file, finish, default={}, fsync=False)
+        self.last_check = checked_at
+        with self._lock:
+            for key, message_id in cursor.items():
+                self.cursor[key] = max(self.cursor.get(key, 0), message_id)
+            for msg in messages:
+                self._found[msg["message_id"]] = msg
+        return len(messages)
+
+    def wait_idle(self, timeout=EXIT_WAIT):
+        """
+        진행 중인 백그라운드 확인이 끝날 때까지 대기 (프로세스 종료 전 - 데몬 스레드는 종료 시 중단됨)
+
+        요청되어 차례가 된 확인이 아직 시작되지 않았으면 그 확인도 기다립니다.
+        (간격이 남은 확인은 기다리지 않음 - 다음 프로세스가 이어받음)
+
+        Returns:
+            bool: 진행 중인 확인이 없음 (시간 안에 끝남)
+        """
+        deadline = time.time() + timeout
+        while self._wake.is_set() and self._due() and time.time() < deadline:
+            time.sleep(0.05)
+        return self._idle.wait(max(0.0, deadline - time.time()))
+
+    def _due(self):
+        """최소 간격이 지나 확인할 차례인지"""
+        return self.last_check is None or time.time() >= self.last_check + self.interval
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="new-message-watcher", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+
+            # 간격 안에 들어온 요청은 모아서 간격이 끝날 때 한 번만 확인
+            if self.last_check is not None:
+                wait = self.last_check + self.interval - time.time()
+                if wait > 0:
+                    time.sleep(min(wait, self.interval))
+
+            self._idle.clear()
+            self._wake.clear()
+            try:
+                self.check_once()
+            except Exception as e:
+                print(f"⚠️ 새 메시지 확인 오류: {e}")
+            finally:
+                self._idle.set()
+
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_watcher():
+    """이 프로세스의 새 메시지 감시 객체"""
+    global _watcher
+
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = NewMessageWatcher()
+        return _watcher
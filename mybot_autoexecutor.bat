@@ -68,6 +68,10 @@ if %ERRORLEVEL% EQU 1 (
     echo [STALE] Claude idle ^>10min. Force-killing...>> "%LOG%"
     wmic process where "name='node.exe' and commandline like '%%claude%%' and commandline like '%%append-system-prompt-file%%'" delete >NUL 2>&1
     if exist "%LOCKFILE%" del "%LOCKFILE%" 2>NUL
+    REM 종료시킨 Claude가 가져간 작업은 바로 대기열로 (임대 만료를 기다리지 않음)
+    pushd "%ROOT%" >NUL 2>&1
+    python job_queue.py exited >> "%LOG%" 2>&1
+    popd >NUL 2>&1
     echo [STALE] Cleared stale state. Proceeding...>> "%LOG%"
     goto LOCK_OK
 )
@@ -90,6 +94,10 @@ set "CHECK_RESULT=%ERRORLEVEL%"
 popd >NUL 2>&1
 
 if %CHECK_RESULT% EQU 0 (
+    REM 한가한 틈에 오래된 메시지 아카이브 이동 (실행 조건 미충족 시 즉시 종료)
+    pushd "%ROOT%" >NUL 2>&1
+    python message_retention.py >> "%LOG%" 2>&1
+    popd >NUL 2>&1
     echo [NO_MESSAGE] No new messages. Exiting.>> "%LOG%"
     echo.>> "%LOG%"
     exit /b 0
@@ -124,7 +132,7 @@ REM Try to resume the most recent session first for context continuity
 echo [INFO] Attempting to resume most recent session...>> "%LOG%"
 call "%CLAUDE_EXE%" -p -c --dangerously-skip-permissions ^
   --append-system-prompt-file "%SPF%" ^
-  "텔레그램 메시지를 확인하고 처리할 것. 모든 API는 telegram_bot.py에 있고, 전송은 telegram_sender.py의 send_message_sync()를 사용한다. 새 메시지가 있으면: 1) telegram_bot.check_telegram()으로 확인, 2) telegram_bot.combine_tasks()로 합산, 3) telegram_sender.send_message_sync()로 즉시 답장, 4) telegram_bot.create_working_lock() 호출, 5) telegram_bot.reserve_memory_telegram() 호출, 6) telegram_bot.load_memory()로 메모리 조사, 7) 작업 실행(send_message_sync()로 중간 경과 보고), 8) telegram_bot.report_telegram() 호출, 9) telegram_bot.mark_done_telegram() 호출, 10) telegram_bot.remove_working_lock() 호출. 작업 끝나면, 바로 작업 완료하지 말고, 사용자에게 다음 작업 없는지 물어보고, 물어본 후 카운팅 하여, 3분 후에 텔레그램 새메시지 확인하며, 있으면 그것으로 작업 이어할 것 (이 루틴을 계속하고 사용자가 답변 없거나 종료하자고 하면 즉시 완전 종료) (그리고 텔레그램으로 진행상황 알릴때, 세부적인 진행 방법과 중요 이슈를 함께 알릴 것 (하지만 길지 않게 최대한 요약하여 알릴 것))" ^
+  "텔레그램 메시지를 확인하고 처리할 것. 모든 API는 telegram_bot.py에 있고, 전송은 telegram_sender.py의 send_message_sync()를 사용한다. 새 메시지가 있으면: 1) telegram_bot.check_telegram()으로 확인, 2) telegram_bot.combine_tasks()로 합산, 3) telegram_bot.create_working_lock() 호출 (False면 다른 작업자가 처리 중이므로 중단), 4) telegram_sender.send_message_sync()로 즉시 답장, 5) telegram_bot.reserve_memory_telegram() 호출, 6) telegram_bot.load_memory()로 메모리 조사, 7) 작업 실행(send_message_sync()로 중간 경과 보고), 8) telegram_bot.report_telegram() 호출, 9) telegram_bot.mark_done_telegram() 호출, 10) telegram_bot.remove_working_lock() 호출. 작업 끝나면, 바로 작업 완료하지 말고, 사용자에게 다음 작업 없는지 물어보고, 물어본 후 카운팅 하여, 3분 후에 텔레그램 새메시지 확인하며, 있으면 그것으로 작업 이어할 것 (이 루틴을 계속하고 사용자가 답변 없거나 종료하자고 하면 즉시 완전 종료) (그리고 텔레그램으로 진행상황 알릴때, 세부적인 진행 방법과 중요 이슈를 함께 알릴 것 (하지만 길지 않게 최대한 요약하여 알릴 것))" ^
   >> "%LOG%" 2>&1
 
 set "EC=%ERRORLEVEL%"
@@ -134,11 +142,14 @@ if %EC% NEQ 0 (
   echo [INFO] No previous session found. Starting new session...>> "%LOG%"
   call "%CLAUDE_EXE%" -p --dangerously-skip-permissions ^
     --append-system-prompt-file "%SPF%" ^
-    "텔레그램 메시지를 확인하고 처리할 것. 모든 API는 telegram_bot.py에 있고, 전송은 telegram_sender.py의 send_message_sync()를 사용한다. 새 메시지가 있으면: 1) telegram_bot.check_telegram()으로 확인, 2) telegram_bot.combine_tasks()로 합산, 3) telegram_sender.send_message_sync()로 즉시 답장, 4) telegram_bot.create_working_lock() 호출, 5) telegram_bot.reserve_memory_telegram() 호출, 6) telegram_bot.load_memory()로 메모리 조사, 7) 작업 실행(send_message_sync()로 중간 경과 보고), 8) telegram_bot.report_telegram() 호출, 9) telegram_bot.mark_done_telegram() 호출, 10) telegram_bot.remove_working_lock() 호출. 작업 끝나면, 바로 작업 완료하지 말고, 사용자에게 다음 작업 없는지 물어보고, 물어본 후 카운팅 하여, 3분 후에 텔레그램 새메시지 확인하며, 있으면 그것으로 작업 이어할 것 (이 루틴을 계속하고 사용자가 답변 없거나 종료하자고 하면 즉시 완전 종료) (그리고 텔레그램으로 진행상황 알릴때, 세부적인 진행 방법과 중요 이슈를 함께 알릴 것 (하지만 길지 않게 최대한 요약하여 알릴 것))" ^
+    "텔레그램 메시지를 확인하고 처리할 것. 모든 API는 telegram_bot.py에 있고, 전송은 telegram_sender.py의 send_message_sync()를 사용한다. 새 메시지가 있으면: 1) telegram_bot.check_telegram()으로 확인, 2) telegram_bot.combine_tasks()로 합산, 3) telegram_bot.create_working_lock() 호출 (False면 다른 작업자가 처리 중이므로 중단), 4) telegram_sender.send_message_sync()로 즉시 답장, 5) telegram_bot.reserve_memory_telegram() 호출, 6) telegram_bot.load_memory()로 메모리 조사, 7) 작업 실행(send_message_sync()로 중간 경과 보고), 8) telegram_bot.report_telegram() 호출, 9) telegram_bot.mark_done_telegram() 호출, 10) telegram_bot.remove_working_lock() 호출. 작업 끝나면, 바로 작업 완료하지 말고, 사용자에게 다음 작업 없는지 물어보고, 물어본 후 카운팅 하여, 3분 후에 텔레그램 새메시지 확인하며, 있으면 그것으로 작업 이어할 것 (이 루틴을 계속하고 사용자가 답변 없거나 종료하자고 하면 즉시 완전 종료) (그리고 텔레그램으로 진행상황 알릴때, 세부적인 진행 방법과 중요 이슈를 함께 알릴 것 (하지만 길지 않게 최대한 요약하여 알릴 것))" ^
     >> "%LOG%" 2>&1
   set "EC=%ERRORLEVEL%"
 )
 echo EXITCODE=%EC%>> "%LOG%"
+
+REM Claude가 끝났는데 완료되지 않은 작업은 바로 대기열로 (다음 실행에서 재개)
+python job_queue.py exited >> "%LOG%" 2>&1
 echo.>> "%LOG%"
 
 REM Lock 파일 삭제
@@ -0,0 +1,133 @@
+"""
+업데이트 오프셋 체크포인트 (Crash-safe Offset Checkpointing)
+
+역할:
+- 텔레그램 get_updates offset을 메시지 저장소와 분리하여 원자적으로 기록
+- 업데이트별 수집 기록(ingest journal)을 먼저 fsync한 뒤 체크포인트 전진
+- 재시작 시: 체크포인트 이후 업데이트만 다시 받고, 저널에 있는 업데이트는 건너뜀
+  → 작업 중복도, 업데이트 유실도 없음
+
+저장 구조:
+    telegram_offset.json     # {"last_update_id": 123, "updated_at": "..."}
+    telegram_ingest.jsonl    # {"update_id": 123, "status": "stored", "message_id": 45}
+
+처리 순서 (업데이트마다):
+    1. 메시지 레코드를 메시지 로그에 추가
+    2. 저널에 수집 기록 추가 (fsync)
+    3. 체크포인트 원자적 갱신 (임시 파일 + fsync + os.replace)
+    2~3 사이에 중단되면 재시작 시 저널로 중복 처리를 막습니다.
+    (리스너는 배치마다 state_store.group_commit() 사용: 1~2의 fsync를 모아 배치 끝에 한 번 수행한 뒤
+     체크포인트를 한 번만 갱신 → 체크포인트가 디스크에 기록되지 않은 저널/로그보다 앞서지 않음)
+"""
+
+import os
+import json
+from datetime import datetime
+
+from bot_registry import DEFAULT_PARTITION, partition_file
+from state_store import atomic_write_bytes, atomic_write_json, sync_file, after_group_commit
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+CHECKPOINT_FILE = os.path.join(_BASE_DIR, "telegram_offset.json")
+INGEST_JOURNAL_FILE = os.path.join(_BASE_DIR, "telegram_ingest.jsonl")
+JOURNAL_MAX_BYTES = 1024 * 1024  # 저널이 이 크기를 넘으면 체크포인트 이전 기록 정리
+
+
+class IngestCheckpoint:
+    """업데이트 오프셋 체크포인트 + 업데이트별 수집 저널"""
+
+    def __init__(self, checkpoint_file=CHECKPOINT_FILE, journal_file=INGEST_JOURNAL_FILE):
+        self.checkpoint_file = checkpoint_file
+        self.journal_file = journal_file
+        self.last_update_id = self._load_checkpoint()
+        self._updated_at = None
+        # 체크포인트 이후인데 이미 수집된 업데이트 (저널 기록 후 체크포인트 갱신 전 중단)
+        self.ingested = self._load_journal()
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self.checkpoint_file):
+            return 0
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                return json.load(f).get("last_update_id", 0)
+        except Exception as e:
+            print(f"⚠️ {os.path.basename(self.checkpoint_file)} 읽기 오류: {e}")
+            return 0
+
+    def _load_journal(self):
+        ingested = {}
+        if not os.path.exists(self.journal_file):
+            return ingested
+
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 중단으로 잘린 마지막 줄
+                if record["update_id"] > self.last_update_id:
+                    ingested[record["update_id"]] = record
+
+        # 체크포인트 이전 기록은 더 이상 필요 없으므로 정리
+        if os.path.getsize(self.journal_file) > JOURNAL_MAX_BYTES:
+            atomic_write_bytes(self.journal_file, "".join(
+                json.dumps(record, ensure_ascii=False) + "\n" for record in ingested.values()
+            ).encode("utf-8"))
+
+        return ingested
+
+    def next_offset(self, fallback_update_id=0):
+        """
+        get_updates에 넘길 offset
+
+        Args:
+            fallback_update_id: 체크포인트 도입 이전 저장소의 last_update_id (이전 버전 호환)
+        """
+        return max(self.last_update_id, fallback_update_id) + 1
+
+    def is_ingested(self, update_id):
+        """이미 수집 완료된 업데이트인지"""
+        return update_id <= self.last_update_id or update_id in self.ingested
+
+    def commit(self, update_id, status, message_id=None):
+        """
+        업데이트 1개 수집 완료 기록 후 체크포인트 전진
+
+        Args:
+            update_id: 텔레그램 update_id
+            status: "stored" | "merged" | "skipped" | "blocked"
+            message_id: 저장된 메시지 ID (있으면)
+        """
+        record = {
+            "update_id": update_id,
+            "status": status,
+            "message_id": message_id,
+            "at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            sync_file(f)
+        self.ingested[update_id] = record
+
+        if update_id > self.last_update_id:
+            self.last_update_id = update_id
+            self._updated_at = record["at"]
+            # 그룹 커밋 중이면 저널/로그 fsync 후 배치 끝에 한 번만 기록
+            if not after_group_commit(self._write_checkpoint):
+                self._write_checkpoint()
+        self.ingested = {uid: r for uid, r in self.ingested.items() if uid > self.last_update_id}
+
+    def _write_checkpoint(self):
+        atomic_write_json(self.checkpoint_file, {
+            "last_update_id": self.last_update_id,
+            "updated_at": self._updated_at
+        })
+
+
+def open_checkpoint(partition=DEFAULT_PARTITION):
+    """파티션(봇)별 체크포인트 열기 (telegram_offset_{partition}.json 등)"""
+    return IngestCheckpoint(
+        checkpoint_file=partition_file(CHECKPOINT_FILE, partition),
+        journal_file=partition_file(INGEST_JOURNAL_FILE, partition)
+    )
@@ -0,0 +1,170 @@
+"""
+적응형 폴링 스케줄러
+
+역할:
+- 대화 중(최근 활동 이후 ACTIVE_WINDOW 이내)에는 짧은 간격으로 폴링
+- 유휴 상태에서는 간격을 지수적으로 늘림 (최대 MAX_INTERVAL)
+- 텔레그램 RetryAfter(429)와 네트워크 오류는 지터를 섞은 백오프로 재시도
+- 판단 결과와 누적 통계를 polling_stats.json에 기록 (프로세스 간 상태 공유)
+  - 잠금 안에서 읽기-수정-쓰기: 통계는 이 프로세스가 더한 만큼만 합치고 마지막 활동 시각은 늦은 쪽 유지
+    (리스너와 quick_check가 동시에 저장해도 서로의 통계/활동을 덮어쓰지 않음)
+
+telegram_listener의 폴링 루프와 quick_check(check_telegram)의 1회 폴링이
+같은 상태 파일을 사용하므로, 스케줄러가 1분마다 실행되어도 유휴 중에는
+대부분의 실행이 API 호출 없이 끝납니다.
+
+사용법:
+    python poll_scheduler.py    # 현재 상태/통계 출력
+"""
+
+import os
+import json
+import time
+import random
+from datetime import datetime, timedelta
+
+from telegram.error import RetryAfter, NetworkError
+
+from state_store import update_json
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+POLL_STATS_FILE = os.path.join(_BASE_DIR, "polling_stats.json")
+
+BASE_INTERVAL = float(os.getenv("TELEGRAM_POLLING_INTERVAL", "10"))  # 유휴 백오프 시작 간격
+MIN_INTERVAL = float(os.getenv("TELEGRAM_POLL_MIN_INTERVAL", "1"))  # 대화 중 간격
+MAX_INTERVAL = float(os.getenv("TELEGRAM_POLL_MAX_INTERVAL", "300"))  # 유휴 간격 상한
+BACKOFF_FACTOR = float(os.getenv("TELEGRAM_POLL_BACKOFF", "2"))
+ACTIVE_WINDOW = float(os.getenv("TELEGRAM_POLL_ACTIVE_WINDOW", "300"))  # 마지막 활동 후 "대화 중" 유지 시간
+
+
+def _now_str(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class AdaptivePoller:
+    """활동 기반 폴링 간격 결정기 (상태는 state_file에 저장)"""
+
+    def __init__(self, state_file=POLL_STATS_FILE):
+        self.state_file = state_file
+        self.state = self._load()
+        self._synced_stats = dict(self.state["stats"])  # 마지막으로 파일과 맞춘 통계 (저장 시 차이만 합침)
+
+    def _load(self):
+        state = {
+            "interval": MIN_INTERVAL,
+            "next_poll_at": 0.0,
+            "last_activity_at": 0.0,
+            "consecutive_errors": 0,
+            "last_decision": "",
+            "stats": {"polls": 0, "skipped": 0, "messages": 0, "errors": 0, "retry_after": 0}
+        }
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                state.update({k: v for k, v in saved.items() if k in state})
+            except Exception as e:
+                print(f"⚠️ polling_stats.json 읽기 오류: {e}")
+        return state
+
+    def save(self):
+        """상태 저장 (잠금 안에서 파일의 최신 내용에 합친 뒤 교체)"""
+        def _merge(saved):
+            stats = saved.setdefault("stats", {})
+            for key, value in self.state["stats"].items():
+                stats[key] = stats.get(key, 0) + value - self._synced_stats.get(key, 0)
+            for key in ("interval", "next_poll_at", "consecutive_errors", "last_decision"):
+                saved[key] = self.state[key]
+            saved["last_activity_at"] = max(saved.get("last_activity_at", 0.0), self.state["last_activity_at"])
+            saved["next_poll_at_str"] = _now_str(saved["next_poll_at"]) if saved["next_poll_at"] else ""
+            saved["last_activity_at_str"] = _now_str(saved["last_activity_at"]) if saved["last_activity_at"] else ""
+            return saved
+
+        try:
+            # 폴링 간격 힌트일 뿐이므로 fsync 생략 (교체는 원자적 - 다른 프로세스가 잘린 파일을 읽지 않음)
+            saved = update_json(self.state_file, _merge, default={}, fsync=False)
+        except OSError as e:
+            print(f"⚠️ polling_stats.json 저장 오류: {e}")
+            return
+        self.state["stats"] = dict(saved["stats"])
+        self.state["last_activity_at"] = saved["last_activity_at"]
+        self._synced_stats = dict(saved["stats"])
+
+    def _schedule(self, delay, decision):
+        self.state["interval"] = delay
+        self.state["next_poll_at"] = time.time() + delay
+        self.state["last_decision"] = decision
+        self.save()
+
+    def is_active(self):
+        """최근 활동 이후 ACTIVE_WINDOW 이내인지"""
+        return time.time() - self.state["last_activity_at"] < ACTIVE_WINDOW
+
+    def should_poll_now(self):
+        """
+        지금 API를 호출할 차례인지 (1회성 실행용 - quick_check 등)
+
+        호출 차례가 아니면 건너뜀 통계만 기록합니다.
+        """
+        if time.time() >= self.state["next_poll_at"]:
+            return True
+        self.state["stats"]["skipped"] += 1
+        self.save()
+        return False
+
+    def record_result(self, message_count):
+        """폴링 성공 결과 반영 → 다음 간격 결정"""
+        stats = self.state["stats"]
+        stats["polls"] += 1
+        stats["messages"] += message_count
+        self.state["consecutive_errors"] = 0
+
+        if message_count > 0:
+            self.state["last_activity_at"] = time.time()
+            self._schedule(MIN_INTERVAL, f"활동 감지 ({message_count}개) → {MIN_INTERVAL:.0f}초")
+        elif self.is_active():
+            self._schedule(MIN_INTERVAL, f"대화 중 → {MIN_INTERVAL:.0f}초")
+        else:
+            previous = max(self.state["interval"], BASE_INTERVAL / BACKOFF_FACTOR)
+            interval = min(previous * BACKOFF_FACTOR, MAX_INTERVAL)
+            self._schedule(interval, f"유휴 백오프 → {interval:.0f}초")
+
+    def record_error(self, error):
+        """폴링 오류 반영 (RetryAfter는 지정 시간 + 지터, 그 외는 지수 백오프 + 지터)"""
+        stats = self.state["stats"]
+        stats["errors"] += 1
+        self.state["consecutive_errors"] += 1
+
+        if isinstance(error, RetryAfter):
+            stats["retry_after"] += 1
+            retry_after = error.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            delay = float(retry_after) + random.uniform(0, 1 + float(retry_after) * 0.1)
+            self._schedule(delay, f"RetryAfter {retry_after}초 → {delay:.1f}초")
+            return
+
+        # 네트워크/기타 오류: 연속 오류 횟수 기준 지수 백오프 (full jitter 하한 50%)
+        ceiling = min(BASE_INTERVAL * (BACKOFF_FACTOR ** (self.state["consecutive_errors"] - 1)), MAX_INTERVAL)
+        delay = random.uniform(ceiling * 0.5, ceiling)
+        kind = "네트워크 오류" if isinstance(error, NetworkError) else "오류"
+        self._schedule(delay, f"{kind} {self.state['consecutive_errors']}회 연속 → {delay:.1f}초")
+
+    def next_delay(self):
+        """다음 폴링까지 남은 시간 (초)"""
+        return max(0.0, self.state["next_poll_at"] - time.time())
+
+
+if __name__ == "__main__":
+    poller = AdaptivePoller()
+    state = poller.state
+    stats = state["stats"]
+    print("=" * 60)
+    print("적응형 폴링 상태")
+    print("=" * 60)
+    print(f"현재 간격: {state['interval']:.1f}초 ({'대화 중' if poller.is_active() else '유휴'})")
+    print(f"다음 폴링까지: {poller.next_delay():.1f}초")
+    print(f"마지막 판단: {state['last_decision']}")
+    print(f"폴링 {stats['polls']}회 / 건너뜀 {stats['skipped']}회 / 메시지 {stats['messages']}개")
+    print(f"오류 {stats['errors']}회 (RetryAfter {stats['retry_after']}회)")
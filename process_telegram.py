@@ -14,7 +14,7 @@ from telegram_bot import (
     combine_tasks,
     create_working_lock,
     reserve_memory_telegram,
-    load_memory,
+    iter_memory,
     get_task_dir,
     report_telegram,
     mark_done_telegram,
@@ -33,20 +33,24 @@ if not pending:
 # 2. 메시지 합산
 print(f"📝 {len(pending)}개 메시지 합산 중...")
 combined = combine_tasks(pending)
+bot_name = combined['bot']  # 메시지를 받은 봇 (응답/작업 폴더/메모리가 봇별로 분리됨)
 
-# 3. 즉시 답장
+# 3. 작업 가져오기 (작업 대기열 임대 - 답장 전에 가져가야 다른 작업자와 중복 답장 없음)
+print("🔒 작업 잠금 생성 중...")
+# (이 스크립트는 작업 정보를 출력하고 바로 끝나므로 하트비트 스레드/소유 프로세스를 기록하지 않음
+#  - 임대는 에이전트의 경과 보고(send_message_sync)마다, chat_scheduler 감시 중이면 스케줄러 하트비트로 연장)
+if not create_working_lock(combined['message_ids'], combined['combined_instruction'], partition=bot_name,
+                           chat_id=combined['chat_id']):
+    print("⚠️ 잠금 실패. 다른 작업자가 이미 처리 중입니다.")
+    sys.exit(1)
+
+# 4. 즉시 답장
 print("💬 즉시 답장 전송 중...")
 if len(combined['message_ids']) > 1:
     msg = f"✅ 작업을 시작했습니다! (총 {len(combined['message_ids'])}개 요청 합산 처리)"
 else:
     msg = "✅ 작업을 시작했습니다!"
-send_message_sync(combined['chat_id'], msg)
-
-# 4. 작업 잠금 생성
-print("🔒 작업 잠금 생성 중...")
-if not create_working_lock(combined['message_ids'], combined['combined_instruction']):
-    print("⚠️ 잠금 실패. 다른 작업이 진행 중입니다.")
-    sys.exit(1)
+send_message_sync(combined['chat_id'], msg, partition=bot_name)
 
 # 5. 메모리 예약
 print("💾 메모리 예약 중...")
@@ -54,16 +58,17 @@ reserve_memory_telegram(
     combined['combined_instruction'],
     combined['chat_id'],
     combined['all_timestamps'],
-    combined['message_ids']
+    combined['message_ids'],
+    partition=bot_name
 )
 
 # 6. 기존 메모리 로드
 print("📚 기존 메모리 로드 중...")
-memories = load_memory()
-print(f"   총 {len(memories)}개 메모리 발견")
+memories = list(iter_memory(limit=50, partition=bot_name))  # 최근 50개 (본문은 필요할 때 읽음)
+print(f"   최근 {len(memories)}개 메모리 발견")
 
 # 7. 작업 폴더로 이동
-task_dir = get_task_dir(combined['message_ids'][0])
+task_dir = get_task_dir(combined['message_ids'][0], partition=bot_name)
 print(f"📁 작업 폴더 이동: {task_dir}")
 os.chdir(task_dir)
 
@@ -73,6 +78,7 @@ print("📋 작업 정보:")
 print("="*60)
 print(f"메시지 ID: {combined['message_ids']}")
 print(f"Chat ID: {combined['chat_id']}")
+print(f"봇: {bot_name}")
 print(f"사용자: {combined.get('user_name', 'Unknown')}")
 print(f"타임스탬프: {combined['all_timestamps']}")
 print(f"\n지시사항:\n{combined['combined_instruction']}")
@@ -82,8 +88,9 @@ print("="*60)
 if combined.get('files'):
     print("\n📎 첨부 파일:")
     for file_info in combined['files']:
-        size_mb = file_info['size'] / 1024 / 1024
-        print(f"  - {file_info['type']}: {file_info['path']} ({size_mb:.2f} MB)")
+        size_mb = (file_info.get('size') or 0) / 1024 / 1024
+        location = file_info['path'] or "미다운로드 (지시사항의 '받기' 명령 참고)"
+        print(f"  - {file_info['type']}: {location} ({size_mb:.2f} MB)")
     print()
 
 print("\n✅ 스크립트 준비 완료. 이제 Claude Code가 작업을 수행할 수 있습니다.")
@@ -6,7 +6,7 @@
 Exit Codes:
   0: 새 메시지 없음 (즉시 종료)
   1: 새 메시지 있음 (Claude Code 실행 필요)
-  2: 다른 작업 진행 중 (working.json 잠금)
+  2: 다른 작업 진행 중 (이 작업자의 작업 대기열 임대)
 """
 
 import os
@@ -19,7 +19,7 @@ os.chdir(SCRIPT_DIR)
 from telegram_bot import check_telegram
 
 try:
-    # 새 메시지 확인 (working.json도 자동으로 확인됨)
+    # 새 메시지 확인 (작업 대기열의 진행 중 작업도 자동으로 확인됨)
     pending = check_telegram()
 
     if not pending:
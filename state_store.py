@@ -0,0 +1,338 @@
+"""
+상태 파일 저장 계층 (프로세스 간 잠금 + 원자적 쓰기)
+
+역할:
+- 권고 잠금 (file_lock): POSIX fcntl.flock / Windows msvcrt.locking, 잠금 전용 파일({경로}.lock) 사용
+  - 같은 프로세스 안에서는 스레드 잠금과 함께 사용하며, 같은 스레드에서 다시 잡아도 막히지 않음
+- 원자적 쓰기 (atomic_write_json / atomic_write_bytes): 같은 폴더의 고유 임시 파일에 쓰고 os.replace로 교체
+  → 읽는 쪽은 잠금 없이도 이전 내용 또는 새 내용 전체만 봄 (잘린 파일을 읽지 않음)
+- 읽기-수정-쓰기 (update_json / JsonStateFile.update): 잠금 안에서 최신 내용을 읽고 고친 뒤 원자적 쓰기
+  → 리스너와 에이전트가 동시에 써도 갱신이 사라지지 않음
+- 캐시 가능한 상태 파일 (JsonStateFile): 파일이 바뀌지 않았으면(stat) 다시 읽지 않음
+- 그룹 커밋 (group_commit): 블록 안의 쓰기는 fsync를 모아 블록 끝에 파일마다 한 번만 수행
+  - 교체(rename)는 즉시 보이므로 다른 프로세스는 바로 새 내용을 읽음 (전원 차단 대비 시점만 늦어짐)
+  - 다른 파일이 디스크에 기록된 뒤에만 써야 하는 것(체크포인트)은 after_group_commit()으로 블록 끝 fsync 후에 실행
+  - contextvars 기반이므로 asyncio 작업/스레드마다 따로 동작
+
+사용법:
+    from state_store import file_lock, atomic_write_json, update_json, JsonStateFile, group_commit
+
+    update_json(path, lambda data: data.setdefault("items", []).append(item), default={})
+
+    with group_commit():
+        for update in updates:
+            checkpoint.commit(...)   # fsync는 블록 끝에 한 번
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+LOCK_TIMEOUT = 30  # 잠금 대기 시간 (초) - 넘으면 TimeoutError
+_LOCK_POLL = 0.01
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+# 잠금 파일 경로 → {"rlock", "depth", "fd"} (같은 프로세스 안에서 재진입/스레드 간 직렬화)
+_held_locks = {}
+_held_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path, timeout=LOCK_TIMEOUT):
+    """
+    프로세스 간 배타 잠금 ({path}.lock 파일)
+
+    Args:
+        path: 보호할 파일/폴더 경로
+        timeout: 최대 대기 시간 (초)
+
+    Raises:
+        TimeoutError: timeout 안에 잠금을 얻지 못함
+    """
+    lock_path = path + ".lock"
+    with _held_locks_guard:
+        held = _held_locks.setdefault(lock_path, {"rlock": threading.RLock(), "depth": 0, "fd": None})
+
+    with held["rlock"]:
+        if held["depth"] == 0:
+            os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            deadline = time.monotonic() + timeout
+            while not _try_lock(fd):
+                if time.monotonic() > deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"잠금 대기 시간 초과: {lock_path}")
+                time.sleep(_LOCK_POLL)
+            held["fd"] = fd
+        held["depth"] += 1
+        try:
+            yield
+        finally:
+            held["depth"] -= 1
+            if held["depth"] == 0:
+                fd, held["fd"] = held["fd"], None
+                try:
+                    _unlock(fd)
+                finally:
+                    os.close(fd)
+
+
+# ----------------------------------------------------------------------
+# 그룹 커밋
+# ----------------------------------------------------------------------
+
+_commit_batch = contextvars.ContextVar("state_store_commit_batch", default=None)
+
+
+@contextmanager
+def group_commit():
+    """
+    블록 안의 fsync를 모아서 블록 끝에 한 번에 수행 (중첩 시 가장 바깥 블록 끝)
+
+    블록 끝 순서: 모아 둔 파일 fsync → after_group_commit()으로 등록한 작업 실행
+    (예: 저널/로그가 디스크에 기록된 뒤에만 체크포인트 전진)
+    """
+    if _commit_batch.get() is not None:
+        yield
+        return
+
+    batch = {"files": {}, "after": {}}
+    token = _commit_batch.set(batch)
+    try:
+        yield
+    finally:
+        _commit_batch.reset(token)
+        _flush(batch)
+
+
+def _flush(batch):
+    """모아 둔 파일/폴더 fsync 후 등록된 작업 실행"""
+    for path in batch["files"]:
+        try:
+            with open(path, "rb+") as f:
+                os.fsync(f.fileno())
+        except OSError:
+            pass  # 그 사이 교체/삭제된 파일 (새 파일은 그 쓰기에서 처리)
+
+    if os.name != "nt":
+        for folder in {os.path.dirname(path) or "." for path in batch["files"]}:
+            try:
+                fd = os.open(folder, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError:
+                pass
+
+    # 블록 밖에서 실행되므로 여기서 쓰는 파일은 즉시 fsync
+    for fn in batch["after"]:
+        fn()
+
+
+def sync_file(f, path=None):
+    """
+    열린 파일 fsync (그룹 커밋 블록 안이면 블록 끝으로 미룸)
+
+    Args:
+        f: 쓰기 모드로 연 파일 (flush는 여기서 수행)
+        path: 최종 경로 (임시 파일을 교체하는 경우 교체 후 경로)
+    """
+    f.flush()
+    batch = _commit_batch.get()
+    if batch is None:
+        os.fsync(f.fileno())
+    else:
+        batch["files"][path or f.name] = True
+
+
+def sync_in_group(path):
+    """
+    그룹 커밋 블록 안이면 블록 끝 fsync 대상에 추가 (블록 밖에서는 아무것도 하지 않음)
+
+    평소에는 fsync하지 않는 파일(메시지 로그 등)을, 블록 끝에 실행되는 작업(체크포인트)보다
+    먼저 디스크에 기록해야 할 때 사용합니다.
+    """
+    batch = _commit_batch.get()
+    if batch is not None:
+        batch["files"][path] = True
+
+
+def after_group_commit(fn):
+    """
+    그룹 커밋 블록 끝(fsync 후)에 fn() 실행 예약 (같은 fn은 한 번만)
+
+    Returns:
+        bool: 예약했으면 True, 블록 밖이면 False (호출한 쪽에서 바로 실행)
+    """
+    batch = _commit_batch.get()
+    if batch is None:
+        return False
+    batch["after"][fn] = True
+    return True
+
+
+# ----------------------------------------------------------------------
+# 원자적 쓰기 / 읽기
+# ----------------------------------------------------------------------
+
+def atomic_write_bytes(path, data, fsync=True):
+    """
+    임시 파일에 쓰고 교체 (중간에 중단되어도 이전 내용 유지)
+
+    임시 파일 이름에 프로세스/스레드 ID를 붙여 동시에 쓰는 쪽끼리 임시 파일을 덮어쓰지 않습니다.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            if fsync:
+                sync_file(f, path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_json(path, data, fsync=True):
+    """JSON으로 원자적 쓰기 (UTF-8, 들여쓰기 2)"""
+    atomic_write_bytes(path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"), fsync=fsync)
+
+
+def read_json(path, default=None):
+    """
+    JSON 읽기 (파일이 없거나 손상되면 default)
+
+    원자적 쓰기만 사용하면 잠금 없이 읽어도 잘린 파일을 보지 않습니다.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except ValueError as e:
+        print(f"⚠️ {os.path.basename(path)} 읽기 오류: {e}")
+        return default
+
+
+def update_json(path, fn, default=None, fsync=True):
+    """
+    잠금 안에서 읽기-수정-쓰기
+
+    Args:
+        path: JSON 파일 경로
+        fn: fn(data) - data를 직접 수정 (반환값은 그대로 돌려줌)
+        default: 파일이 없을 때의 초기값 (dict/list는 복사해서 사용)
+        fsync: 쓰기 후 fsync (그룹 커밋 블록 안이면 블록 끝)
+
+    Returns:
+        fn의 반환값
+    """
+    with file_lock(path):
+        data = read_json(path, None)
+        if data is None:
+            data = json.loads(json.dumps(default))
+        result = fn(data)
+        atomic_write_json(path, data, fsync=fsync)
+        return result
+
+
+def remove_file(path):
+    """잠금 안에서 파일 삭제 (없으면 무시)"""
+    with file_lock(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class JsonStateFile:
+    """
+    캐시 가능한 JSON 상태 파일
+
+    load()는 파일이 바뀌지 않았으면(mtime/크기/inode) 메모리의 값을 그대로 돌려주고,
+    update()는 잠금 안에서 최신 내용으로 고친 뒤 원자적으로 씁니다.
+    load()가 돌려준 값은 캐시와 공유되므로 직접 수정하지 말고 update()를 사용하세요.
+    """
+
+    def __init__(self, path, default_factory=dict, fsync=True):
+        self.path = path
+        self.default_factory = default_factory
+        self.fsync = fsync
+        self.data = None
+        self._stamp = None
+        self._lock = threading.RLock()
+
+    def _current_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def load(self):
+        """최신 내용 (바뀌지 않았으면 다시 읽지 않음)"""
+        with self._lock:
+            stamp = self._current_stamp()
+            if self.data is None or stamp != self._stamp:
+                data = read_json(self.path, None) if stamp is not None else None
+                self.data = data if data is not None else self.default_factory()
+                self._stamp = stamp
+            return self.data
+
+    def update(self, fn):
+        """
+        잠금 안에서 fn(data)로 수정 후 저장
+
+        Returns:
+            fn의 반환값
+        """
+        with self._lock, file_lock(self.path):
+            data = self.load()
+            result = fn(data)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            atomic_write_json(self.path, data, fsync=self.fsync)
+            self._stamp = self._current_stamp()
+            return result
+
+    def replace(self, data):
+        """전체 교체"""
+        def _replace(current):
+            if current is not data:
+                current.clear()
+                current.update(data)
+        return self.update(_replace)
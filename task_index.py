@@ -0,0 +1,551 @@
+"""
+작업 인덱스 (SQLite)
+
+역할:
+- tasks/index.json 대신 SQLite(WAL)에 작업 메타데이터 저장
+- (chat_id, message_id) 기본 키 + chat_id/timestamp 인덱스 → 조회/갱신이 전체 작업 수와 무관
+  - Telegram message_id는 채팅 안에서만 고유하므로 다른 채팅의 같은 ID 작업을 덮어쓰지 않음
+  - 이전 index.db(message_id 기본 키)는 처음 열 때 새 키로 다시 만듦
+- 여러 작업을 한 트랜잭션으로 갱신 (update_many)
+- 기존 tasks/index.json이 있으면 처음 열 때 가져오고 index.json.migrated로 이름 변경
+- 전문 검색: 지시사항/결과/봇 응답을 FTS5 역색인에 저장하고 BM25로 순위 매김
+  - 한글/한자/가나는 글자 2-gram, 영문/숫자는 단어 단위로 토큰화 (조사가 붙어도 검색됨)
+  - 작업/응답이 저장될 때마다 해당 작업만 다시 색인 (전체 재색인 없음)
+  - 영문/숫자는 접두어 검색, 색인으로 찾을 수 없는 짧은 검색어/결과 없는 검색어는 부분 문자열 검색으로 보완
+  - SQLite에 FTS5가 없으면 기존 부분 문자열 검색으로 대체
+
+저장 구조:
+    tasks/index.db          # 기본 봇
+    tasks/{봇이름}/index.db  # 팀별 봇
+
+사용법:
+    python task_index.py             # 작업 수/최근 작업 출력
+    python task_index.py search 검색어  # 전문 검색 (BM25)
+    python task_index.py --bot=이름
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from bot_registry import DEFAULT_PARTITION, task_root
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    message_id INTEGER NOT NULL,
+    timestamp TEXT,
+    instruction TEXT NOT NULL DEFAULT '',
+    keywords TEXT NOT NULL DEFAULT '[]',
+    result_summary TEXT NOT NULL DEFAULT '',
+    files TEXT NOT NULL DEFAULT '[]',
+    chat_id INTEGER,
+    task_dir TEXT,
+    PRIMARY KEY (chat_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_chat_id ON tasks (chat_id);
+CREATE INDEX IF NOT EXISTS idx_tasks_timestamp ON tasks (timestamp);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 전문 검색 (FTS5가 없는 SQLite에서는 생성하지 않음) - task_search의 rowid = task_text.id
+_SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_text (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER,
+    message_id INTEGER NOT NULL,
+    instruction TEXT NOT NULL DEFAULT '',
+    result TEXT NOT NULL DEFAULT '',
+    replies TEXT NOT NULL DEFAULT '',
+    UNIQUE (chat_id, message_id)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS task_search USING fts5(instruction, result, replies);
+CREATE VIRTUAL TABLE IF NOT EXISTS task_search_vocab USING fts5vocab(task_search, 'row');
+"""
+SEARCH_WEIGHTS = (2.0, 1.0, 0.5)  # BM25 컬럼 가중치: 지시사항, 결과, 봇 응답
+
+_TOKEN_RE = re.compile(r"[0-9a-z]+|[\u3040-\u30ff\u3131-\u318e\u4e00-\u9fff\uac00-\ud7a3]+")
+_ASCII_RE = re.compile(r"[0-9a-z]")
+
+_COLUMNS = ("message_id", "timestamp", "instruction", "keywords", "result_summary", "files", "chat_id", "task_dir")
+_KEY_COLUMNS = ("chat_id", "message_id")
+_ORDER = "ORDER BY message_id DESC, IFNULL(chat_id, 0) DESC"
+
+
+def _now_str():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def tokenize(text):
+    """
+    검색용 토큰 목록
+
+    영문/숫자는 단어 단위, 한글/한자/가나는 겹치는 글자 2-gram
+    예: "보고서 작성해줘 PDF" → ["보고", "고서", "작성", "성해", "해줘", "pdf"]
+    """
+    tokens = []
+    for run in _TOKEN_RE.findall((text or "").lower()):
+        if _ASCII_RE.match(run) or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _to_row(task):
+    return (
+        task["message_id"],
+        task.get("timestamp"),
+        task.get("instruction", ""),
+        json.dumps(task.get("keywords", []), ensure_ascii=False),
+        task.get("result_summary", ""),
+        json.dumps(task.get("files", []), ensure_ascii=False),
+        task.get("chat_id"),
+        task.get("task_dir"),
+    )
+
+
+def _from_row(row):
+    task = dict(zip(_COLUMNS, row))
+    task["keywords"] = json.loads(task["keywords"])
+    task["files"] = json.loads(task["files"])
+    return task
+
+
+class TaskIndex:
+    """파티션 하나의 작업 인덱스 (SQLite 연결은 프로세스 내에서 공유)"""
+
+    def __init__(self, db_path, legacy_json=None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._doc_count = None  # 검색 색인 문서 수 캐시 (색인 갱신 시 무효화)
+        self._data_version = None  # 문서 수를 센 시점의 PRAGMA data_version (다른 프로세스의 갱신 감지)
+
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL에서는 커밋마다 fsync 불필요
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.executescript(_SEARCH_SCHEMA)
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ SQLite FTS5 사용 불가 ({e}) - 부분 문자열 검색으로 대체")
+            self.fts_enabled = False
+
+        self._migrate_key()
+
+        if legacy_json and os.path.exists(legacy_json):
+            self._migrate_json(legacy_json)
+
+        if self.fts_enabled:
+            self._backfill_search()
+
+    def _columns(self, table):
+        """테이블 컬럼 이름 → 기본 키 순번 (0이면 기본 키 아님)"""
+        return {row[1]: row[5] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+
+    def _migrate_key(self):
+        """이전 index.db(message_id 기본 키)의 tasks/task_text를 (chat_id, message_id) 키로 다시 만들기"""
+        if self._columns("tasks").get("chat_id"):
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._columns("tasks").get("chat_id"):
+                    self._conn.rollback()  # 다른 프로세스가 먼저 이전함
+                    return
+                columns = ", ".join(_COLUMNS)
+                self._conn.execute("ALTER TABLE tasks RENAME TO tasks_legacy")
+                self._conn.execute("DROP INDEX IF EXISTS idx_tasks_chat_id")  # 새 테이블에 같은 이름으로 다시 만듦
+                self._conn.execute("DROP INDEX IF EXISTS idx_tasks_timestamp")
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        self._conn.execute(statement)
+                self._conn.execute(f"INSERT OR IGNORE INTO tasks ({columns}) SELECT {columns} FROM tasks_legacy")
+
+                # 검색 텍스트: id는 이전 message_id 그대로 (task_search의 rowid와 일치 - 다시 색인하지 않음)
+                if self.fts_enabled and "chat_id" not in self._columns("task_text"):
+                    self._conn.execute("ALTER TABLE task_text RENAME TO task_text_legacy")
+                    self._conn.execute(_SEARCH_SCHEMA.split(";")[0])
+                    self._conn.execute(
+                        "INSERT OR IGNORE INTO task_text (id, chat_id, message_id, instruction, result, replies) "
+                        "SELECT x.message_id, t.chat_id, x.message_id, x.instruction, x.result, x.replies "
+                        "FROM task_text_legacy AS x LEFT JOIN tasks_legacy AS t ON t.message_id = x.message_id"
+                    )
+                    self._conn.execute("DROP TABLE task_text_legacy")
+                self._conn.execute("DROP TABLE tasks_legacy")
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        print(f"📦 작업 인덱스: 작업 구분을 (chat_id, message_id)로 변경 ({self.db_path})")
+
+    def _migrate_json(self, path):
+        """기존 index.json 가져오기 (같은 채팅의 같은 message_id는 DB 값 유지)"""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                tasks = json.load(f).get("tasks", [])
+        except Exception as e:
+            print(f"⚠️ {path} 가져오기 실패: {e}")
+            return
+
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO tasks ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                [_to_row(task) for task in tasks]
+            )
+        os.replace(path, path + ".migrated")
+        if self.fts_enabled:
+            self._backfill_search()
+        print(f"📥 {os.path.basename(path)} → 작업 인덱스(SQLite)로 가져오기 완료 ({len(tasks)}개)")
+
+    def _backfill_search(self):
+        """검색 색인이 없는 작업 색인 (전문 검색 도입 이전 작업 / index.json 가져오기 직후)"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT chat_id, message_id, instruction, result_summary FROM tasks WHERE NOT EXISTS "
+                "(SELECT 1 FROM task_text AS x WHERE x.chat_id IS tasks.chat_id AND x.message_id = tasks.message_id)"
+            ).fetchall()
+            for chat_id, message_id, instruction, result_summary in rows:
+                self._index_text_locked(chat_id, message_id, instruction=instruction, summary=result_summary)
+        if rows:
+            print(f"🔎 작업 검색 색인 생성: {len(rows)}개")
+
+    def _index_text_locked(self, chat_id, message_id, instruction=None, result=None, reply=None, summary=None):
+        """
+        작업 하나의 검색 텍스트 갱신 (None인 항목은 유지, reply는 누적) - 트랜잭션 안에서 호출
+
+        summary: 결과 요약 - 저장된 결과 전문이 이 요약으로 시작하면 전문 유지
+        """
+        row = self._conn.execute(
+            "SELECT id, instruction, result, replies FROM task_text WHERE chat_id IS ? AND message_id = ?",
+            (chat_id, message_id)
+        ).fetchone()
+        text_id = row[0] if row else None
+        current = list(row[1:]) if row else ["", "", ""]
+        if instruction is not None:
+            current[0] = instruction
+        if result is not None:
+            current[1] = result
+        elif summary is not None and not current[1].startswith(summary):
+            current[1] = summary
+        if reply:
+            current[2] = f"{current[2]}\n{reply}" if current[2] else reply
+
+        if text_id is None:
+            text_id = self._conn.execute(
+                "INSERT INTO task_text (chat_id, message_id, instruction, result, replies) VALUES (?, ?, ?, ?, ?)",
+                (chat_id, message_id, *current)
+            ).lastrowid
+        else:
+            self._conn.execute("UPDATE task_text SET instruction = ?, result = ?, replies = ? WHERE id = ?",
+                               (*current, text_id))
+        self._doc_count = None
+        self._conn.execute("DELETE FROM task_search WHERE rowid = ?", (text_id,))
+        self._conn.execute(
+            "INSERT INTO task_search (rowid, instruction, result, replies) VALUES (?, ?, ?, ?)",
+            (text_id, *(" ".join(tokenize(text)) for text in current))
+        )
+
+    def index_text(self, message_id, instruction=None, result=None, reply=None, chat_id=None):
+        """
+        작업의 검색 텍스트 갱신 (해당 작업만 다시 색인)
+
+        Args:
+            message_id: 작업(메인 메시지) ID
+            instruction: 지시사항 (None이면 유지)
+            result: 결과 전문 (None이면 유지)
+            reply: 추가할 봇 응답 (기존 응답 뒤에 누적)
+            chat_id: 작업의 채팅 (None이면 그 message_id의 가장 최근 작업)
+        """
+        if not self.fts_enabled:
+            return
+        with self._lock, self._conn:
+            if chat_id is None:
+                row = self._conn.execute(f"SELECT chat_id FROM tasks WHERE message_id = ? {_ORDER} LIMIT 1",
+                                         (message_id,)).fetchone()
+                chat_id = row[0] if row else None
+            self._index_text_locked(chat_id, message_id, instruction, result, reply)
+
+    def upsert_many(self, tasks):
+        """
+        여러 작업 추가/수정 (한 트랜잭션, 검색 색인 포함)
+
+        작업에 "result_text"(결과 전문)가 있으면 요약 대신 전문을 색인합니다. (인덱스에는 저장 안 함)
+        없으면 요약을 색인하되, 이미 색인된 전문이 그 요약으로 시작하면 전문을 유지합니다.
+        """
+        if not tasks:
+            return
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        updates = ", ".join(f"{col} = excluded.{col}" for col in _COLUMNS if col not in _KEY_COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO tasks ({', '.join(_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT({', '.join(_KEY_COLUMNS)}) DO UPDATE SET {updates}",
+                [_to_row(task) for task in tasks]
+            )
+            if self.fts_enabled:
+                for task in tasks:
+                    self._index_text_locked(task.get("chat_id"), task["message_id"],
+                                            instruction=task.get("instruction", ""),
+                                            result=task.get("result_text"), summary=task.get("result_summary", ""))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)", (_now_str(),))
+
+    def replace_all(self, tasks):
+        """전체 교체 (기존 save_index() 호환용)"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tasks")
+        self.upsert_many(tasks)
+
+        # 빠진 작업의 검색 색인 삭제 (남은 작업의 결과 전문/봇 응답은 유지)
+        if self.fts_enabled:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "DELETE FROM task_text WHERE NOT EXISTS (SELECT 1 FROM tasks AS t "
+                    "WHERE t.chat_id IS task_text.chat_id AND t.message_id = task_text.message_id)"
+                )
+                self._conn.execute("DELETE FROM task_search WHERE rowid NOT IN (SELECT id FROM task_text)")
+                self._doc_count = None
+
+    def _query(self, where="", params=(), limit=None):
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM tasks {where} {_ORDER}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_from_row(row) for row in rows]
+
+    def get(self, message_id, chat_id=None):
+        """작업 하나 조회 (chat_id를 생략하면 그 message_id의 가장 최근 작업, 없으면 None)"""
+        if chat_id is None:
+            tasks = self._query("WHERE message_id = ?", (message_id,), limit=1)
+        else:
+            tasks = self._query("WHERE chat_id = ? AND message_id = ?", (chat_id, message_id))
+        return tasks[0] if tasks else None
+
+    def get_many(self, message_ids):
+        """여러 message_id 조회 (최신순, 다른 채팅의 같은 ID 작업 포함)"""
+        ids = list(message_ids)
+        if not ids:
+            return []
+        return self._query(f"WHERE message_id IN ({', '.join('?' * len(ids))})", ids)
+
+    def _get_by_text_ids(self, text_ids):
+        """검색 텍스트 id(task_search의 rowid) → 작업 (작업이 없는 id는 제외)"""
+        ids = list(text_ids)
+        if not ids:
+            return {}
+        columns = ", ".join(f"t.{col}" for col in _COLUMNS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT x.id, {columns} FROM task_text AS x JOIN tasks AS t "
+                f"ON t.chat_id IS x.chat_id AND t.message_id = x.message_id "
+                f"WHERE x.id IN ({', '.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {row[0]: _from_row(row[1:]) for row in rows}
+
+    def all(self, chat_id=None, since=None, limit=None):
+        """
+        작업 목록 (message_id 역순)
+
+        Args:
+            chat_id: 특정 채팅만
+            since: 이 시각 이후 메시지만 (예: "2026-10-01")
+            limit: 최대 개수
+        """
+        conditions, params = [], []
+        if chat_id is not None:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        return self._query(where, params, limit)
+
+    def iter_all(self, chat_id=None, since=None, page_size=200):
+        """
+        작업 목록을 페이지 단위로 순회 (message_id 역순, 필요한 만큼만 조회)
+
+        Args:
+            chat_id: 특정 채팅만
+            since: 이 시각 이후 메시지만
+            page_size: 한 번에 읽을 행 수
+        """
+        conditions, params = [], []
+        if chat_id is not None:
+            conditions.append("chat_id = ?")
+            params.append(chat_id)
+        if since:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+
+        last = None  # 이전 페이지 마지막 작업의 (message_id, chat_id) - 정렬 순서와 같은 기준으로 이어서 조회
+        while True:
+            page_conditions = conditions + (
+                ["(message_id < ? OR (message_id = ? AND IFNULL(chat_id, 0) < ?))"] if last is not None else [])
+            page_params = params + ([last[0], last[0], last[1]] if last is not None else [])
+            where = ("WHERE " + " AND ".join(page_conditions)) if page_conditions else ""
+            page = self._query(where, page_params, page_size)
+            yield from page
+            if len(page) < page_size:
+                return
+            last = (page[-1]["message_id"], page[-1]["chat_id"] or 0)
+
+    def message_ids(self):
+        """인덱스에 있는 모든 message_id"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT message_id FROM tasks")}
+
+    def set_task_dir(self, message_id, task_dir):
+        """작업 폴더 경로 갱신 (폴더 이전 후 - 폴더 이름이 msg_{message_id}이므로 같은 ID 작업 모두)"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE tasks SET task_dir = ? WHERE message_id = ?", (task_dir, message_id))
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def search_keyword(self, keyword):
+        """instruction 또는 keywords에 keyword가 포함된 작업 (기존 search_memory 방식)"""
+        pattern = "%" + keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return self._query("WHERE instruction LIKE ? ESCAPE '\\' OR keywords LIKE ? ESCAPE '\\'",
+                           (pattern, pattern))
+
+    def search(self, query, top_k=None):
+        """
+        BM25 순위 전문 검색 (+ 부분 문자열 검색 보완)
+
+        영문/숫자 단어는 접두어로도 찾습니다. ("report" → "reports")
+        2-gram 색인으로 찾을 수 없는 검색어(한 글자 한글 등)이거나 전문 검색 결과가 없으면
+        기존 부분 문자열 검색(search_keyword) 결과를 뒤에 붙입니다. (score 0)
+
+        Args:
+            query: 검색어 (여러 단어 가능 - 하나라도 포함하면 후보, 많이/드물게 일치할수록 상위)
+            top_k: 최대 결과 수 (None이면 전체 - 기존 search_memory와 동일)
+
+        Returns:
+            list: 작업 메타데이터 (관련도순, "score" 포함)
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+        if not self.fts_enabled:
+            return self.search_keyword(query)[:top_k]
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        results = self._search_ranked(tokens, top_k) if tokens else []
+
+        if not results or any(len(token) == 1 and not _ASCII_RE.match(token) for token in tokens):
+            found = {(task["chat_id"], task["message_id"]) for task in results}
+            for task in self.search_keyword(query):
+                if (task["chat_id"], task["message_id"]) not in found:
+                    task["score"] = 0.0
+                    results.append(task)
+        return results[:top_k]
+
+    def _search_ranked(self, tokens, top_k=None):
+        """FTS5 + BM25 검색 (tokens: tokenize() 결과)"""
+        with self._lock:
+            # 문서 수는 다른 프로세스가 색인을 갱신하면(data_version 변경) 다시 셈
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._doc_count is None or data_version != self._data_version:
+                self._doc_count = self._conn.execute("SELECT count(*) FROM task_text").fetchone()[0]
+                self._data_version = data_version
+
+            # 문서 빈도(df) 확인: 색인에 없는 토큰은 제외하고,
+            # 절반 넘는 작업에 있는 토큰(예: "해줘")은 BM25 IDF가 0이라 순위에 영향이 없으므로
+            # 후보를 넓히지 않도록 제외 (모든 토큰이 그런 경우는 그대로 사용)
+            # 영문/숫자는 접두어 검색이므로 그 접두어로 시작하는 단어 중 가장 많은 문서 수
+            doc_freq = {}
+            for token in tokens:
+                if _ASCII_RE.match(token):
+                    row = self._conn.execute(
+                        "SELECT max(doc) FROM task_search_vocab WHERE term >= ? AND term < ?",
+                        (token, token + "\uffff")
+                    ).fetchone()
+                else:
+                    row = self._conn.execute("SELECT doc FROM task_search_vocab WHERE term = ?", (token,)).fetchone()
+                if row and row[0]:
+                    doc_freq[token] = row[0]
+
+            tokens = [token for token in tokens if token in doc_freq]
+            if not tokens:
+                return []
+            selective = [token for token in tokens if doc_freq[token] <= self._doc_count / 2]
+            match = " OR ".join(f'"{token}"*' if _ASCII_RE.match(token) else f'"{token}"'
+                                for token in (selective or tokens))
+
+            rows = self._conn.execute(
+                "SELECT rowid, bm25(task_search, ?, ?, ?) AS rank FROM task_search "
+                "WHERE task_search MATCH ? ORDER BY rank LIMIT ?",
+                (*SEARCH_WEIGHTS, match, -1 if top_k is None else int(top_k))
+            ).fetchall()
+
+        tasks = self._get_by_text_ids(row[0] for row in rows)
+        results = []
+        for text_id, rank in rows:
+            task = tasks.get(text_id)
+            if task is not None:  # 봇 응답만 색인되고 작업은 아직 없는 경우 제외
+                task["score"] = round(-rank, 4)
+                results.append(task)
+        return results
+
+    def last_updated(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_updated'").fetchone()
+        return row[0] if row else _now_str()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    def to_dict(self):
+        """기존 index.json 형식 ({"tasks": [...], "last_updated": str})"""
+        return {"tasks": self.all(), "last_updated": self.last_updated()}
+
+
+# 파티션 → TaskIndex (프로세스 내 공유)
+_open_indexes = {}
+_open_indexes_lock = threading.Lock()
+
+
+def open_task_index(partition=DEFAULT_PARTITION):
+    """파티션(봇)의 작업 인덱스 열기 (tasks/index.db 또는 tasks/{봇이름}/index.db)"""
+    with _open_indexes_lock:
+        index = _open_indexes.get(partition)
+        if index is None:
+            root = task_root(partition)
+            index = TaskIndex(os.path.join(root, "index.db"), legacy_json=os.path.join(root, "index.json"))
+            _open_indexes[partition] = index
+        return index
+
+
+if __name__ == "__main__":
+    partition = next((arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--bot=")), DEFAULT_PARTITION)
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--bot=")]
+    index = open_task_index(partition)
+
+    # python task_index.py search <검색어>
+    if len(args) >= 2 and args[0] == "search":
+        for task in index.search(" ".join(args[1:]), top_k=20):
+            print(f"  [{task.get('score', 0):.2f}] msg_{task['message_id']} {task['instruction'][:60]}")
+        sys.exit(0)
+
+    print(f"작업 인덱스: {index.db_path}")
+    print(f"작업 수: {len(index)}개 (마지막 갱신: {index.last_updated()})")
+    for task in index.all(limit=10):
+        print(f"  msg_{task['message_id']} [{task['timestamp']}] {task['instruction'][:50]}")
@@ -0,0 +1,231 @@
+"""
+작업 폴더 배치 (샤딩)
+
+역할:
+- 작업 폴더를 message_id 해시 앞 2글자 폴더로 분산 (tasks/ab/msg_5/)
+  - 평면 구조(tasks/msg_5/)는 작업이 수만 개가 되면 폴더 목록/생성이 느려짐
+  - 256개 폴더로 고르게 나뉨 (attachments/blobs/와 같은 방식)
+- resolve_task_dir(): 기존 평면 폴더가 남아 있으면 그 경로, 없으면 샤딩 경로
+  → 이전 전/중/후 어느 상태에서도 같은 함수로 폴더를 찾음
+- resolve_task_path(): 메시지 로그/아카이브에 저장된 평면 폴더 파일 경로 → 현재 경로 (읽을 때 변환)
+- 기존 평면 폴더 이전 명령 (중단 후 다시 실행하면 남은 폴더부터 이어서 처리)
+- 채팅별 폴더 (chats/chat_123/): 채팅 작업자의 실행 로그/임시 파일 (chat_scheduler.py)
+
+저장 구조:
+    tasks/
+    ├── index.db
+    ├── 3f/msg_5/       # 샤딩 경로
+    ├── msg_7/          # 아직 이전하지 않은 평면 폴더 (그대로 사용 가능)
+    └── team_a/8c/msg_9/
+    chats/
+    ├── chat_123/       # 채팅별 폴더 (worker.log 등)
+    └── team_a/chat_456/
+
+사용법:
+    python task_layout.py            # 현황 (평면/샤딩 폴더 수)
+    python task_layout.py migrate    # 평면 폴더를 샤딩 경로로 이전 (모든 봇)
+    python task_layout.py migrate --bot=이름
+"""
+
+import os
+import sys
+import shutil
+import filecmp
+import hashlib
+
+from bot_registry import DEFAULT_PARTITION, partition_names, partition_dir, task_root
+from task_index import open_task_index
+
+CHATS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chats")
+SHARD_CHARS = 2  # 해시 앞 2글자 → 256개 폴더
+
+
+def task_shard(message_id):
+    """message_id의 샤드 폴더 이름 (SHA-256 앞 2글자)"""
+    return hashlib.sha256(str(message_id).encode("utf-8")).hexdigest()[:SHARD_CHARS]
+
+
+def is_shard_name(name):
+    """샤드 폴더 이름인지 (팀별 봇 폴더와 구분)"""
+    return len(name) == SHARD_CHARS and all(c in "0123456789abcdef" for c in name.lower())
+
+
+def sharded_task_dir(message_id, partition=DEFAULT_PARTITION):
+    """샤딩 경로 (tasks/ab/msg_5)"""
+    return os.path.join(task_root(partition), task_shard(message_id), f"msg_{message_id}")
+
+
+def legacy_task_dir(message_id, partition=DEFAULT_PARTITION):
+    """평면 경로 (tasks/msg_5)"""
+    return os.path.join(task_root(partition), f"msg_{message_id}")
+
+
+def resolve_task_dir(message_id, partition=DEFAULT_PARTITION):
+    """
+    작업 폴더 경로 (폴더를 만들지는 않음)
+
+    아직 이전하지 않은 평면 폴더가 있으면 그 경로, 아니면 샤딩 경로
+    """
+    legacy = legacy_task_dir(message_id, partition)
+    if os.path.isdir(legacy):
+        return legacy
+    return sharded_task_dir(message_id, partition)
+
+
+def resolve_task_path(path):
+    """
+    작업 폴더 안 파일의 저장된 경로를 현재 위치로 (평면 폴더 이전 후에는 샤딩 경로)
+
+    메시지 로그/아카이브의 첨부 파일 경로는 받을 당시의 절대 경로이므로 읽을 때 변환합니다.
+    작업 폴더 밖 경로나 지금 있는 경로는 그대로 돌려줍니다.
+    """
+    if not path or os.path.exists(path):
+        return path
+    try:
+        parts = os.path.relpath(os.path.abspath(path), task_root()).split(os.sep)
+    except ValueError:  # Windows: 다른 드라이브
+        return path
+
+    # tasks/msg_5/... (기본 봇) 또는 tasks/{봇이름}/msg_5/... (팀별 봇)
+    for partition, depth in ((DEFAULT_PARTITION, 0), (parts[0], 1)):
+        if depth and (parts[0] == os.pardir or is_shard_name(parts[0])):
+            break
+        message_id = _message_id_of(parts[depth]) if len(parts) > depth + 1 else None
+        if message_id is not None:
+            return os.path.join(resolve_task_dir(message_id, partition), *parts[depth + 1:])
+    return path
+
+
+def chat_dir(chat_id, partition=DEFAULT_PARTITION):
+    """채팅별 폴더 경로 (chats/chat_123, 팀별 봇은 chats/{봇이름}/chat_123) - 없으면 생성"""
+    path = os.path.join(partition_dir(CHATS_DIR, partition), f"chat_{chat_id}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _message_id_of(folder_name):
+    if not folder_name.startswith("msg_"):
+        return None
+    try:
+        return int(folder_name[4:])
+    except ValueError:
+        return None
+
+
+def iter_task_dirs(partition=DEFAULT_PARTITION):
+    """
+    모든 작업 폴더 순회 (평면 + 샤딩)
+
+    Yields:
+        tuple: (message_id, 폴더 경로)
+    """
+    root = task_root(partition)
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        message_id = _message_id_of(name)
+        if message_id is not None:
+            yield message_id, path
+        elif is_shard_name(name) and os.path.isdir(path):
+            for sub_name in os.listdir(path):
+                message_id = _message_id_of(sub_name)
+                if message_id is not None:
+                    yield message_id, os.path.join(path, sub_name)
+
+
+def _merge_into(src, dst):
+    """
+    src 폴더 내용을 dst로 옮기기 후 src 삭제
+
+    dst에 같은 이름의 파일이 있으면 내용이 같을 때만 src 쪽을 버리고,
+    다르면 "이름.legacy.확장자"(겹치면 번호)로 옮겨 둘 다 유지합니다.
+    """
+    for name in os.listdir(src):
+        src_path = os.path.join(src, name)
+        dst_path = os.path.join(dst, name)
+        if os.path.isdir(src_path) and os.path.isdir(dst_path):
+            _merge_into(src_path, dst_path)
+            continue
+        if os.path.exists(dst_path):
+            if os.path.isfile(src_path) and os.path.isfile(dst_path) and filecmp.cmp(src_path, dst_path, shallow=False):
+                os.remove(src_path)
+                continue
+            stem, ext = os.path.splitext(name)
+            dst_path = os.path.join(dst, f"{stem}.legacy{ext}")
+            n = 1
+            while os.path.exists(dst_path):
+                n += 1
+                dst_path = os.path.join(dst, f"{stem}.legacy{n}{ext}")
+            print(f"   ⚠️ 같은 이름의 다른 파일 유지: {os.path.relpath(dst_path, dst)}")
+        shutil.move(src_path, dst_path)
+    os.rmdir(src)
+
+
+def migrate_partition(partition=DEFAULT_PARTITION):
+    """
+    평면 폴더(tasks/msg_*)를 샤딩 경로로 이전
+
+    폴더 하나씩 이름 변경(같은 드라이브 안이므로 원자적)으로 옮기므로
+    중간에 중단되어도 다시 실행하면 남은 폴더만 처리합니다.
+    사용 중인 폴더(Windows에서 열린 파일/현재 폴더)는 건너뛰고 다음 실행에서 다시 시도합니다.
+
+    Returns:
+        tuple: (이전한 폴더 수, 건너뛴 폴더 수)
+    """
+    root = task_root(partition)
+    if not os.path.isdir(root):
+        return 0, 0
+
+    index = open_task_index(partition)
+
+    moved, skipped = 0, 0
+    pending = sorted(message_id for message_id in map(_message_id_of, os.listdir(root)) if message_id is not None)
+    for count, message_id in enumerate(pending, 1):
+        src = legacy_task_dir(message_id, partition)
+        dst = sharded_task_dir(message_id, partition)
+        try:
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            if os.path.exists(dst):
+                # 이전 도중 같은 작업의 샤딩 폴더가 생긴 경우 (예: 중단 후 새 첨부 파일)
+                _merge_into(src, dst)
+            else:
+                os.rename(src, dst)
+            moved += 1
+        except OSError as e:
+            print(f"⚠️ msg_{message_id} 이전 건너뜀: {e}")
+            skipped += 1
+            continue
+
+        index.set_task_dir(message_id, dst)
+        if count % 1000 == 0:
+            print(f"   ... {count}/{len(pending)}")
+
+    return moved, skipped
+
+
+def layout_status(partition=DEFAULT_PARTITION):
+    """(평면 폴더 수, 샤딩 폴더 수)"""
+    root = task_root(partition)
+    flat, sharded = 0, 0
+    for _, path in iter_task_dirs(partition):
+        if os.path.dirname(path) == root:
+            flat += 1
+        else:
+            sharded += 1
+    return flat, sharded
+
+
+if __name__ == "__main__":
+    names = [arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--bot=")] or partition_names()
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--bot=")]
+
+    if args and args[0] == "migrate":
+        for name in names:
+            print(f"📦 [{name}] 작업 폴더 이전 시작: {task_root(name)}")
+            moved, skipped = migrate_partition(name)
+            print(f"✅ [{name}] 이전 {moved}개" + (f", 건너뜀 {skipped}개 (다시 실행하면 이어서 처리)" if skipped else ""))
+    else:
+        for name in names:
+            flat, sharded = layout_status(name)
+            print(f"[{name}] {task_root(name)} - 평면 {flat}개 / 샤딩 {sharded}개")
@@ -7,46 +7,83 @@
 - check_telegram() - 새로운 명령 확인 (최근 24시간 대화 내역 포함)
 - report_telegram() - 결과 전송 및 메모리 저장
 - mark_done_telegram() - 처리 완료 표시
-- load_memory() - 기존 메모리 로드 (bot.py와 공유)
+- load_memory() - 기존 메모리 리스트 (최신순, limit/since/chat_id)
+- iter_memory() - 기존 메모리 순회 (load_memory와 같은 순서, 본문은 필요할 때 읽음)
 - reserve_memory_telegram() - 작업 시작 시 메모리 예약
+- fetch_attachment() - 지연 모드 첨부 파일 다운로드 (처음 접근 시)
+- search_history() - 대화 원문 검색 (메시지 로그 → 월별 아카이브 순)
+
+여러 작업자 (MYBOT_WORKER_ID):
+- 작업은 메시지별로 작업 대기열(job_queue.py, jobs.db)에 등록되고, 작업자는 create_working_lock()으로
+  원자적으로 가져갑니다. 작업자마다 MYBOT_WORKER_ID를 다르게 주면 같은 메시지를 두 번 처리하지 않고 병렬 처리합니다.
+- 채팅별 잠금: 한 채팅은 한 작업자만 처리하고, combine_tasks()는 한 채팅의 메시지만 합산합니다.
+  (chat_scheduler.py가 채팅마다 작업자를 실행 - MYBOT_WORKER_CHAT)
+
+여러 봇 (TELEGRAM_BOT_TOKENS):
+- check_telegram()은 모든 봇의 대기 메시지를 반환하며 각 작업에 "bot" 필드를 붙입니다.
+- 이후 함수들은 partition 인자(= 봇 이름)로 같은 봇의 메시지 로그/작업 폴더/인덱스를 사용합니다.
+  (생략하면 기본 봇 - 기존 동작과 동일)
 """
 
 import os
+import re
+import sys
 import json
 import time
-from datetime import datetime, timedelta
+from datetime import datetime
 from telegram_sender import send_files_sync, run_async_safe
+from message_log import open_message_log, message_key
+from telegram_context import build_24h_contexts, EMPTY_CONTEXT
+from context_assembler import assemble_context, estimate_tokens, CONTEXT_TOKEN_BUDGET
+from task_index import open_task_index
+from bot_registry import DEFAULT_PARTITION, partition_names, get_token, partition_file
+from task_layout import resolve_task_dir, resolve_task_path, iter_task_dirs, chat_dir
+from state_store import update_json, read_json, remove_file
+from job_queue import (open_job_queue, current_worker, assigned_chat, format_time, owner_info, job_stopped,
+                       job_key, Heartbeat, HEARTBEAT_INTERVAL, HEARTBEAT_TTL, MAX_ATTEMPTS)
 
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 MESSAGES_FILE = os.path.join(_BASE_DIR, "telegram_messages.json")
 TASKS_DIR = os.path.join(_BASE_DIR, "tasks")
-INDEX_FILE = os.path.join(_BASE_DIR, "tasks", "index.json")
-WORKING_LOCK_FILE = os.path.join(_BASE_DIR, "working.json")
-NEW_INSTRUCTIONS_FILE = os.path.join(_BASE_DIR, "new_instructions.json")  # 🆕 작업 중 새 지시사항
-WORKING_LOCK_TIMEOUT = 1800  # 30분: 이 시간 이상 잠금 파일이 있으면 스탈로 판단
+INDEX_FILE = os.path.join(_BASE_DIR, "tasks", "index.json")  # 이전 형식 (task_index.py가 index.db로 가져옴)
+WORKING_LOCK_FILE = os.path.join(_BASE_DIR, "working.json")  # 이전 형식 (작업 대기열 jobs.db로 옮김)
+NEW_INSTRUCTIONS_FILE = os.path.join(_BASE_DIR, "new_instructions.json")  # 🆕 작업 중 새 지시사항 (작업자별)
+MAX_LISTED_FILES = 20  # 요청 하나에 자세히 적는 첨부 파일 수 (나머지는 개수만, 전체는 combined["files"])
+WORKING_LOCK_TIMEOUT = 1800  # 30분: 하트비트 스레드가 없는 작업자의 임대 유지 시간 (경과 보고마다 연장)
 
+_heartbeat = None  # 이 프로세스의 하트비트 스레드 (create_working_lock(heartbeat=True))
+_last_activity = 0.0  # 이 프로세스에서 마지막으로 임대를 연장한 시각 (time.monotonic)
 
-def load_telegram_messages():
-    """telegram_messages.json 로드"""
-    if not os.path.exists(MESSAGES_FILE):
-        return {"messages": [], "last_update_id": 0}
 
+def _lease_ttl():
+    """임대 유지 시간 - 하트비트 스레드(이 프로세스 또는 chat_scheduler 감시)가 있으면 짧게"""
+    if _heartbeat is not None or os.getenv("MYBOT_SUPERVISED"):
+        return HEARTBEAT_TTL
+    return WORKING_LOCK_TIMEOUT
+
+
+def load_telegram_messages(partition=DEFAULT_PARTITION):
+    """
+    메시지 로그 로드 (기존 telegram_messages.json 형식으로 반환)
+
+    메시지 로그는 프로세스 내에서 공유되므로 여러 번 호출해도 파일 전체를
+    다시 읽지 않습니다. (다른 프로세스가 추가한 부분만 읽음)
+    반환된 메시지 dict는 캐시와 공유되므로 수정하려면 log.update()를 사용하세요.
+    """
     try:
-        with open(MESSAGES_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return open_message_log(partition).to_dict()
     except Exception as e:
-        print(f"⚠️ telegram_messages.json 읽기 오류: {e}")
+        print(f"⚠️ 메시지 로그 읽기 오류: {e}")
         return {"messages": [], "last_update_id": 0}
 
 
-def save_telegram_messages(data):
-    """telegram_messages.json 저장"""
-    with open(MESSAGES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def save_telegram_messages(data, partition=DEFAULT_PARTITION):
+    """메시지 전체 저장 (전체 교체 - 일부 변경은 메시지 로그의 append/update 사용)"""
+    open_message_log(partition).replace_all(data)
 
 
-def save_bot_response(chat_id, text, reply_to_message_ids, files=None):
+def save_bot_response(chat_id, text, reply_to_message_ids, files=None, partition=DEFAULT_PARTITION):
     """
     봇 응답을 telegram_messages.json에 저장 (대화 컨텍스트 유지)
 
@@ -55,12 +92,20 @@ def save_bot_response(chat_id, text, reply_to_message_ids, files=None):
         text: 봇 응답 메시지
         reply_to_message_ids: 응답 대상 메시지 ID (리스트)
         files: 전송한 파일 리스트 (선택)
+        partition: 응답한 봇 (기본 봇이면 생략)
     """
-    data = load_telegram_messages()
+    log = open_message_log(partition)
+
+    # 봇 메시지 ID (고유) - 같은 메시지에 여러 번 응답한 경우 번호 추가
+    bot_message_id = f"bot_{reply_to_message_ids[0]}"
+    suffix = 2
+    while (chat_id, bot_message_id) in log:
+        bot_message_id = f"bot_{reply_to_message_ids[0]}_{suffix}"
+        suffix += 1
 
     # 봇 응답 메시지 데이터
     bot_message = {
-        "message_id": f"bot_{reply_to_message_ids[0]}",  # 봇 메시지 ID (고유)
+        "message_id": bot_message_id,
         "type": "bot",  # 메시지 타입
         "chat_id": chat_id,
         "text": text,
@@ -69,76 +114,128 @@ def save_bot_response(chat_id, text, reply_to_message_ids, files=None):
         "reply_to": reply_to_message_ids,  # 어떤 메시지에 대한 응답인지
         "processed": True  # 봇 메시지는 항상 processed
     }
+    if partition != DEFAULT_PARTITION:
+        bot_message["bot"] = partition
+
+    log.append(bot_message)
 
-    data["messages"].append(bot_message)
-    save_telegram_messages(data)
+    # 메모리 검색 색인에 응답 추가 (작업 = 첫 번째 대상 메시지)
+    open_task_index(partition).index_text(reply_to_message_ids[0], reply=text, chat_id=chat_id)
 
     print(f"📝 봇 응답 저장 완료 (reply_to: {reply_to_message_ids})")
 
 
-def check_working_lock():
+def _message_keys(message_ids, chat_id=None, partition=DEFAULT_PARTITION):
     """
-    작업 잠금 파일 확인. 마지막 활동(경과 보고) 기준 30분 타임아웃.
+    message_id 리스트 → 메시지 키 (chat_id, message_id) 리스트 (message_id는 채팅 안에서만 고유)
 
-    Returns:
-        dict or None: 잠금 정보 (존재하면) 또는 None
-        특수 케이스: {"stale": True, ...} - 스탈 작업 (재시작 필요)
+    chat_id를 생략하면 이 작업자의 진행 중 작업 → 메시지 로그(그 ID의 가장 최근 메시지) 순으로 채팅을 찾습니다.
     """
+    if chat_id is not None:
+        return [(chat_id, message_id) for message_id in message_ids]
+
+    active = {job["message_id"]: job_key(job) for job in open_job_queue().active(current_worker())
+              if job["bot"] == partition}
+    log = open_message_log(partition)
+    keys = []
+    for message_id in message_ids:
+        key = active.get(message_id)
+        if key is None:
+            msg = log.get(message_id)
+            key = message_key(msg) if msg else (None, message_id)
+        keys.append(key)
+    return keys
+
+
+def _import_legacy_working_lock(queue):
+    """이전 형식 working.json이 남아 있으면 작업 대기열 임대로 옮기고 삭제"""
     if not os.path.exists(WORKING_LOCK_FILE):
-        return None
-
+        return
     try:
         with open(WORKING_LOCK_FILE, "r", encoding="utf-8") as f:
             lock_info = json.load(f)
+        message_ids = lock_info.get("message_id")
+        if not isinstance(message_ids, list):
+            message_ids = [message_ids]
+        last_activity = datetime.strptime(lock_info.get("last_activity", lock_info.get("started_at")),
+                                          "%Y-%m-%d %H:%M:%S").timestamp()
+        ttl = last_activity + WORKING_LOCK_TIMEOUT - time.time()  # 만료 시각 유지 (이미 지났으면 바로 회수)
+        partition = lock_info.get("bot", DEFAULT_PARTITION)
+        queue.lease(current_worker(), partition, _message_keys(message_ids, lock_info.get("chat_id"), partition), ttl,
+                    summary=lock_info.get("instruction_summary"))
+        queue.start(current_worker())
+        print(f"📦 working.json → 작업 대기열로 이전: message_id={message_ids}")
     except Exception as e:
-        print(f"⚠️ working.json 읽기 오류: {e}")
+        print(f"⚠️ working.json 이전 오류: {e} (삭제)")
+    try:
+        os.remove(WORKING_LOCK_FILE)
+    except OSError:
+        pass
+
+
+def check_working_lock():
+    """
+    이 작업자(MYBOT_WORKER_ID)의 진행 중 작업 확인 (작업 대기열 임대 기준)
+
+    하트비트 스레드가 있으면 임대는 몇 초마다 HEARTBEAT_TTL만큼 연장되고, 없으면 경과 보고
+    (update_working_activity)마다 연장되며 마지막 활동 후 WORKING_LOCK_TIMEOUT이 지나면 만료됩니다.
+    만료 전에는 소유 프로세스가 종료되었어도 스탈로 보지 않습니다. 스탈 작업은 check_telegram()이 회수합니다.
+
+    Returns:
+        dict or None: 진행 중 작업 정보 (없으면 None)
+        {"message_id", "instruction_summary", "started_at", "last_activity", "count", "bot", "chat_id", "worker",
+         "owner_pid", "owner_host", "owner_started"}
+        특수 케이스: {"stale": True, ...} - 임대 만료 또는 소유 프로세스 종료 (회수 대상)
+    """
+    queue = open_job_queue()
+    _import_legacy_working_lock(queue)
+
+    jobs = queue.active(current_worker())
+    if not jobs:
         return None
 
-    # 마지막 활동 시각 확인 (없으면 started_at 사용)
-    last_activity_str = lock_info.get("last_activity", lock_info.get("started_at"))
+    message_ids = [job["message_id"] for job in jobs]
+    lock_info = {
+        "message_id": message_ids[0] if len(message_ids) == 1 else message_ids,
+        "instruction_summary": jobs[0]["summary"],
+        "started_at": format_time(min(job["leased_at"] or job["created_at"] for job in jobs)),
+        "last_activity": format_time(max(job["heartbeat_at"] or 0 for job in jobs)),
+        "count": len(jobs),
+        "bot": jobs[0]["bot"],
+        "chat_id": jobs[0]["chat_id"],
+        "worker": current_worker(),
+        "owner_pid": jobs[0]["owner_pid"],
+        "owner_host": jobs[0]["owner_host"],
+        "owner_started": format_time(jobs[0]["owner_started"])
+    }
 
-    try:
-        last_activity = datetime.strptime(last_activity_str, "%Y-%m-%d %H:%M:%S")
-        now = datetime.now()
-        idle_seconds = (now - last_activity).total_seconds()
-
-        # 스탈네스 확인: 마지막 활동으로부터 30분 이상 경과
-        if idle_seconds > WORKING_LOCK_TIMEOUT:
-            print(f"⚠️ 스탈 작업 감지 (마지막 활동: {int(idle_seconds/60)}분 전)")
-            print(f"   메시지 ID: {lock_info.get('message_id')}")
-            print(f"   지시사항: {lock_info.get('instruction_summary')}")
-
-            # 스탈 플래그 추가하여 반환 (삭제하지 않음 - 재시작 필요)
-            lock_info["stale"] = True
-            return lock_info
-
-        # 활동 중인 작업
-        print(f"ℹ️ 작업 진행 중 (마지막 활동: {int(idle_seconds/60)}분 전)")
+    idle_seconds = time.time() - max(job["heartbeat_at"] or 0 for job in jobs)
+    if any(map(job_stopped, jobs)):
+        print(f"⚠️ 스탈 작업 감지 (마지막 활동: {int(idle_seconds/60)}분 전)")
+        print(f"   메시지 ID: {lock_info['message_id']}")
+        print(f"   지시사항: {lock_info['instruction_summary']}")
+        lock_info["stale"] = True
         return lock_info
 
-    except Exception as e:
-        print(f"⚠️ 타임스탬프 파싱 오류: {e}")
-        # 파싱 실패 시 파일 수정 시각으로 fallback
-        lock_age = time.time() - os.path.getmtime(WORKING_LOCK_FILE)
-        if lock_age > WORKING_LOCK_TIMEOUT:
-            try:
-                os.remove(WORKING_LOCK_FILE)
-            except OSError:
-                pass
-            return None
-        return lock_info
+    print(f"ℹ️ 작업 진행 중 (마지막 활동: {int(idle_seconds/60)}분 전)")
+    return lock_info
 
 
-def create_working_lock(message_id, instruction):
+def create_working_lock(message_id, instruction, partition=DEFAULT_PARTITION, heartbeat=False, chat_id=None):
     """
-    원자적으로 작업 잠금 파일 생성. 이미 존재하면 False 반환.
+    작업 대기열에서 메시지들의 작업을 원자적으로 가져옴 (이 작업자에게 임대).
+    다른 작업자가 이미 가져간 메시지가 있으면 False 반환.
 
     Args:
         message_id: 메시지 ID (또는 리스트)
         instruction: 지시사항
+        partition: 메시지를 받은 봇 (기본 봇이면 생략)
+        heartbeat: 이 프로세스에서 하트비트 스레드 실행 (작업이 끝날 때까지 살아 있는 프로세스만 -
+            작업 정보만 출력하고 끝나는 process_telegram.py는 사용하지 않음) - 프로세스가 죽으면 HEARTBEAT_TTL 후 회수됨
+        chat_id: 메시지의 채팅 (생략하면 메시지 로그에서 찾음 - message_id는 채팅 안에서만 고유)
 
     Returns:
-        bool: 생성 성공 여부
+        bool: 가져오기 성공 여부
     """
     # message_id가 리스트인 경우 (여러 메시지 합산)
     if isinstance(message_id, list):
@@ -148,56 +245,92 @@ def create_working_lock(message_id, instruction):
         message_ids = [message_id]
         msg_id_str = str(message_id)
 
+    global _heartbeat
+
+    partition = partition or DEFAULT_PARTITION
     summary = instruction.replace("\n", " ")[:50]
-    now_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    lock_data = {
-        "message_id": message_ids[0] if len(message_ids) == 1 else message_ids,
-        "instruction_summary": summary,
-        "started_at": now_str,
-        "last_activity": now_str,  # 🆕 마지막 활동 시각
-        "count": len(message_ids)
-    }
+    queue = open_job_queue()
+    owner = owner_info() if heartbeat else None
+    ttl = HEARTBEAT_TTL if heartbeat else _lease_ttl()
 
-    try:
-        with open(WORKING_LOCK_FILE, "x", encoding="utf-8") as f:
-            json.dump(lock_data, f, ensure_ascii=False, indent=2)
-        print(f"🔒 작업 잠금 생성: message_id={msg_id_str}")
-        return True
-    except FileExistsError:
-        print(f"⚠️ 잠금 파일 이미 존재. 다른 작업이 진행 중입니다.")
+    if not queue.lease(current_worker(), partition, _message_keys(message_ids, chat_id, partition), ttl,
+                       summary=summary, owner=owner):
+        print(f"⚠️ 다른 작업자가 이미 처리 중인 메시지(또는 채팅)가 있습니다: message_id={msg_id_str}")
         return False
 
+    queue.start(current_worker())
+    if heartbeat and _heartbeat is None:
+        _heartbeat = Heartbeat(queue, current_worker(), owner=owner).start()
+    print(f"🔒 작업 시작 ({current_worker()}): message_id={msg_id_str}")
+    return True
+
 
 def update_working_activity():
     """
-    작업 잠금의 마지막 활동 시각 갱신 (경과 보고 시 호출)
+    이 작업자의 임대 연장 (경과 보고 시 호출 - 하트비트 스레드가 없는 작업자의 유일한 하트비트)
 
     중간 경과 보고(send_message_sync)를 할 때마다 호출하여
     작업이 여전히 진행 중임을 표시합니다.
+    같은 프로세스에서 HEARTBEAT_INTERVAL 안에 다시 호출되면 건너뜁니다. (임대 시간보다 충분히 짧음)
     """
-    if not os.path.exists(WORKING_LOCK_FILE):
-        return
+    global _last_activity
 
+    now = time.monotonic()
+    if _last_activity and now - _last_activity < HEARTBEAT_INTERVAL:
+        return
     try:
-        with open(WORKING_LOCK_FILE, "r", encoding="utf-8") as f:
-            lock_data = json.load(f)
+        open_job_queue().heartbeat(current_worker(), _lease_ttl())
+        _last_activity = now
+    except Exception as e:
+        print(f"⚠️ 작업 대기열 하트비트 오류: {e}")
 
-        # last_activity 갱신
-        lock_data["last_activity"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        with open(WORKING_LOCK_FILE, "w", encoding="utf-8") as f:
-            json.dump(lock_data, f, ensure_ascii=False, indent=2)
+def find_new_messages(cursor=None, timeout=5):
+    """
+    진행 중 작업과 같은 채팅의 새 미처리 메시지 찾기 (Telegram 폴링 1회 + 미처리 목록 확인, 가져가지는 않음)
 
-    except Exception as e:
-        print(f"⚠️ working.json 활동 갱신 오류: {e}")
+    Args:
+        cursor: {(봇, chat_id): 마지막으로 확인한 message_id} - 주면 그 이후 메시지만 확인하고 갱신
+            (message_watcher의 커서 - 감시 상태 파일에 저장, 없으면 미처리 메시지 전체 확인)
+        timeout: Telegram 폴링 대기 시간 (초, message_watcher는 0 - 대기 없이 도착한 것만)
 
+    Returns:
+        list: 메시지 리스트 (진행 중 작업이 없으면 빈 리스트)
+    """
+    jobs = open_job_queue().active(current_worker())
+    if not jobs:
+        return []
 
-def check_new_messages_during_work():
+    # 현재 처리 중인 메시지 (합쳐진 메시지 포함 - 이미 가져간 메시지는 다시 보고하지 않음)
+    current_keys = {job_key(job) for job in jobs}
+    partition = jobs[0]["bot"]
+    chat_id = jobs[0]["chat_id"]
+    key = (partition, chat_id)
+    after = cursor.get(key, 0) if cursor is not None else 0
+
+    # Telegram API에서 새 메시지 수집
+    _poll_telegram_once(partition, timeout=timeout)
+
+    # 같은 채팅의 미처리 메시지만 (다른 채팅 메시지는 다른 작업자 몫)
+    new_messages = [msg for msg in open_message_log(partition).pending_messages()
+                    if msg["message_id"] > after and message_key(msg) not in current_keys
+                    and (chat_id is None or msg["chat_id"] == chat_id)]
+
+    if cursor is not None:
+        cursor[key] = max([after, *(message_id for _, message_id in current_keys),
+                           *(msg["message_id"] for msg in new_messages)])
+    return new_messages
+
+
+def claim_new_messages(messages):
     """
-    작업 중 새 메시지 확인 (working.json이 있을 때만)
+    찾아 둔 새 메시지를 이 작업자의 진행 중 작업에 합침 (대기 중인 메시지만 가져감)
+
+    Args:
+        messages: find_new_messages()가 반환한 메시지 리스트
 
     Returns:
-        list: 새로운 메시지 리스트
+        list: 가져온 메시지 리스트
         [
             {
                 "message_id": int,
@@ -210,48 +343,27 @@ def check_new_messages_during_work():
             ...
         ]
     """
-    # working.json이 없으면 작업 중이 아니므로 확인 안 함
-    if not os.path.exists(WORKING_LOCK_FILE):
+    if not messages:
         return []
 
-    try:
-        with open(WORKING_LOCK_FILE, "r", encoding="utf-8") as f:
-            lock_info = json.load(f)
-    except Exception:
-        return []
+    queue = open_job_queue()
+    worker = current_worker()
+    jobs = queue.active(worker)
 
-    # 스탈 작업이면 확인 안 함
-    if lock_info.get("stale"):
+    # 그 사이 작업이 끝났으면 가져오지 않음 (다음 check_telegram()에서 처리)
+    if not jobs:
         return []
 
-    # 현재 처리 중인 메시지 ID
-    current_message_ids = lock_info.get("message_id")
-    if not isinstance(current_message_ids, list):
-        current_message_ids = [current_message_ids]
-
-    # 🆕 이미 new_instructions.json에 저장된 메시지 ID 확인
-    already_saved = load_new_instructions()
-    saved_message_ids = {inst["message_id"] for inst in already_saved}
-
-    # Telegram API에서 새 메시지 수집
-    _poll_telegram_once()
-
-    # 새 메시지 확인
-    data = load_telegram_messages()
-    messages = data.get("messages", [])
+    partition = jobs[0]["bot"]
+    chat_id = jobs[0]["chat_id"]
 
     new_messages = []
     for msg in messages:
-        # 이미 처리된 메시지 제외
-        if msg.get("processed", False):
-            continue
-
-        # 현재 처리 중인 메시지 제외
-        if msg["message_id"] in current_message_ids:
+        if chat_id is not None and msg["chat_id"] != chat_id:
             continue
 
-        # 🆕 이미 저장된 메시지 제외 (중복 알림 방지)
-        if msg["message_id"] in saved_message_ids:
+        # 대기 중인 메시지만 가져와서 합침 (다른 작업자가 가져간 메시지 제외)
+        if not queue.lease(worker, partition, [message_key(msg)], _lease_ttl()):
             continue
 
         # 새 메시지 발견!
@@ -264,12 +376,34 @@ def check_new_messages_during_work():
             "detected_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
 
+    if new_messages:
+        queue.start(worker)
+
     return new_messages
 
 
+def check_new_messages_during_work():
+    """
+    작업 중 새 메시지 확인 (이 작업자에게 진행 중 작업이 있을 때만, 즉시 폴링)
+
+    같은 봇/같은 채팅의 대기 메시지는 이 작업자가 가져가서 진행 중 작업에 합칩니다.
+    다른 채팅의 메시지는 대기열에 남겨 다른 작업자가 처리합니다.
+    전송 경로(send_message_sync)는 이 함수 대신 message_watcher의 백그라운드 확인 결과를 사용합니다.
+
+    Returns:
+        list: 새로운 메시지 리스트 (형식은 claim_new_messages() 참고)
+    """
+    return claim_new_messages(find_new_messages())
+
+
+def _new_instructions_file():
+    """이 작업자의 새 지시사항 파일 (작업자마다 따로 저장)"""
+    return partition_file(NEW_INSTRUCTIONS_FILE, current_worker())
+
+
 def save_new_instructions(new_messages):
     """
-    새 지시사항을 파일에 저장
+    새 지시사항을 파일에 저장 (잠금 안에서 읽기-수정-쓰기, 원자적 교체)
 
     Args:
         new_messages: check_new_messages_during_work()가 반환한 메시지 리스트
@@ -277,25 +411,15 @@ def save_new_instructions(new_messages):
     if not new_messages:
         return
 
-    # 기존 파일 읽기 (있으면)
-    if os.path.exists(NEW_INSTRUCTIONS_FILE):
-        try:
-            with open(NEW_INSTRUCTIONS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-        except Exception:
-            data = {"instructions": []}
-    else:
-        data = {"instructions": []}
-
-    # 새 메시지 추가 (중복 제거)
-    existing_ids = {inst["message_id"] for inst in data["instructions"]}
-    for msg in new_messages:
-        if msg["message_id"] not in existing_ids:
-            data["instructions"].append(msg)
+    def _append(data):
+        # 새 메시지 추가 (중복 제거)
+        instructions = data.setdefault("instructions", [])
+        existing_keys = {message_key(inst) for inst in instructions}
+        for msg in new_messages:
+            if message_key(msg) not in existing_keys:
+                instructions.append(msg)
 
-    # 파일에 저장
-    with open(NEW_INSTRUCTIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    update_json(_new_instructions_file(), _append, default={"instructions": []})
 
     print(f"💾 새 지시사항 저장: {len(new_messages)}개")
 
@@ -307,63 +431,77 @@ def load_new_instructions():
     Returns:
         list: 새 지시사항 리스트
     """
-    if not os.path.exists(NEW_INSTRUCTIONS_FILE):
-        return []
-
-    try:
-        with open(NEW_INSTRUCTIONS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data.get("instructions", [])
-    except Exception as e:
-        print(f"⚠️ new_instructions.json 읽기 오류: {e}")
-        return []
+    data = read_json(_new_instructions_file(), {})
+    return data.get("instructions", []) if isinstance(data, dict) else []
 
 
 def clear_new_instructions():
     """
     새 지시사항 파일 삭제 (작업 완료 후 호출)
     """
-    if os.path.exists(NEW_INSTRUCTIONS_FILE):
-        try:
-            os.remove(NEW_INSTRUCTIONS_FILE)
+    path = _new_instructions_file()
+    try:
+        if remove_file(path):
             print("🧹 새 지시사항 파일 정리 완료")
-        except OSError as e:
-            print(f"⚠️ new_instructions.json 삭제 오류: {e}")
+    except OSError as e:
+        print(f"⚠️ {os.path.basename(path)} 삭제 오류: {e}")
 
 
 def remove_working_lock():
-    """작업 잠금 파일 삭제"""
-    if os.path.exists(WORKING_LOCK_FILE):
-        os.remove(WORKING_LOCK_FILE)
-        print("🔓 작업 잠금 해제")
+    """이 작업자의 임대 반납 (완료 처리되지 않은 작업은 다시 대기열로, 하트비트 스레드 정지)"""
+    global _heartbeat
 
+    if _heartbeat is not None:
+        _heartbeat.stop()
+        _heartbeat = None
+
+    released = open_job_queue().release(current_worker())
+    if released:
+        print(f"↩️ 완료되지 않은 작업 {released}개 대기열로 반환")
+    print("🔓 작업 잠금 해제")
 
-def load_index():
-    """인덱스 파일 로드"""
-    if not os.path.exists(INDEX_FILE):
-        return {"tasks": [], "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
+def load_index(partition=DEFAULT_PARTITION):
+    """인덱스 로드 (기존 index.json 형식: {"tasks": [...], "last_updated": str})"""
     try:
-        with open(INDEX_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return open_task_index(partition).to_dict()
     except Exception as e:
-        print(f"⚠️ index.json 읽기 오류: {e}")
+        print(f"⚠️ 작업 인덱스 읽기 오류: {e}")
         return {"tasks": [], "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
 
 
-def save_index(index_data):
-    """인덱스 파일 저장"""
-    # tasks 폴더가 없으면 생성
-    if not os.path.exists(TASKS_DIR):
-        os.makedirs(TASKS_DIR)
+def save_index(index_data, partition=DEFAULT_PARTITION):
+    """인덱스 전체 저장 (전체 교체 - 일부 변경은 update_index/update_index_many 사용)"""
+    open_task_index(partition).replace_all(index_data.get("tasks", []))
 
-    index_data["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    with open(INDEX_FILE, "w", encoding="utf-8") as f:
-        json.dump(index_data, f, ensure_ascii=False, indent=2)
+def _task_entry(message_id, instruction, result_summary="", files=None, chat_id=None, timestamp=None,
+                partition=DEFAULT_PARTITION, result_text=None):
+    """인덱스에 저장할 작업 메타데이터 (result_text: 검색 색인용 결과 전문)"""
+    # 키워드 추출 (간단한 방식: 명사 추출 대신 단어 분리)
+    keywords = []
+    for word in instruction.split():
+        if len(word) >= 2:  # 2글자 이상만
+            keywords.append(word)
+    keywords = list(set(keywords))[:10]  # 중복 제거, 최대 10개
+
+    entry = {
+        "message_id": message_id,
+        "timestamp": timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "instruction": instruction,
+        "keywords": keywords,
+        "result_summary": result_summary,
+        "files": files or [],
+        "chat_id": chat_id,
+        "task_dir": resolve_task_dir(message_id, partition)
+    }
+    if result_text:
+        entry["result_text"] = result_text
+    return entry
 
 
-def update_index(message_id, instruction, result_summary="", files=None, chat_id=None, timestamp=None):
+def update_index(message_id, instruction, result_summary="", files=None, chat_id=None, timestamp=None,
+                 partition=DEFAULT_PARTITION):
     """
     인덱스 업데이트 (작업 추가 또는 수정)
 
@@ -374,96 +512,149 @@ def update_index(message_id, instruction, result_summary="", files=None, chat_id
         files: 파일 리스트
         chat_id: 채팅 ID
         timestamp: 메시지 시각
+        partition: 봇 (기본 봇이면 생략)
     """
-    index = load_index()
-
-    # 키워드 추출 (간단한 방식: 명사 추출 대신 단어 분리)
-    keywords = []
-    for word in instruction.split():
-        if len(word) >= 2:  # 2글자 이상만
-            keywords.append(word)
-    keywords = list(set(keywords))[:10]  # 중복 제거, 최대 10개
-
-    # 기존 작업 찾기
-    existing_task = None
-    for task in index["tasks"]:
-        if task["message_id"] == message_id:
-            existing_task = task
-            break
-
-    task_data = {
+    update_index_many([{
         "message_id": message_id,
-        "timestamp": timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "instruction": instruction,
-        "keywords": keywords,
         "result_summary": result_summary,
-        "files": files or [],
+        "files": files,
         "chat_id": chat_id,
-        "task_dir": os.path.join(TASKS_DIR, f"msg_{message_id}")
-    }
+        "timestamp": timestamp
+    }], partition)
 
-    if existing_task:
-        # 기존 작업 업데이트
-        existing_task.update(task_data)
-    else:
-        # 새 작업 추가
-        index["tasks"].append(task_data)
 
-    # message_id 역순 정렬 (최신순)
-    index["tasks"].sort(key=lambda x: x["message_id"], reverse=True)
+def update_index_many(entries, partition=DEFAULT_PARTITION):
+    """
+    여러 작업을 한 트랜잭션으로 인덱스에 추가/수정
 
-    save_index(index)
-    print(f"📇 인덱스 업데이트: message_id={message_id}")
+    Args:
+        entries: update_index()의 인자 dict 리스트
+            [{"message_id", "instruction", "result_summary", "files", "chat_id", "timestamp"}, ...]
+        partition: 봇 (기본 봇이면 생략)
+    """
+    tasks = [_task_entry(partition=partition, **entry) for entry in entries]
+    open_task_index(partition).upsert_many(tasks)
+    ids = ", ".join(str(task["message_id"]) for task in tasks)
+    print(f"📇 인덱스 업데이트: message_id={ids}")
 
 
-def search_memory(keyword=None, message_id=None):
+def search_memory(query=None, message_id=None, top_k=None, partition=DEFAULT_PARTITION, keyword=None, chat_id=None):
     """
-    인덱스에서 작업 검색
+    인덱스에서 작업 검색 (지시사항/결과/봇 응답 전문 검색, BM25 관련도순)
 
     Args:
-        keyword: 검색할 키워드 (instruction, keywords에서 검색)
+        query: 검색어 (여러 단어 가능, 한글은 조사가 붙어 있어도 검색됨 - 한 글자 검색어나
+            전문 검색으로 찾지 못한 검색어는 기존 부분 문자열 검색 결과도 포함)
         message_id: 특정 메시지 ID
+        top_k: 최대 결과 수 (None이면 전체)
+        partition: 검색할 봇의 인덱스 (기본 봇이면 생략)
+        keyword: query의 이전 이름 (호환용)
+        chat_id: message_id의 채팅 (생략하면 그 ID의 가장 최근 작업)
 
     Returns:
-        list: 매칭된 작업 메타데이터
+        list: 매칭된 작업 메타데이터 (검색어가 있으면 "score" 포함, 높을수록 관련)
     """
-    index = load_index()
+    index = open_task_index(partition)
 
     if message_id is not None:
         # 특정 message_id로 검색
-        for task in index["tasks"]:
-            if task["message_id"] == message_id:
-                return [task]
-        return []
+        task = index.get(message_id, chat_id)
+        return [task] if task else []
 
-    if keyword:
-        # 키워드로 검색
-        matches = []
-        keyword_lower = keyword.lower()
+    query = query or keyword
+    if query:
+        return index.search(query, top_k)
 
-        for task in index["tasks"]:
-            # instruction 또는 keywords에 포함되어 있으면 매칭
-            if (keyword_lower in task["instruction"].lower() or
-                any(keyword_lower in kw.lower() for kw in task["keywords"])):
-                matches.append(task)
+    # 조건 없으면 전체 반환
+    return index.all()
 
-        return matches
 
-    # 조건 없으면 전체 반환
-    return index["tasks"]
+def _current_files(files):
+    """
+    저장된 첨부/전송 파일 경로를 현재 위치로 (작업 폴더 이전 후에도 있는 경로, 로그 레코드는 수정하지 않음)
+
+    Args:
+        files: 사용자 메시지의 파일 정보(dict) 또는 봇 응답의 파일 경로(str) 리스트
+    """
+    current = []
+    for file_info in files or []:
+        if isinstance(file_info, dict) and file_info.get("path"):
+            file_info = dict(file_info, path=resolve_task_path(file_info["path"]))
+        elif isinstance(file_info, str):
+            file_info = resolve_task_path(file_info)
+        current.append(file_info)
+    return current
+
+
+def search_history(keyword=None, message_id=None, since=None, until=None, limit=20,
+                   partition=DEFAULT_PARTITION, chat_id=None):
+    """
+    대화 원문 검색 (최근 메시지 로그 → 보관 기간이 지난 월별 아카이브)
+
+    아카이브는 필요한 달의 파일만 풀어서 읽습니다.
+
+    Args:
+        keyword: 텍스트에 포함된 키워드
+        message_id: 특정 메시지 ID
+        since: 시작 시각 (예: "2026-08-01")
+        until: 끝 시각 (예: "2026-08-31 23:59:59")
+        limit: 최대 결과 수 (최신순)
+        partition: 봇 (기본 봇이면 생략)
+        chat_id: message_id의 채팅 (생략하면 그 ID의 가장 최근 메시지)
+
+    Returns:
+        list: 메시지 리스트
+    """
+    from message_archive import open_archive
 
+    log = open_message_log(partition)
 
-def get_task_dir(message_id):
+    if message_id is not None:
+        msg = log.get(message_id if chat_id is None else (chat_id, message_id))
+        if msg is None:
+            msg = open_archive(partition).get(message_id)
+            if msg is not None and chat_id is not None and msg.get("chat_id") != chat_id:
+                msg = None
+        return [dict(msg, files=_current_files(msg.get("files")))] if msg else []
+
+    keyword_lower = keyword.lower() if keyword else None
+    matches = []
+    for msg in reversed(log.messages()):
+        timestamp = msg.get("timestamp", "")
+        if (since and timestamp < since) or (until and timestamp > until):
+            continue
+        if keyword_lower is None or keyword_lower in (msg.get("text") or "").lower():
+            matches.append(msg)
+            if len(matches) >= limit:
+                break
+
+    if len(matches) < limit:
+        archive = open_archive(partition)
+        if keyword:
+            matches.extend(archive.search(keyword, since, until, limit - len(matches)))
+        else:
+            for msg in archive.iter_messages(since, until, newest_first=True):
+                matches.append(msg)
+                if len(matches) >= limit:
+                    break
+
+    # 첨부 파일 경로는 현재 작업 폴더 위치로 (레코드는 복사본)
+    return [dict(msg, files=_current_files(msg.get("files"))) if msg.get("files") else msg for msg in matches]
+
+
+def get_task_dir(message_id, partition=DEFAULT_PARTITION):
     """
     메시지 ID 기반 작업 폴더 경로 반환
 
     Args:
         message_id: 텔레그램 메시지 ID
+        partition: 봇 (팀별 봇은 tasks/{봇이름}/3f/msg_5/)
 
     Returns:
-        str: 작업 폴더 경로 (예: "tasks/msg_5/")
+        str: 작업 폴더 경로 (예: "tasks/3f/msg_5/", 이전 전 폴더는 "tasks/msg_5/")
     """
-    task_dir = os.path.join(TASKS_DIR, f"msg_{message_id}")
+    task_dir = resolve_task_dir(message_id, partition)
 
     # 폴더가 없으면 생성
     if not os.path.exists(task_dir):
@@ -477,6 +668,8 @@ def get_24h_context(messages, current_message_id):
     """
     최근 24시간 대화 내역 생성 (사용자 + 봇 응답 모두 포함)
 
+    여러 메시지의 컨텍스트가 필요하면 build_24h_contexts()로 한 번에 생성하세요.
+
     Args:
         messages: 전체 메시지 리스트
         current_message_id: 현재 처리 중인 메시지 ID
@@ -484,103 +677,101 @@ def get_24h_context(messages, current_message_id):
     Returns:
         str: 24시간 대화 내역 텍스트
     """
-    now = datetime.now()
-    cutoff_time = now - timedelta(hours=24)
+    return build_24h_contexts(messages, [current_message_id])[current_message_id]
 
-    context_lines = ["=== 최근 24시간 대화 내역 ===\n"]
 
-    for msg in messages:
-        # 현재 메시지까지만 포함
-        if msg.get("type") == "user" and msg["message_id"] == current_message_id:
-            break
+def _poll_telegram_once(partition=DEFAULT_PARTITION, timeout=5):
+    """Telegram API에서 새 메시지를 한 번 가져와서 json 업데이트 (Listener 별도 실행 불필요, timeout: 대기 시간 초)"""
+    from telegram_listener import fetch_new_messages, WEBHOOK_URL
+    from poll_scheduler import AdaptivePoller, POLL_STATS_FILE
 
-        # 24시간 이내 메시지만 포함
-        msg_time = datetime.strptime(msg["timestamp"], "%Y-%m-%d %H:%M:%S")
-        if msg_time < cutoff_time:
-            continue
-
-        # 메시지 타입에 따라 포맷 다르게
-        msg_type = msg.get("type", "user")  # 기본값 user (하위 호환)
-
-        if msg_type == "user":
-            # 사용자 메시지
-            user_name = msg.get("first_name", "사용자")
-            text = msg.get("text", "")
-
-            # 파일 정보 추가
-            files = msg.get("files", [])
-            if files:
-                file_info = f" [첨부: {len(files)}개 파일]"
-            else:
-                file_info = ""
-
-            # 🆕 위치 정보 추가
-            location = msg.get("location")
-            if location:
-                location_info = f" [위치: {location['latitude']}, {location['longitude']}]"
-            else:
-                location_info = ""
-
-            context_lines.append(f"[{msg['timestamp']}] {user_name}: {text}{file_info}{location_info}")
-
-        elif msg_type == "bot":
-            # 봇 응답
-            text = msg.get("text", "")
+    # 웹훅 모드에서는 수신기가 즉시 저장하므로 폴링 불필요 (get_updates도 사용 불가 - 기본 봇만 해당)
+    if WEBHOOK_URL and partition == DEFAULT_PARTITION:
+        return
 
-            # 긴 응답은 요약
-            if len(text) > 150:
-                text_preview = text[:150] + "..."
-            else:
-                text_preview = text
+    # 적응형 스케줄: 유휴 중에는 백오프 간격이 지날 때까지 API 호출 생략 (봇별 상태)
+    poller = AdaptivePoller(state_file=partition_file(POLL_STATS_FILE, partition))
+    if not poller.should_poll_now():
+        return
 
-            # 파일 정보 추가
-            files = msg.get("files", [])
-            if files:
-                file_info = f" [전송: {', '.join(files)}]"
-            else:
-                file_info = ""
+    try:
+        run_async_safe(fetch_new_messages(timeout=timeout, poller=poller, partition=partition))
+    except Exception as e:
+        print(f"⚠️ 폴링 중 오류: {e}")
 
-            context_lines.append(f"[{msg['timestamp']}] 🤖 소놀봇: {text_preview}{file_info}")
 
-    if len(context_lines) == 1:
-        return "최근 24시간 이내 대화 내역이 없습니다."
+async def _download_lazy_files(file_infos, message_id, partition=DEFAULT_PARTITION):
+    """지연 파일들을 하나의 Bot 세션으로 다운로드"""
+    from telegram import Bot
+    from telegram_listener import BOT_TOKEN, download_file
+
+    token = BOT_TOKEN if partition == DEFAULT_PARTITION else get_token(partition)
+    async with Bot(token=token) as bot:
+        return [
+            await download_file(
+                bot,
+                file_info["file_id"],
+                file_info.get("source_message_id", message_id),  # 앨범은 원래 메시지 기준
+                file_info["type"],
+                file_info.get("name"),
+                file_info.get("file_unique_id"),
+                partition
+            )
+            for file_info in file_infos
+        ]
 
-    return "\n".join(context_lines)
 
+def fetch_attachment(message_id, file_unique_id=None, partition=DEFAULT_PARTITION, chat_id=None):
+    """
+    지연 모드(TELEGRAM_LAZY_MEDIA=1)로 기록된 첨부 파일을 처음 접근할 때 다운로드
 
-def _poll_telegram_once():
-    """Telegram API에서 새 메시지를 한 번 가져와서 json 업데이트 (Listener 별도 실행 불필요)"""
-    from telegram_listener import fetch_new_messages
-    try:
-        run_async_safe(fetch_new_messages())
-    except Exception as e:
-        print(f"⚠️ 폴링 중 오류: {e}")
+    이미 받은 파일은 다시 받지 않으며, 상주 모드에서 미리 받아둔 파일은
+    첨부 파일 저장소에서 링크만 생성합니다.
 
+    Args:
+        message_id: 메시지 ID
+        file_unique_id: 특정 파일만 받을 경우 지정 (None이면 메시지의 모든 파일)
+        partition: 메시지를 받은 봇 (기본 봇이면 생략)
+        chat_id: 메시지의 채팅 (생략하면 그 ID의 가장 최근 메시지)
 
-def _cleanup_old_messages():
-    """30일 초과 처리된 메시지 정리. 24시간 이내는 컨텍스트용, 30일까지는 참조용 보관."""
-    data = load_telegram_messages()
-    messages = data.get("messages", [])
+    Returns:
+        list: 로컬 파일 경로 리스트
+    """
+    log = open_message_log(partition)
+    target = log.get(message_id if chat_id is None else (chat_id, message_id))
 
-    cutoff = datetime.now() - timedelta(days=30)
+    if target is None:
+        print(f"⚠️ 메시지를 찾을 수 없습니다: message_id={message_id}")
+        return []
 
-    cleaned = [
-        msg for msg in messages
-        if not msg.get("processed", False)
-        or datetime.strptime(msg["timestamp"], "%Y-%m-%d %H:%M:%S") > cutoff
+    files = [
+        file_info for file_info in target.get("files", [])
+        if file_unique_id is None or file_info.get("file_unique_id") == file_unique_id
     ]
+    pending = [file_info for file_info in files if not file_info.get("path") and file_info.get("lazy")]
 
-    removed = len(messages) - len(cleaned)
-    if removed > 0:
-        data["messages"] = cleaned
-        save_telegram_messages(data)
-        print(f"🧹 30일 초과 메시지 {removed}개 정리 완료")
+    if pending:
+        paths = run_async_safe(_download_lazy_files(pending, message_id, partition))
+        for file_info, path in zip(pending, paths):
+            if path:
+                file_info["path"] = path
+                file_info["lazy"] = False
+        log.update(message_key(target), files=target["files"])
 
+    return [resolve_task_path(file_info["path"]) for file_info in files if file_info.get("path")]
 
-def check_telegram():
+
+def check_telegram(partition=None, chat_id=None):
     """
     새로운 텔레그램 명령 확인
 
+    다른 작업자가 작업 중인 채팅의 메시지는 제외합니다. (채팅별 잠금 - 채팅 안에서는 순서대로 처리)
+
+    Args:
+        partition: 확인할 봇 (None이면 설정된 모든 봇)
+        chat_id: 확인할 채팅 (None이면 모든 채팅)
+            둘 다 생략하면 이 작업자가 맡은 채팅 (MYBOT_WORKER_CHAT, chat_scheduler.py가 설정)
+
     Returns:
         list: 대기 중인 지시사항 리스트
         [
@@ -591,112 +782,141 @@ def check_telegram():
                 "timestamp": str,        # 메시지 시각
                 "context_24h": str,      # 최근 24시간 대화 내역
                 "user_name": str,        # 사용자 이름
-                "stale_resume": bool     # 스탈 작업 재개 여부
+                "stale_resume": bool,    # 스탈 작업 재개 여부
+                "bot": str               # 메시지를 받은 봇 (파티션)
             },
             ...
         ]
     """
-    # 작업 잠금 확인
+    queue = open_job_queue()
+    _import_legacy_working_lock(queue)
+
+    # 중단된 작업 회수 (임대 만료) - 채팅에 알리고 다시 대기열로
+    expired = queue.requeue_expired()
+    if expired:
+        notify_requeued_jobs(expired)
+
+    # 이 작업자의 진행 중 작업 확인
     lock_info = check_working_lock()
 
     if lock_info:
-        # 스탈 작업인 경우 - 재시작
-        if lock_info.get("stale"):
-            print("🔄 스탈 작업 재시작")
-
-            # 텔레그램 알림 전송
-            from telegram_sender import send_message_sync
-            message_ids = lock_info.get("message_id")
-            if not isinstance(message_ids, list):
-                message_ids = [message_ids]
-
-            # 첫 번째 메시지의 chat_id 찾기
-            data = load_telegram_messages()
-            messages = data.get("messages", [])
-            chat_id = None
-            for msg in messages:
-                if msg["message_id"] in message_ids:
-                    chat_id = msg["chat_id"]
-                    break
-
-            if chat_id:
-                alert_msg = (
-                    "⚠️ **이전 작업이 중단되었습니다**\n\n"
-                    f"지시사항: {lock_info.get('instruction_summary')}...\n"
-                    f"시작 시각: {lock_info.get('started_at')}\n"
-                    f"마지막 활동: {lock_info.get('last_activity')}\n\n"
-                    "처음부터 다시 시작합니다."
-                )
-                send_message_sync(chat_id, alert_msg)
-
-            # 잠금 파일 삭제
-            try:
-                os.remove(WORKING_LOCK_FILE)
-                print("🔓 스탈 잠금 삭제 완료")
-            except OSError:
-                pass
-
-            # 미처리 메시지 찾아서 재시작 플래그 추가
-            pending = []
-            for msg in messages:
-                if msg["message_id"] in message_ids and not msg.get("processed", False):
-                    instruction = msg.get("text", "")
-                    message_id = msg["message_id"]
-                    chat_id = msg["chat_id"]
-                    timestamp = msg["timestamp"]
-                    user_name = msg["first_name"]
-                    files = msg.get("files", [])  # 🆕 파일 정보
-                    location = msg.get("location")  # 🆕 위치 정보
-                    context_24h = get_24h_context(messages, message_id)
-
-                    pending.append({
-                        "instruction": instruction,
-                        "message_id": message_id,
-                        "chat_id": chat_id,
-                        "timestamp": timestamp,
-                        "context_24h": context_24h,
-                        "user_name": user_name,
-                        "files": files,  # 🆕 파일 정보
-                        "location": location,  # 🆕 위치 정보
-                        "stale_resume": True  # 🆕 스탈 작업 재개 플래그
-                    })
-
-            return pending
-
-        # 활동 중인 작업 - 대기
+        # 진행 중인 작업 - 대기 (다른 작업자는 대기열의 다른 작업을 가져갈 수 있음)
         print(f"⚠️ 다른 작업이 진행 중입니다: message_id={lock_info.get('message_id')}")
         print(f"   지시사항: {lock_info.get('instruction_summary')}")
         print(f"   시작 시각: {lock_info.get('started_at')}")
         print(f"   마지막 활동: {lock_info.get('last_activity')}")
         return []
 
-    # Telegram API에서 새 메시지 수집 (Listener 별도 실행 불필요)
-    _poll_telegram_once()
+    if partition is None and chat_id is None and assigned_chat():
+        partition, chat_id = assigned_chat()
 
-    # 30일 초과 처리된 메시지 정리 (24h 이내는 컨텍스트용, 30일까지 참조용 보관)
-    _cleanup_old_messages()
+    pending = []
 
-    data = load_telegram_messages()
-    messages = data.get("messages", [])
+    for name in ([partition] if partition else partition_names()):
+        pending.extend(_check_partition(name, chat_id))
 
-    pending = []
+    return pending
 
-    for msg in messages:
-        # 이미 처리된 메시지는 건너뛰기
-        if msg.get("processed", False):
+
+def _mark_failed_messages(partition, keys):
+    """
+    재시도 한도를 넘겨 실패한 작업의 메시지를 처리 완료로 표시 ("failed": True)
+
+    작업 대기열에서 failed가 된 메시지가 로그에 미처리로 남아 매번 다시 확인되지 않도록 합니다.
+
+    Args:
+        partition: 봇
+        keys: 메시지 키 (chat_id, message_id) 리스트
+    """
+    if not keys:
+        return
+    open_message_log(partition).update_many(keys, processed=True, failed=True)
+    print(f"🚫 재시도 한도 초과 메시지 처리 완료 표시: [{partition}] message_id={[key[1] for key in keys]}")
+
+
+def notify_requeued_jobs(expired):
+    """
+    중단되어 회수한 작업을 채팅별로 알림
+
+    Args:
+        expired: JobQueue.requeue_expired() / requeue_worker()가 반환한 작업 리스트
+    """
+    from telegram_sender import send_message_sync
+
+    groups = {}
+    for job in expired:
+        groups.setdefault((job["bot"], job["chat_id"], job["worker"]), []).append(job)
+
+    for (bot, chat_id, worker), jobs in groups.items():
+        print(f"🔄 스탈 작업 회수 ({worker}): [{bot}] message_id={[job['message_id'] for job in jobs]}")
+        _mark_failed_messages(bot, [job_key(job) for job in jobs if job["new_state"] == "failed"])
+        if not chat_id:
             continue
+        retry = [job for job in jobs if job["new_state"] == "queued"]
+        alert_msg = (
+            "⚠️ **이전 작업이 중단되었습니다**\n\n"
+            f"지시사항: {jobs[0]['summary']}...\n"
+            f"시작 시각: {format_time(jobs[0]['leased_at'])}\n"
+            f"마지막 활동: {format_time(jobs[0]['heartbeat_at'])}\n\n"
+            + ("처음부터 다시 시작합니다." if retry else f"{MAX_ATTEMPTS}회 중단되어 더 이상 재시도하지 않습니다.")
+        )
+        send_message_sync(chat_id, alert_msg, partition=bot)
+
+
+def _check_partition(partition, chat_id=None):
+    """봇 1개의 대기 중인 명령 확인 (check_telegram 참고)"""
+    # Telegram API에서 새 메시지 수집 (Listener 별도 실행 불필요)
+    _poll_telegram_once(partition)
+
+    # 오래된 메시지 정리는 확인 경로에서 하지 않음 (message_retention.py 별도 작업)
 
+    # 미처리 메시지만 조회 (없으면 전체 기록을 보지 않음)
+    log = open_message_log(partition)
+    pending_messages = log.pending_messages()
+    if not pending_messages:
+        return []
+
+    # 작업 대기열에 등록 후 대기(queued) 상태만 반환
+    # (다른 작업자가 가져간 메시지, 재시도 한도를 넘긴 메시지, 다른 작업자가 작업 중인 채팅 제외)
+    queue = open_job_queue()
+    # 작업은 메시지 키 (chat_id, message_id)로 구분 (message_id는 채팅 안에서만 고유)
+    jobs = queue.jobs_for(partition, [message_key(msg) for msg in pending_messages])
+
+    # 재시도 한도를 넘겨 실패한 작업의 메시지는 로그에도 처리 완료(failed)로 표시 → 다시 확인하지 않음
+    failed_keys = [key for key, job in jobs.items() if job["state"] == "failed"]
+    if failed_keys:
+        _mark_failed_messages(partition, failed_keys)
+
+    # 아직 등록되지 않은 메시지만 등록
+    new_messages = [msg for msg in pending_messages if message_key(msg) not in jobs]
+    if new_messages:
+        queue.enqueue(partition, new_messages)
+        jobs.update(queue.jobs_for(partition, [message_key(msg) for msg in new_messages]))
+    busy_chats = queue.busy_chats(exclude_worker=current_worker())
+    pending_messages = [msg for msg in pending_messages
+                        if jobs.get(message_key(msg), {}).get("state") == "queued"
+                        and (partition, msg["chat_id"]) not in busy_chats
+                        and (chat_id is None or msg["chat_id"] == chat_id)]
+    if not pending_messages:
+        return []
+
+    # 최근 24시간 대화 내역: 대기 메시지 전체를 한 번의 순회로 생성
+    contexts = build_24h_contexts(log.messages(), [message_key(msg) for msg in pending_messages])
+
+    pending = []
+
+    for msg in pending_messages:
         # 새로운 명령 발견
         instruction = msg.get("text", "")
         message_id = msg["message_id"]
         chat_id = msg["chat_id"]
         timestamp = msg["timestamp"]
         user_name = msg["first_name"]
-        files = msg.get("files", [])  # 🆕 파일 정보
+        files = _current_files(msg.get("files"))  # 🆕 파일 정보 (작업 폴더 이전 후 경로로)
         location = msg.get("location")  # 🆕 위치 정보
 
-        # 최근 24시간 대화 내역 생성
-        context_24h = get_24h_context(messages, message_id)
+        # 최근 24시간 대화 내역
+        context_24h = contexts[(chat_id, message_id)]
 
         pending.append({
             "instruction": instruction,
@@ -707,7 +927,8 @@ def check_telegram():
             "user_name": user_name,
             "files": files,  # 🆕 파일 정보
             "location": location,  # 🆕 위치 정보
-            "stale_resume": False  # 일반 작업
+            "stale_resume": jobs[(chat_id, message_id)]["attempts"] > 0,  # 🆕 중단된 작업 재개 여부
+            "bot": partition
         })
 
     return pending
@@ -723,10 +944,35 @@ def _format_file_size(size_bytes):
         return f"{size_bytes / 1024 / 1024:.1f} MB"
 
 
+def group_tasks_by_chat(pending_tasks):
+    """
+    대기 작업을 채팅(봇 + chat_id)별로 나눔
+
+    Args:
+        pending_tasks: check_telegram()이 반환한 작업 리스트
+
+    Returns:
+        list: [(봇, chat_id, [작업, ...]), ...]
+            채팅 안은 시간순(FIFO), 채팅끼리는 가장 오래된 메시지가 먼저인 순서
+    """
+    groups = {}
+    for task in sorted(pending_tasks, key=lambda x: x['timestamp']):
+        key = (task.get('bot', DEFAULT_PARTITION), task['chat_id'])
+        groups.setdefault(key, []).append(task)
+    return [(bot, chat_id, tasks) for (bot, chat_id), tasks in groups.items()]
+
+
 def combine_tasks(pending_tasks):
     """
     여러 미처리 메시지를 하나의 통합 작업으로 합산
 
+    한 채팅(봇 + chat_id)의 메시지만 합산합니다. 여러 채팅의 메시지가 섞여 있으면
+    가장 오래된 메시지의 채팅 것만 합산하고, 나머지는 대기열에 남겨
+    다른 작업자(chat_scheduler.py) 또는 다음 실행에서 처리합니다.
+
+    combined_instruction은 TELEGRAM_CONTEXT_TOKEN_BUDGET(토큰) 이내로 조립합니다.
+    현재 요청은 항상 전부 포함하고, 남은 예산으로 24시간 대화 내역을 붙입니다. (context_assembler.py)
+
     Args:
         pending_tasks: check_telegram()이 반환한 작업 리스트
 
@@ -739,14 +985,16 @@ def combine_tasks(pending_tasks):
             "user_name": str,
             "all_timestamps": list,  # 모든 메시지 시각
             "files": list,  # 🆕 모든 파일 정보
-            "stale_resume": bool  # 스탈 작업 재개 여부
+            "stale_resume": bool,  # 스탈 작업 재개 여부
+            "bot": str,  # 응답할 봇 (파티션)
+            "chat_dir": str  # 채팅별 폴더 (chats/chat_123/)
         }
     """
     if not pending_tasks:
         return None
 
-    # 시간순 정렬 (오래된 것부터)
-    sorted_tasks = sorted(pending_tasks, key=lambda x: x['timestamp'])
+    # 🆕 한 번에 한 채팅의 메시지만 합산 (시간순, 응답 대상/작업 폴더가 채팅별로 다름)
+    partition, chat_id, sorted_tasks = group_tasks_by_chat(pending_tasks)[0]
 
     # 스탈 작업 재개 여부 확인
     is_stale_resume = any(task.get('stale_resume', False) for task in sorted_tasks)
@@ -779,11 +1027,15 @@ def combine_tasks(pending_tasks):
         if files:
             combined_parts.append("")
             combined_parts.append("📎 첨부 파일:")
-            for file_info in files:
+            for listed, file_info in enumerate(files):
+                # 전체 파일 리스트에 추가
+                all_files.append(file_info)
+                if listed >= MAX_LISTED_FILES:
+                    continue
+
                 file_path = file_info['path']
-                file_name = os.path.basename(file_path)
                 file_type = file_info['type']
-                file_size = _format_file_size(file_info.get('size', 0))
+                file_size = _format_file_size(file_info.get('size') or 0)
 
                 # 파일 타입별 이모지
                 type_emoji = {
@@ -795,11 +1047,21 @@ def combine_tasks(pending_tasks):
                 }
                 emoji = type_emoji.get(file_type, '📎')
 
-                combined_parts.append(f"  {emoji} {file_name} ({file_size})")
-                combined_parts.append(f"     경로: {file_path}")
-
-                # 전체 파일 리스트에 추가
-                all_files.append(file_info)
+                if file_path:
+                    combined_parts.append(f"  {emoji} {os.path.basename(file_path)} ({file_size})")
+                    combined_parts.append(f"     경로: {file_path}")
+                else:
+                    # 🆕 지연 모드: 아직 다운로드하지 않은 파일
+                    file_name = file_info.get('name') or f"{file_type} ({file_info.get('mime_type') or '알 수 없음'})"
+                    combined_parts.append(f"  {emoji} {file_name} ({file_size}, 미다운로드)")
+                    fetch_cmd = f"python telegram_bot.py fetch {task['message_id']}"
+                    if partition != DEFAULT_PARTITION:
+                        fetch_cmd += f" --bot={partition}"
+                    combined_parts.append(f"     받기: {fetch_cmd}")
+
+            if len(files) > MAX_LISTED_FILES:
+                task_dir = os.path.relpath(resolve_task_dir(task['message_id'], partition), _BASE_DIR)
+                combined_parts.append(f"  ... 외 {len(files) - MAX_LISTED_FILES}개 파일 ({task_dir}/)")
 
         # 🆕 위치 정보 추가
         location = task.get('location')
@@ -822,9 +1084,14 @@ def combine_tasks(pending_tasks):
     combined_instruction = "\n".join(combined_parts).strip()
 
     # 24시간 컨텍스트를 combined_instruction에 포함 (Claude가 직접 볼 수 있도록)
+    # 요청에 쓰고 남은 토큰 예산 안에서: 최근 대화 원문 → 이전 대화 요약 → 생략
     context_24h = sorted_tasks[0]['context_24h']
-    if context_24h and context_24h != "최근 24시간 이내 대화 내역이 없습니다.":
-        combined_instruction = combined_instruction + "\n\n---\n\n[참고사항]\n" + context_24h
+    if context_24h and context_24h != EMPTY_CONTEXT:
+        budget = CONTEXT_TOKEN_BUDGET - estimate_tokens(combined_instruction)
+        context_text = assemble_context(open_message_log(partition).messages(),
+                                        (chat_id, sorted_tasks[0]['message_id']), budget=budget, partition=partition)
+        if context_text != EMPTY_CONTEXT:
+            combined_instruction = combined_instruction + "\n\n---\n\n[참고사항]\n" + context_text
 
     return {
         "combined_instruction": combined_instruction,
@@ -835,11 +1102,13 @@ def combine_tasks(pending_tasks):
         "all_timestamps": [task['timestamp'] for task in sorted_tasks],
         "context_24h": context_24h,
         "files": all_files,  # 🆕 모든 파일 정보
-        "stale_resume": is_stale_resume  # 🆕 스탈 작업 재개 플래그
+        "stale_resume": is_stale_resume,  # 🆕 스탈 작업 재개 플래그
+        "bot": partition,
+        "chat_dir": chat_dir(chat_id, partition)
     }
 
 
-def reserve_memory_telegram(instruction, chat_id, timestamp, message_id):
+def reserve_memory_telegram(instruction, chat_id, timestamp, message_id, partition=DEFAULT_PARTITION):
     """
     작업 시작 시 즉시 메모리 예약 (중복 방지)
 
@@ -848,6 +1117,7 @@ def reserve_memory_telegram(instruction, chat_id, timestamp, message_id):
         chat_id: 채팅 ID
         timestamp: 메시지 시각 (또는 리스트)
         message_id: 메시지 ID (또는 리스트)
+        partition: 메시지를 받은 봇 (기본 봇이면 생략)
     """
     # message_id가 리스트인 경우 (여러 메시지 합산)
     if isinstance(message_id, list):
@@ -860,7 +1130,7 @@ def reserve_memory_telegram(instruction, chat_id, timestamp, message_id):
         timestamps = [timestamp]
 
     # 메인 작업 폴더 생성 (첫 번째 메시지 ID)
-    task_dir = get_task_dir(main_message_id)
+    task_dir = get_task_dir(main_message_id, partition)
     filepath = os.path.join(task_dir, "task_info.txt")
 
     now = datetime.now()
@@ -886,47 +1156,51 @@ def reserve_memory_telegram(instruction, chat_id, timestamp, message_id):
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(content)
 
-    # 메인 메시지 인덱스 업데이트
-    update_index(
-        message_id=main_message_id,
-        instruction=instruction,
-        result_summary="(작업 진행 중...)",
-        files=[],
-        chat_id=chat_id,
-        timestamp=timestamps[0]
-    )
+    # 메인 메시지 인덱스 항목 (추가 메시지와 함께 한 번에 저장)
+    index_entries = [{
+        "message_id": main_message_id,
+        "instruction": instruction,
+        "result_summary": "(작업 진행 중...)",
+        "files": [],
+        "chat_id": chat_id,
+        "timestamp": timestamps[0]
+    }]
 
     # 추가 메시지들도 참조 파일 생성
     for i, (msg_id, ts) in enumerate(zip(message_ids[1:], timestamps[1:]), 2):
-        ref_dir = get_task_dir(msg_id)
+        ref_dir = get_task_dir(msg_id, partition)
         ref_file = os.path.join(ref_dir, "task_info.txt")
         ref_content = f"""[시간] {now.strftime("%Y-%m-%d %H:%M:%S")}
 [메시지ID] {msg_id}
 [출처] Telegram (chat_id: {chat_id})
 [메시지날짜] {ts}
 [지시] (메인 작업 msg_{main_message_id}에 합산됨)
-[참조] tasks/msg_{main_message_id}/
+[참조] {os.path.relpath(task_dir, _BASE_DIR)}/
 [결과] (작업 진행 중...)
 """
         with open(ref_file, "w", encoding="utf-8") as f:
             f.write(ref_content)
 
         # 인덱스에도 추가
-        update_index(
-            message_id=msg_id,
-            instruction=f"(msg_{main_message_id}에 합산됨)",
-            result_summary="(작업 진행 중...)",
-            files=[],
-            chat_id=chat_id,
-            timestamp=ts
-        )
+        index_entries.append({
+            "message_id": msg_id,
+            "instruction": f"(msg_{main_message_id}에 합산됨)",
+            "result_summary": "(작업 진행 중...)",
+            "files": [],
+            "chat_id": chat_id,
+            "timestamp": ts
+        })
+
+    # 인덱스 일괄 업데이트 (한 트랜잭션)
+    update_index_many(index_entries, partition)
 
     print(f"📝 메모리 예약 완료: {task_dir}/task_info.txt")
     if len(message_ids) > 1:
         print(f"   합산 메시지: {len(message_ids)}개 ({', '.join(map(str, message_ids))})")
 
 
-def report_telegram(instruction, result_text, chat_id, timestamp, message_id, files=None):
+def report_telegram(instruction, result_text, chat_id, timestamp, message_id, files=None,
+                    partition=DEFAULT_PARTITION):
     """
     작업 결과를 텔레그램으로 전송하고 메모리에 저장
 
@@ -937,6 +1211,7 @@ def report_telegram(instruction, result_text, chat_id, timestamp, message_id, fi
         timestamp: 메시지 시각 (또는 리스트)
         message_id: 메시지 ID (또는 리스트)
         files: 첨부 파일 리스트 (선택)
+        partition: 메시지를 받은 봇 - 같은 봇으로 응답 (기본 봇이면 생략)
     """
     # message_id가 리스트인 경우 (여러 메시지 합산)
     if isinstance(message_id, list):
@@ -964,7 +1239,7 @@ def report_telegram(instruction, result_text, chat_id, timestamp, message_id, fi
 
     # 텔레그램으로 전송
     print(f"\n📤 텔레그램으로 결과 전송 중... (chat_id: {chat_id})")
-    success = send_files_sync(chat_id, message, files or [])
+    success = send_files_sync(chat_id, message, files or [], partition)
 
     if success:
         print("✅ 결과 전송 완료!")
@@ -974,7 +1249,8 @@ def report_telegram(instruction, result_text, chat_id, timestamp, message_id, fi
             chat_id=chat_id,
             text=message,
             reply_to_message_ids=message_ids,
-            files=[os.path.basename(f) for f in (files or [])]
+            files=[os.path.basename(f) for f in (files or [])],
+            partition=partition
         )
     else:
         print("❌ 결과 전송 실패!")
@@ -982,7 +1258,7 @@ def report_telegram(instruction, result_text, chat_id, timestamp, message_id, fi
         files = []  # 파일 미전송이므로 보낸파일 비움
 
     # 메인 작업 폴더에 메모리 업데이트
-    task_dir = get_task_dir(main_message_id)
+    task_dir = get_task_dir(main_message_id, partition)
     filepath = os.path.join(task_dir, "task_info.txt")
 
     now = datetime.now()
@@ -1013,58 +1289,65 @@ def report_telegram(instruction, result_text, chat_id, timestamp, message_id, fi
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(content)
 
-    # 메인 메시지 인덱스 업데이트 (작업 완료 상태)
-    update_index(
-        message_id=main_message_id,
-        instruction=instruction,
-        result_summary=result_text[:100],  # 결과 요약 (최대 100자)
-        files=[os.path.basename(f) for f in (files or [])],
-        chat_id=chat_id,
-        timestamp=timestamps[0]
-    )
+    # 메인 메시지 인덱스 항목 (작업 완료 상태 - 추가 메시지와 함께 한 번에 저장)
+    index_entries = [{
+        "message_id": main_message_id,
+        "instruction": instruction,
+        "result_summary": result_text[:100],  # 결과 요약 (최대 100자)
+        "result_text": result_text,  # 검색 색인용 결과 전문 (인덱스에는 요약만 저장)
+        "files": [os.path.basename(f) for f in (files or [])],
+        "chat_id": chat_id,
+        "timestamp": timestamps[0]
+    }]
 
     # 추가 메시지들 참조 파일 업데이트
     for i, (msg_id, ts) in enumerate(zip(message_ids[1:], timestamps[1:]), 2):
-        ref_dir = get_task_dir(msg_id)
+        ref_dir = get_task_dir(msg_id, partition)
         ref_file = os.path.join(ref_dir, "task_info.txt")
         ref_content = f"""[시간] {now.strftime("%Y-%m-%d %H:%M:%S")}
 [메시지ID] {msg_id}
 [출처] Telegram (chat_id: {chat_id})
 [메시지날짜] {ts}
 [지시] (메인 작업 msg_{main_message_id}에 합산됨)
-[참조] tasks/msg_{main_message_id}/
+[참조] {os.path.relpath(task_dir, _BASE_DIR)}/
 [결과] {result_text[:100]}...
 """
         with open(ref_file, "w", encoding="utf-8") as f:
             f.write(ref_content)
 
-        # 인덱스 업데이트
-        update_index(
-            message_id=msg_id,
-            instruction=f"(msg_{main_message_id}에 합산됨)",
-            result_summary=result_text[:100],
-            files=[],
-            chat_id=chat_id,
-            timestamp=ts
-        )
+        # 인덱스 항목
+        index_entries.append({
+            "message_id": msg_id,
+            "instruction": f"(msg_{main_message_id}에 합산됨)",
+            "result_summary": result_text[:100],
+            "files": [],
+            "chat_id": chat_id,
+            "timestamp": ts
+        })
+
+    # 인덱스 일괄 업데이트 (한 트랜잭션)
+    update_index_many(index_entries, partition)
 
     print(f"💾 메모리 저장 완료: {task_dir}/task_info.txt")
     if len(message_ids) > 1:
         print(f"   합산 메시지: {len(message_ids)}개 처리 완료")
 
 
-def mark_done_telegram(message_id):
+def mark_done_telegram(message_id, partition=DEFAULT_PARTITION, chat_id=None):
     """
     텔레그램 메시지 처리 완료 표시
 
     Args:
         message_id: 메시지 ID (또는 리스트)
+        partition: 메시지를 받은 봇 (기본 봇이면 생략)
+        chat_id: 메시지의 채팅 (생략하면 이 작업자의 진행 중 작업/메시지 로그에서 찾음)
     """
     # message_id가 리스트인 경우 (여러 메시지 합산)
     if isinstance(message_id, list):
-        message_ids = message_id
+        message_ids = list(message_id)
     else:
         message_ids = [message_id]
+    keys = _message_keys(message_ids, chat_id, partition)
 
     # 🆕 작업 중에 추가된 새 지시사항도 함께 처리
     new_instructions = load_new_instructions()
@@ -1072,15 +1355,13 @@ def mark_done_telegram(message_id):
         print(f"📝 작업 중 추가된 지시사항 {len(new_instructions)}개 함께 처리")
         for inst in new_instructions:
             message_ids.append(inst["message_id"])
+            keys.append(message_key(inst))
 
-    data = load_telegram_messages()
-    messages = data.get("messages", [])
+    # 처리 완료 레코드만 추가 (전체 파일을 다시 쓰지 않음)
+    open_message_log(partition).update_many(keys, processed=True)
 
-    for msg in messages:
-        if msg["message_id"] in message_ids:
-            msg["processed"] = True
-
-    save_telegram_messages(data)
+    # 작업 대기열에서 완료 처리
+    open_job_queue().complete(partition, keys)
 
     # 🆕 새 지시사항 파일 정리
     clear_new_instructions()
@@ -1091,55 +1372,181 @@ def mark_done_telegram(message_id):
         print(f"✅ 메시지 {message_ids[0]} 처리 완료 표시")
 
 
-def load_memory():
+_TASK_INFO_TAG_RE = re.compile(r"^\[(시간|메시지ID|출처|메시지날짜|지시|참조|결과|보낸파일)\] ?(.*)$")
+_TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+_CHAT_ID_RE = re.compile(r"chat_id: (-?\d+)")
+
+
+def _parse_task_info(content):
     """
-    기존 메모리 파일 전부 읽기 (tasks/*/task_info.txt)
+    task_info.txt 헤더 파싱 ([시간], [메시지날짜], [출처], [지시], [결과], [보낸파일])
 
     Returns:
-        list: 메모리 내용 리스트
+        dict: 인덱스 항목 필드 (instruction, result_summary, files, chat_id, timestamp)
+    """
+    sections = {}
+    current = None
+    for line in content.splitlines():
+        match = _TASK_INFO_TAG_RE.match(line)
+        if match:
+            current, value = match.groups()
+            sections[current] = [value] if value.strip() else []
+        elif current is not None:
+            sections[current].append(line)
+
+    def section(tag):
+        return "\n".join(sections.get(tag, [])).strip()
+
+    chat_match = _CHAT_ID_RE.search(section("출처"))
+    time_match = _TIMESTAMP_RE.search(section("메시지날짜")) or _TIMESTAMP_RE.search(section("시간"))
+    sent_files = section("보낸파일")
+
+    return {
+        "instruction": section("지시"),
+        "result_summary": section("결과")[:100],
+        "files": [name.strip() for name in sent_files.split(",")] if sent_files else [],
+        "chat_id": int(chat_match.group(1)) if chat_match else None,
+        "timestamp": time_match.group(0) if time_match else None
+    }
+
+
+def _sync_memory_manifest(partition=DEFAULT_PARTITION):
+    """
+    인덱스에 없는 작업 폴더의 task_info.txt 헤더를 인덱스에 등록 (파티션마다 한 번)
+
+    인덱스 도입 전에 만들어진 폴더용 - 이후 폴더는 reserve/report가 인덱스를 함께 갱신합니다.
+    """
+    index = open_task_index(partition)
+    if index.get_meta("memory_manifest_synced"):
+        return
+
+    known = index.message_ids()
+    entries = []
+    for message_id, task_dir in iter_task_dirs(partition):
+        task_info_file = os.path.join(task_dir, "task_info.txt")
+        if message_id in known or not os.path.exists(task_info_file):
+            continue
+        try:
+            with open(task_info_file, "r", encoding="utf-8") as f:
+                entries.append({"message_id": message_id, **_parse_task_info(f.read())})
+        except Exception as e:
+            print(f"⚠️ msg_{message_id}/task_info.txt 읽기 오류: {e}")
+
+    if entries:
+        update_index_many(entries, partition)
+        print(f"📇 메모리 목록 등록: 인덱스에 없던 작업 {len(entries)}개")
+    index.set_meta("memory_manifest_synced", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
+class MemoryEntry(dict):
+    """
+    iter_memory() 항목
+
+    message_id, task_dir, timestamp, instruction, result_summary, chat_id, files는 인덱스에서 채우고
+    "content"(task_info.txt 전문)는 처음 접근할 때 읽습니다.
+    """
+
+    def __missing__(self, key):
+        if key != "content":
+            raise KeyError(key)
+        with open(os.path.join(self["task_dir"], "task_info.txt"), "r", encoding="utf-8") as f:
+            self["content"] = f.read()
+        return self["content"]
+
+    def get(self, key, default=None):
+        if key == "content":
+            return self["content"]
+        return super().get(key, default)
+
+
+def iter_memory(limit=None, since=None, chat_id=None, partition=DEFAULT_PARTITION):
+    """
+    기존 메모리 순회 (최신순, tasks/*/task_info.txt)
+
+    인덱스(작업 목록)를 페이지 단위로 읽어 하나씩 돌려주며,
+    task_info.txt 본문은 항목의 "content"에 접근할 때만 읽습니다.
+    (JSON으로 보내거나 len()/인덱싱이 필요하면 load_memory() 사용)
+
+    Args:
+        limit: 최대 개수 (None이면 전체)
+        since: 이 시각 이후 메시지만 (예: "2026-10-01")
+        chat_id: 특정 채팅만
+        partition: 봇 (팀별 봇은 tasks/{봇이름}/*/task_info.txt - 봇끼리 메모리 분리)
+
+    Yields:
+        MemoryEntry: {"message_id", "task_dir", "timestamp", "instruction", "result_summary",
+                      "chat_id", "files", "content"(지연 로드)}
+    """
+    if limit is not None and limit <= 0:
+        return
+
+    _sync_memory_manifest(partition)
+
+    count = 0
+    page_size = min(limit, 200) if limit else 200
+    for task in open_task_index(partition).iter_all(chat_id=chat_id, since=since, page_size=page_size):
+        task_dir = resolve_task_dir(task["message_id"], partition)
+        if not os.path.exists(os.path.join(task_dir, "task_info.txt")):
+            continue  # 폴더가 삭제된 작업
+
+        yield MemoryEntry(
+            message_id=task["message_id"],
+            task_dir=task_dir,
+            timestamp=task["timestamp"],
+            instruction=task["instruction"],
+            result_summary=task["result_summary"],
+            chat_id=task["chat_id"],
+            files=task["files"]
+        )
+        count += 1
+        if limit is not None and count >= limit:
+            return
+
+
+def load_memory(limit=None, since=None, chat_id=None, partition=DEFAULT_PARTITION):
+    """
+    기존 메모리 읽기 (최신순, tasks/*/task_info.txt)
+
+    Args:
+        limit: 최대 개수 (None이면 전체)
+        since: 이 시각 이후 메시지만 (예: "2026-10-01")
+        chat_id: 특정 채팅만
+        partition: 봇 (팀별 봇은 tasks/{봇이름}/*/task_info.txt - 봇끼리 메모리 분리)
+
+    Returns:
+        list: 메모리 내용 리스트 (일반 dict - JSON 직렬화 가능)
         [
             {
                 "message_id": int,
                 "task_dir": str,
-                "content": str
+                "content": str,
+                "timestamp": str,
+                "instruction": str,
+                "result_summary": str,
+                "chat_id": int,
+                "files": list
             },
             ...
         ]
     """
-    if not os.path.exists(TASKS_DIR):
-        return []
-
     memories = []
-
-    # tasks/ 폴더 내 모든 msg_* 폴더 탐색
-    for task_folder in os.listdir(TASKS_DIR):
-        if task_folder.startswith("msg_"):
-            task_dir = os.path.join(TASKS_DIR, task_folder)
-            task_info_file = os.path.join(task_dir, "task_info.txt")
-
-            if os.path.exists(task_info_file):
-                try:
-                    # message_id 추출 (msg_5 → 5)
-                    message_id = int(task_folder.split("_")[1])
-
-                    with open(task_info_file, "r", encoding="utf-8") as f:
-                        content = f.read()
-                        memories.append({
-                            "message_id": message_id,
-                            "task_dir": task_dir,
-                            "content": content
-                        })
-                except Exception as e:
-                    print(f"⚠️ {task_folder}/task_info.txt 읽기 오류: {e}")
-
-    # message_id 역순 정렬 (최신순)
-    memories.sort(key=lambda x: x["message_id"], reverse=True)
-
+    for entry in iter_memory(limit=limit, since=since, chat_id=chat_id, partition=partition):
+        try:
+            memories.append(dict(entry, content=entry["content"]))
+        except OSError as e:
+            print(f"⚠️ {os.path.basename(entry['task_dir'])}/task_info.txt 읽기 오류: {e}")
     return memories
 
 
 # 테스트 코드
 if __name__ == "__main__":
+    # 지연 모드 첨부 파일 받기: python telegram_bot.py fetch <message_id> [--bot=이름]
+    if len(sys.argv) >= 3 and sys.argv[1] == "fetch":
+        bot_name = next((arg.split("=", 1)[1] for arg in sys.argv[3:] if arg.startswith("--bot=")), DEFAULT_PARTITION)
+        for path in fetch_attachment(int(sys.argv[2]), partition=bot_name):
+            print(path)
+        sys.exit(0)
+
     print("=" * 60)
     print("텔레그램 봇 - 대기 중인 명령 확인")
     print("=" * 60)
@@ -1153,7 +1560,7 @@ if __name__ == "__main__":
 
         for i, task in enumerate(pending, 1):
             print(f"--- 명령 #{i} ---")
-            print(f"메시지 ID: {task['message_id']}")
+            print(f"메시지 ID: {task['message_id']}" + (f" (봇: {task['bot']})" if task['bot'] != DEFAULT_PARTITION else ""))
             print(f"사용자: {task['user_name']}")
             print(f"시각: {task['timestamp']}")
             print(f"명령: {task['instruction']}")
@@ -0,0 +1,141 @@
+"""
+최근 24시간 대화 컨텍스트 생성기
+
+역할:
+- 대기 중인 메시지 P개의 24시간 대화 내역을 한 번의 전체 순회로 생성 (O(N + P log N))
+- 타임스탬프는 한 번만 파싱하여 캐시 (같은 프로세스에서 재사용)
+- 24시간 이내 메시지(창)를 저장 순서대로 한 번 모은 뒤, 각 메시지의 컨텍스트는
+  창에서 "해당 메시지 이전" 구간을 bisect로 잘라서 사용
+
+기존 get_24h_context()와 결과가 같습니다:
+- 저장 순서 기준으로 현재 사용자 메시지 이전까지만 포함
+- 24시간 이전 메시지 제외
+
+사용법:
+    from telegram_context import build_24h_contexts
+
+    contexts = build_24h_contexts(messages, [(chat_id, msg_id_1), (chat_id, msg_id_2)])
+    contexts[(chat_id, msg_id_1)]  # "=== 최근 24시간 대화 내역 ===\n..."
+    (메시지 키 대신 message_id만 주면 ID만 비교 - 채팅이 하나일 때)
+
+    window_messages(messages, msg_id_1)  # 같은 범위의 메시지 목록 (context_assembler.py용)
+"""
+
+import time
+from bisect import bisect_left
+from datetime import datetime
+from functools import lru_cache
+
+from task_layout import resolve_task_path
+from message_log import message_key
+
+CONTEXT_WINDOW_SECONDS = 24 * 60 * 60
+EMPTY_CONTEXT = "최근 24시간 이내 대화 내역이 없습니다."
+CONTEXT_HEADER = "=== 최근 24시간 대화 내역 ===\n"
+
+
+@lru_cache(maxsize=262144)
+def parse_epoch(timestamp):
+    """'%Y-%m-%d %H:%M:%S' 문자열 → epoch 초 (결과 캐시)"""
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+def format_context_line(msg):
+    """대화 내역 한 줄 (사용자 메시지 / 봇 응답)"""
+    msg_type = msg.get("type", "user")  # 기본값 user (하위 호환)
+
+    if msg_type == "user":
+        user_name = msg.get("first_name", "사용자")
+        text = msg.get("text", "")
+
+        files = msg.get("files", [])
+        file_info = f" [첨부: {len(files)}개 파일]" if files else ""
+
+        location = msg.get("location")
+        location_info = f" [위치: {location['latitude']}, {location['longitude']}]" if location else ""
+
+        return f"[{msg['timestamp']}] {user_name}: {text}{file_info}{location_info}"
+
+    if msg_type == "bot":
+        text = msg.get("text", "")
+        # 긴 응답은 요약
+        text_preview = text[:150] + "..." if len(text) > 150 else text
+
+        files = msg.get("files", [])
+        file_info = f" [전송: {', '.join(map(resolve_task_path, files))}]" if files else ""
+
+        return f"[{msg['timestamp']}] 🤖 소놀봇: {text_preview}{file_info}"
+
+    return None
+
+
+def _is_message(msg, ref):
+    """msg가 ref(메시지 키 (chat_id, message_id) 또는 message_id)가 가리키는 메시지인지"""
+    return (message_key(msg) if isinstance(ref, tuple) else msg["message_id"]) == ref
+
+
+def build_24h_contexts(messages, message_ids, now=None):
+    """
+    여러 메시지의 최근 24시간 대화 내역을 한 번에 생성
+
+    Args:
+        messages: 전체 메시지 리스트 (저장 순서)
+        message_ids: 컨텍스트가 필요한 메시지 키 (chat_id, message_id) 또는 message_id 리스트
+        now: 기준 시각 (epoch 초, 기본값 현재 시각)
+
+    Returns:
+        dict: 메시지 키(또는 message_id) → 대화 내역 텍스트
+    """
+    cutoff = (time.time() if now is None else now) - CONTEXT_WINDOW_SECONDS
+    wanted = set(message_ids)
+
+    # 1회 순회: 24시간 창에 들어가는 메시지(저장 위치, 한 줄)와 대상 메시지의 저장 위치
+    window_positions = []
+    window_lines = []
+    stop_positions = {}
+
+    for position, msg in enumerate(messages):
+        if msg.get("type") == "user":
+            for ref in (message_key(msg), msg["message_id"]):
+                if ref in wanted and ref not in stop_positions:
+                    stop_positions[ref] = position
+
+        if parse_epoch(msg["timestamp"]) < cutoff:
+            continue
+        line = format_context_line(msg)
+        if line is not None:
+            window_positions.append(position)
+            window_lines.append(line)
+
+    # 각 메시지: 창에서 자기 위치 이전 구간만 사용 (없는 ID는 창 전체)
+    contexts = {}
+    for message_id in message_ids:
+        end = bisect_left(window_positions, stop_positions.get(message_id, len(messages)))
+        if end == 0:
+            contexts[message_id] = EMPTY_CONTEXT
+        else:
+            contexts[message_id] = "\n".join([CONTEXT_HEADER] + window_lines[:end])
+
+    return contexts
+
+
+def window_messages(messages, message_id, now=None):
+    """
+    message_id 메시지 이전의 최근 24시간 메시지 (저장 순서, build_24h_contexts()와 같은 범위)
+
+    Args:
+        messages: 전체 메시지 리스트 (저장 순서)
+        message_id: 기준 사용자 메시지 키 (chat_id, message_id) 또는 ID (없으면 전체)
+        now: 기준 시각 (epoch 초, 기본값 현재 시각)
+
+    Returns:
+        list: 메시지 리스트
+    """
+    cutoff = (time.time() if now is None else now) - CONTEXT_WINDOW_SECONDS
+    window = []
+    for msg in messages:
+        if msg.get("type") == "user" and _is_message(msg, message_id):
+            break
+        if parse_epoch(msg["timestamp"]) >= cutoff and msg.get("type", "user") in ("user", "bot"):
+            window.append(msg)
+    return window
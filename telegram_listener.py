@@ -8,24 +8,65 @@
 - 중복 메시지 방지
 
 사용법:
-    python telegram_listener.py
+    python telegram_listener.py            # 주기적 폴링 (적응형 간격 - poll_scheduler)
+    python telegram_listener.py --daemon   # 상주 모드 (Bot 세션 재사용 + 연속 long polling)
+    python telegram_listener.py --webhook  # 웹훅 모드 (내장 HTTP 서버로 업데이트 수신)
+    python telegram_listener.py --webhook --no-register  # 웹훅 등록 없이 로컬 서버만 실행 (오프라인 테스트)
+
+여러 봇 (TELEGRAM_BOT_TOKENS=team_a=토큰,team_b=토큰):
+    폴링/상주 모드는 설정된 모든 봇을 하나의 이벤트 루프에서 동시에 수신하며,
+    봇마다 별도의 오프셋 체크포인트와 메시지 파티션(telegram_messages/{봇이름}/)을 사용합니다.
+    웹훅 모드는 기본 봇(TELEGRAM_BOT_TOKEN)만 지원합니다.
     (Ctrl+C로 종료)
 """
 
 import os
+import sys
 import json
 import time
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from telegram import Bot
+from telegram import Bot, Update
+from telegram.request import HTTPXRequest
 import asyncio
 
+import attachment_store
+from bot_registry import DEFAULT_PARTITION, load_bots, get_token, partition_file
+from task_layout import resolve_task_dir
+from offset_checkpoint import open_checkpoint
+from message_retention import start_background_retention
+from poll_scheduler import AdaptivePoller, POLL_STATS_FILE, MAX_INTERVAL as POLL_MAX_INTERVAL
+from message_log import open_message_log, message_key, MESSAGES_LOG_DIR
+from state_store import group_commit
+
 # .env 파일 로드
 load_dotenv()
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ALLOWED_USERS = [int(uid.strip()) for uid in os.getenv("TELEGRAM_ALLOWED_USERS", "").split(",") if uid.strip()]
 POLLING_INTERVAL = int(os.getenv("TELEGRAM_POLLING_INTERVAL", "10"))
+LONG_POLL_TIMEOUT = int(os.getenv("TELEGRAM_LONG_POLL_TIMEOUT", "50"))  # 상주 모드 long polling 대기 (초)
+HTTP_POOL_SIZE = int(os.getenv("TELEGRAM_HTTP_POOL_SIZE", "8"))  # 상주 모드 HTTP 연결 풀 크기
+DOWNLOAD_CONCURRENCY = int(os.getenv("TELEGRAM_DOWNLOAD_CONCURRENCY", "4"))  # 동시 다운로드 수
+MAX_FILE_BYTES = int(os.getenv("TELEGRAM_MAX_FILE_BYTES", str(20 * 1024 * 1024)))  # 파일당 최대 크기 (0=무제한)
+MAX_BATCH_BYTES = int(os.getenv("TELEGRAM_MAX_BATCH_BYTES", str(200 * 1024 * 1024)))  # 폴링 1회 총 다운로드 한도 (0=무제한)
+LAZY_MEDIA = os.getenv("TELEGRAM_LAZY_MEDIA", "0") == "1"  # 사진 외 첨부는 메타데이터만 기록, 필요 시 다운로드
+LAZY_PREFETCH_BYTES = int(os.getenv("TELEGRAM_LAZY_PREFETCH_BYTES", str(1024 * 1024)))  # 상주 모드에서 미리 받아둘 최대 크기
+LAZY_TYPES = ("document", "video", "audio", "voice")
+
+# 웹훅 모드 설정 (TELEGRAM_WEBHOOK_URL이 있으면 check_telegram의 폴링은 생략됨)
+WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "")  # 텔레그램에 등록할 공개 URL (예: https://example.com/telegram)
+WEBHOOK_HOST = os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET", "")  # X-Telegram-Bot-Api-Secret-Token 검증용
+WEBHOOK_MAX_BODY = 1024 * 1024  # 업데이트 JSON 최대 크기
+
+MEDIA_GROUP_WAIT = float(os.getenv("TELEGRAM_MEDIA_GROUP_WAIT", "2"))  # 앨범 나머지 사진 도착 대기 (초)
+
+# 상주 모드 백그라운드 작업 (GC로 사라지지 않도록 참조 보관)
+_background_tasks = set()
 
 _BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MESSAGES_FILE = os.path.join(_BASE_DIR, "telegram_messages.json")
@@ -39,6 +80,10 @@ def setup_bot_token():
     if BOT_TOKEN and BOT_TOKEN not in ("", "YOUR_BOT_TOKEN", "your_bot_token_here"):
         return True
 
+    # 팀별 봇(TELEGRAM_BOT_TOKENS)만 사용하는 경우 기본 봇 토큰 불필요
+    if not any(bot["name"] == DEFAULT_PARTITION for bot in load_bots()):
+        return True
+
     print("\n" + "=" * 60)
     print("⚠️  TELEGRAM_BOT_TOKEN이 .env에 설정되지 않았습니다.")
     print("=" * 60)
@@ -73,13 +118,11 @@ def setup_bot_token():
 
 
 def load_messages():
-    """저장된 메시지 로드"""
-    if os.path.exists(MESSAGES_FILE):
-        try:
-            with open(MESSAGES_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"⚠️ telegram_messages.json 읽기 오류: {e}")
+    """저장된 메시지 로드 (기존 telegram_messages.json 형식)"""
+    try:
+        return open_message_log().to_dict()
+    except Exception as e:
+        print(f"⚠️ 메시지 로그 읽기 오류: {e}")
 
     return {
         "messages": [],
@@ -88,32 +131,56 @@ def load_messages():
 
 
 def save_messages(data):
-    """메시지 저장"""
-    with open(MESSAGES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """메시지 전체 저장 (전체 교체 - 새 메시지 추가는 메시지 로그 append 사용)"""
+    open_message_log().replace_all(data)
 
 
-async def download_file(bot, file_id, message_id, file_type, file_name=None):
+async def download_file(bot, file_id, message_id, file_type, file_name=None, file_unique_id=None,
+                        partition=DEFAULT_PARTITION):
     """
     텔레그램 파일 다운로드
 
+    이미 저장소(attachment_store)에 있는 파일(file_unique_id 기준)은
+    다운로드하지 않고 작업 폴더에 하드링크만 생성합니다.
+
     Args:
         bot: Telegram Bot 인스턴스
         file_id: 텔레그램 파일 ID
         message_id: 메시지 ID
         file_type: 파일 타입 (photo, document, video, audio, voice)
         file_name: 파일명 (document의 경우)
+        file_unique_id: 텔레그램 file_unique_id (중복 다운로드 방지용)
+        partition: 봇 파티션 (팀별 봇은 tasks/{partition}/{샤드}/msg_{id})
 
     Returns:
         str: 다운로드된 파일 경로 (실패 시 None)
     """
     try:
-        # tasks/msg_{message_id} 폴더 생성
-        task_dir = os.path.join(_BASE_DIR, "tasks", f"msg_{message_id}")
+        # 작업 폴더 생성 (tasks/{샤드}/msg_{message_id}, 이전 전 폴더가 있으면 그대로)
+        task_dir = resolve_task_dir(message_id, partition)
         os.makedirs(task_dir, exist_ok=True)
 
+        # 타입별 기본 파일명
+        type_prefix = {
+            'photo': 'image',
+            'video': 'video',
+            'audio': 'audio',
+            'voice': 'voice'
+        }
+        prefix = type_prefix.get(file_type, 'file')
+
+        # 저장소에 이미 있으면 네트워크 없이 링크만 생성
+        cached = attachment_store.lookup(file_unique_id)
+        if cached:
+            filename = file_name or f"{prefix}_{message_id}{cached['ext'] or '.jpg'}"
+            local_path = attachment_store.link_into(cached["path"], os.path.join(task_dir, filename))
+            attachment_store.record_hit(cached["size"])
+            print(f"📎 파일 재사용 (저장소): {filename} ({cached['size']} bytes)")
+            return local_path
+
         # 파일 정보 가져오기
         file = await bot.get_file(file_id)
+        ext = os.path.splitext(file.file_path or "")[1]
 
         # 파일 확장자 결정
         if file_name:
@@ -121,22 +188,16 @@ async def download_file(bot, file_id, message_id, file_type, file_name=None):
             filename = file_name
         else:
             # photo, video 등의 경우 확장자 추출
-            file_path = file.file_path
-            ext = os.path.splitext(file_path)[1] or '.jpg'
-
-            # 타입별 기본 파일명
-            type_prefix = {
-                'photo': 'image',
-                'video': 'video',
-                'audio': 'audio',
-                'voice': 'voice'
-            }
-            prefix = type_prefix.get(file_type, 'file')
-            filename = f"{prefix}_{message_id}{ext}"
+            filename = f"{prefix}_{message_id}{ext or '.jpg'}"
+
+        # 파일 다운로드 (저장소 임시 파일 → blob 이동 → 작업 폴더 링크)
+        os.makedirs(attachment_store.STORE_DIR, exist_ok=True)
+        tmp_path = os.path.join(attachment_store.STORE_DIR, f"download_{message_id}_{file.file_unique_id}.part")
+        await file.download_to_drive(tmp_path)
 
-        # 파일 다운로드
-        local_path = os.path.join(task_dir, filename)
-        await file.download_to_drive(local_path)
+        blob = attachment_store.put(file_unique_id or file.file_unique_id, tmp_path, ext)
+        local_path = attachment_store.link_into(blob, os.path.join(task_dir, filename))
+        attachment_store.record_miss()
 
         print(f"📎 파일 다운로드: {filename} ({file.file_size} bytes)")
         return local_path
@@ -146,144 +207,363 @@ async def download_file(bot, file_id, message_id, file_type, file_name=None):
         return None
 
 
-async def fetch_new_messages():
-    """새로운 메시지 가져오기 (텍스트 + 이미지 + 파일 지원)"""
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print("❌ TELEGRAM_BOT_TOKEN 미설정. 프로그램을 종료합니다.")
+class ByteBudget:
+    """폴링 1회 동안의 총 다운로드 바이트 예산"""
+
+    def __init__(self, total_bytes):
+        self.total_bytes = total_bytes
+        self.used_bytes = 0
+
+    def reserve(self, size):
+        """size만큼 예산 예약. 한도 초과 시 False (total_bytes=0이면 무제한)"""
+        if self.total_bytes and self.used_bytes + size > self.total_bytes:
+            return False
+        self.used_bytes += size
+        return True
+
+
+def _collect_attachments(msg):
+    """
+    메시지에서 다운로드할 첨부 파일 목록 추출
+
+    Returns:
+        list: [{"type", "file_id", "file_unique_id", "mime_type", "file_name", "size", "meta"}, ...]
+              meta는 메시지 레코드의 파일 정보에 그대로 들어가는 추가 필드
+    """
+    specs = []
+
+    # 사진 (여러 장 가능 - 가장 큰 크기 선택)
+    if msg.photo:
+        # photo는 여러 크기의 배열 - 마지막이 가장 큼
+        largest_photo = msg.photo[-1]
+        specs.append({
+            "type": "photo",
+            "file_id": largest_photo.file_id,
+            "file_unique_id": largest_photo.file_unique_id,
+            "mime_type": getattr(largest_photo, "mime_type", None),
+            "file_name": None,
+            "size": largest_photo.file_size,
+            "meta": {"size": largest_photo.file_size}
+        })
+
+    # 문서 (PDF, DOCX, 등)
+    if msg.document:
+        specs.append({
+            "type": "document",
+            "file_id": msg.document.file_id,
+            "file_unique_id": msg.document.file_unique_id,
+            "mime_type": getattr(msg.document, "mime_type", None),
+            "file_name": msg.document.file_name,
+            "size": msg.document.file_size,
+            "meta": {
+                "name": msg.document.file_name,
+                "mime_type": msg.document.mime_type,
+                "size": msg.document.file_size
+            }
+        })
+
+    # 비디오
+    if msg.video:
+        specs.append({
+            "type": "video",
+            "file_id": msg.video.file_id,
+            "file_unique_id": msg.video.file_unique_id,
+            "mime_type": getattr(msg.video, "mime_type", None),
+            "file_name": None,
+            "size": msg.video.file_size,
+            "meta": {"duration": msg.video.duration, "size": msg.video.file_size}
+        })
+
+    # 오디오
+    if msg.audio:
+        specs.append({
+            "type": "audio",
+            "file_id": msg.audio.file_id,
+            "file_unique_id": msg.audio.file_unique_id,
+            "mime_type": getattr(msg.audio, "mime_type", None),
+            "file_name": msg.audio.file_name,
+            "size": msg.audio.file_size,
+            "meta": {"duration": msg.audio.duration, "size": msg.audio.file_size}
+        })
+
+    # 음성 메시지
+    if msg.voice:
+        specs.append({
+            "type": "voice",
+            "file_id": msg.voice.file_id,
+            "file_unique_id": msg.voice.file_unique_id,
+            "mime_type": getattr(msg.voice, "mime_type", None),
+            "file_name": None,
+            "size": msg.voice.file_size,
+            "meta": {"duration": msg.voice.duration, "size": msg.voice.file_size}
+        })
+
+    return specs
+
+
+async def _download_attachment(bot, semaphore, budget, message_id, spec, partition=DEFAULT_PARTITION):
+    """
+    첨부 파일 1개 다운로드 (동시 실행 수 및 바이트 예산 제한)
+
+    Returns:
+        dict: 메시지 레코드용 파일 정보 (건너뛰거나 실패 시 None)
+    """
+    size = spec["size"] or 0
+
+    if MAX_FILE_BYTES and size > MAX_FILE_BYTES:
+        print(f"⚠️  파일 크기 제한 초과로 건너뜀: {spec['type']} ({size} bytes > {MAX_FILE_BYTES})")
         return None
 
-    bot = Bot(token=BOT_TOKEN)
-    data = load_messages()
-    last_update_id = data.get("last_update_id", 0)
+    # 예산 예약은 첫 await 이전에 이루어지므로 업데이트 순서대로 처리됨
+    if not budget.reserve(size):
+        print(f"⚠️  다운로드 총량 한도 초과로 건너뜀: {spec['type']} ({size} bytes)")
+        return None
+
+    async with semaphore:
+        file_path = await download_file(
+            bot, spec["file_id"], message_id, spec["type"], spec["file_name"], spec["file_unique_id"], partition
+        )
+
+    if not file_path:
+        return None
+
+    return {"type": spec["type"], "path": file_path, **spec["meta"]}
+
+
+async def _resolved(value):
+    return value
+
+
+def _lazy_attachment(spec, message_id):
+    """
+    지연 다운로드용 파일 정보 (다운로드 없이 메타데이터만 기록)
+
+    실제 파일은 telegram_bot.fetch_attachment()로 처음 접근할 때 받습니다.
+    source_message_id는 앨범으로 합쳐진 경우에도 원래 메시지 폴더/파일명을 쓰기 위함입니다.
+    """
+    file_info = {
+        "type": spec["type"],
+        "path": None,
+        "lazy": True,
+        "source_message_id": message_id,
+        "file_id": spec["file_id"],
+        "file_unique_id": spec["file_unique_id"],
+        "mime_type": spec["mime_type"],
+        **spec["meta"]
+    }
+    if spec["file_name"]:
+        file_info["name"] = spec["file_name"]
+    return file_info
+
+
+async def _prefetch_to_store(bot, spec):
+    """작은 지연 파일을 저장소에 미리 받아두기 (이후 fetch_attachment는 네트워크 없이 처리)"""
+    if attachment_store.lookup(spec["file_unique_id"]):
+        return
 
     try:
-        # 새로운 업데이트 가져오기 (long polling)
-        updates = await bot.get_updates(
-            offset=last_update_id + 1,
-            timeout=5,
-            allowed_updates=["message"]
+        file = await bot.get_file(spec["file_id"])
+        ext = os.path.splitext(file.file_path or "")[1]
+        os.makedirs(attachment_store.STORE_DIR, exist_ok=True)
+        tmp_path = os.path.join(attachment_store.STORE_DIR, f"prefetch_{spec['file_unique_id']}.part")
+        await file.download_to_drive(tmp_path)
+        attachment_store.put(spec["file_unique_id"], tmp_path, ext)
+        attachment_store.record_miss()
+        print(f"📥 미리 받기 완료: {spec['type']} ({file.file_size} bytes)")
+    except Exception as e:
+        print(f"⚠️ 미리 받기 실패 (접근 시 다시 시도): {e}")
+
+
+def _schedule_prefetch(bot, specs):
+    """지연 파일 중 작은 것만 백그라운드로 미리 받기 (상주 모드 전용)"""
+    for spec in specs:
+        if (spec["size"] or 0) <= LAZY_PREFETCH_BYTES:
+            task = asyncio.create_task(_prefetch_to_store(bot, spec))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+
+class CycleStats:
+    """상주 모드 폴링 사이클별 지연 통계 (최근 window개 기준)"""
+
+    def __init__(self, window=100):
+        self.cycles = 0
+        self.messages = 0
+        self.poll_times = deque(maxlen=window)     # get_updates 대기 시간
+        self.process_times = deque(maxlen=window)  # 수신 후 저장까지 처리 시간
+
+    def record(self, poll_seconds, process_seconds, message_count):
+        self.cycles += 1
+        self.messages += message_count
+        self.poll_times.append(poll_seconds)
+        self.process_times.append(process_seconds)
+
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return "-"
+        ordered = sorted(values)
+        avg = sum(ordered) / len(ordered)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return f"avg {avg * 1000:.0f}ms / p95 {p95 * 1000:.0f}ms / max {ordered[-1] * 1000:.0f}ms"
+
+    def report(self):
+        return (f"사이클 {self.cycles}회, 메시지 {self.messages}개 | "
+                f"폴링 {self._summary(self.poll_times)} | "
+                f"처리 {self._summary(self.process_times)}")
+
+
+def create_bot(token=None):
+    """
+    상주 모드용 Bot 생성 (HTTP 연결 풀 재사용)
+
+    일반 API 호출과 get_updates용 연결을 분리하여 long polling 중에도
+    파일 다운로드가 막히지 않도록 합니다.
+    """
+    return Bot(
+        token=token or BOT_TOKEN,
+        request=HTTPXRequest(connection_pool_size=max(HTTP_POOL_SIZE, DOWNLOAD_CONCURRENCY)),
+        get_updates_request=HTTPXRequest(
+            connection_pool_size=1,
+            read_timeout=LONG_POLL_TIMEOUT + 10
         )
+    )
 
-        new_messages = []
 
-        for update in updates:
-            if not update.message:
-                continue
+def _merge_media_group(leader, message_data):
+    """앨범의 다른 사진을 대표 레코드에 합치기"""
+    leader["files"].extend(message_data["files"])
+    leader["grouped_message_ids"].append(message_data["message_id"])
+    text = message_data["text"]
+    if text and text not in leader["text"]:
+        leader["text"] = f"{leader['text']}\n{text}" if leader["text"] else text
+
+
+def _pending_media_group_wait(updates):
+    """
+    마지막 업데이트가 아직 수신 중일 수 있는 앨범의 일부이면 남은 대기 시간
+
+    Returns:
+        float: 대기할 시간 (초, 대기 불필요 시 0)
+    """
+    if not updates or not updates[-1].message or not updates[-1].message.media_group_id:
+        return 0.0
+    age = (datetime.now(timezone.utc) - updates[-1].message.date).total_seconds()
+    return min(MEDIA_GROUP_WAIT, max(0.0, MEDIA_GROUP_WAIT - age))
 
-            msg = update.message
-            user = msg.from_user
 
-            # 허용된 사용자 체크
-            if ALLOWED_USERS and user.id not in ALLOWED_USERS:
-                print(f"⚠️  차단: 허용되지 않은 사용자 {user.id} ({user.first_name})")
+async def process_updates(bot, updates, log, prefetch=False, checkpoint=None, partition=DEFAULT_PARTITION):
+    """
+    수신한 업데이트를 메시지 로그에 저장 (폴링/웹훅 공통)
+
+    허용 사용자 확인, 첨부 파일 다운로드, 위치 정보 추출 후
+    업데이트 순서대로 메시지 레코드를 추가합니다. 첨부 파일은 모두 동시에
+    받지만 저장은 순서대로 하며, 앞선 업데이트는 뒤의 큰 파일을 기다리지 않고
+    곧바로 저장/체크포인트됩니다.
+
+    Args:
+        bot: Telegram Bot 인스턴스
+        updates: telegram.Update 리스트
+        log: MessageLog
+        prefetch: 지연 모드에서 작은 파일을 백그라운드로 미리 받기 (이벤트 루프가 계속 유지되는 경우만)
+        checkpoint: IngestCheckpoint (폴링 전용 - 업데이트마다 수집 기록 후 오프셋 전진)
+        partition: 봇 파티션 (팀별 봇이면 레코드에 "bot" 필드 기록)
+
+    Returns:
+        list: 새로 저장된 메시지 레코드
+    """
+    new_messages = []
+
+    # 1단계: 업데이트별 메시지 정보와 첨부 파일 목록 수집 (업데이트 순서 유지)
+    entries = []
+    lazy_specs = []
+    budget = ByteBudget(MAX_BATCH_BYTES)
+    semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+
+    for update in updates:
+        # 이미 수집된 업데이트 (체크포인트 갱신 전 중단 후 재시작)
+        if checkpoint is not None and checkpoint.is_ingested(update.update_id):
+            continue
+
+        if not update.message:
+            entries.append({"update": update, "status": "skipped"})
+            continue
+
+        # 이미 저장된 메시지 (웹훅 재전송 등) - 로그는 (chat_id, message_id)로 구분하므로 다른 채팅의 같은 ID는 별개
+        # (폴링은 위의 수집 기록(update_id)으로 이미 걸러짐)
+        if (update.message.chat_id, update.message.message_id) in log:
+            entries.append({"update": update, "status": "skipped"})
+            continue
+
+        msg = update.message
+        user = msg.from_user
+
+        # 허용된 사용자 체크
+        if ALLOWED_USERS and user.id not in ALLOWED_USERS:
+            print(f"⚠️  차단: 허용되지 않은 사용자 {user.id} ({user.first_name})")
+            entries.append({"update": update, "status": "blocked"})
+            continue
+
+        # 텍스트 추출 (caption 또는 text)
+        text = msg.caption or msg.text or ""
+
+        # 🆕 위치 정보 (Location)
+        location_info = None
+        if msg.location:
+            location_info = {
+                "latitude": msg.location.latitude,
+                "longitude": msg.location.longitude
+            }
+
+            # 선택적 정보 (있으면 추가)
+            if hasattr(msg.location, 'horizontal_accuracy') and msg.location.horizontal_accuracy:
+                location_info["accuracy"] = msg.location.horizontal_accuracy
+
+            print(f"📍 위치 수신: 위도 {msg.location.latitude}, 경도 {msg.location.longitude}")
+
+        specs = _collect_attachments(msg)
+
+        # 텍스트나 파일이나 위치가 하나라도 있어야 처리
+        if not text and not specs and not location_info:
+            entries.append({"update": update, "status": "skipped"})
+            continue
+
+        # 다운로드 작업 예약 (예산 예약은 업데이트 순서대로 이루어짐)
+        downloads = []
+        for spec in specs:
+            if LAZY_MEDIA and spec["type"] in LAZY_TYPES:
+                downloads.append(_resolved(_lazy_attachment(spec, msg.message_id)))
+                lazy_specs.append(spec)
+            else:
+                downloads.append(_download_attachment(bot, semaphore, budget, msg.message_id, spec, partition))
+
+        entries.append({
+            "update": update, "status": None, "msg": msg, "user": user,
+            "text": text, "location": location_info, "downloads": downloads
+        })
+
+    # 2단계: 모든 첨부 파일 다운로드 시작 (semaphore로 동시 실행 수 제한)
+    for entry in entries:
+        if entry["status"] is None:
+            entry["task"] = asyncio.ensure_future(asyncio.gather(*entry["downloads"]))
+
+    # 3단계: 업데이트 순서대로 저장 (앨범은 하나의 레코드로 합침)
+    try:
+        for entry in entries:
+            update = entry["update"]
+
+            if entry["status"] is not None:
+                if checkpoint is not None:
+                    checkpoint.commit(update.update_id, entry["status"])
                 continue
 
-            # 텍스트 추출 (caption 또는 text)
-            text = msg.caption or msg.text or ""
-
-            # 파일 다운로드
-            files = []
-
-            # 사진 (여러 장 가능 - 가장 큰 크기 선택)
-            if msg.photo:
-                # photo는 여러 크기의 배열 - 마지막이 가장 큼
-                largest_photo = msg.photo[-1]
-                file_path = await download_file(
-                    bot,
-                    largest_photo.file_id,
-                    msg.message_id,
-                    'photo'
-                )
-                if file_path:
-                    files.append({
-                        "type": "photo",
-                        "path": file_path,
-                        "size": largest_photo.file_size
-                    })
-
-            # 문서 (PDF, DOCX, 등)
-            if msg.document:
-                file_path = await download_file(
-                    bot,
-                    msg.document.file_id,
-                    msg.message_id,
-                    'document',
-                    msg.document.file_name
-                )
-                if file_path:
-                    files.append({
-                        "type": "document",
-                        "path": file_path,
-                        "name": msg.document.file_name,
-                        "mime_type": msg.document.mime_type,
-                        "size": msg.document.file_size
-                    })
-
-            # 비디오
-            if msg.video:
-                file_path = await download_file(
-                    bot,
-                    msg.video.file_id,
-                    msg.message_id,
-                    'video'
-                )
-                if file_path:
-                    files.append({
-                        "type": "video",
-                        "path": file_path,
-                        "duration": msg.video.duration,
-                        "size": msg.video.file_size
-                    })
-
-            # 오디오
-            if msg.audio:
-                file_path = await download_file(
-                    bot,
-                    msg.audio.file_id,
-                    msg.message_id,
-                    'audio',
-                    msg.audio.file_name
-                )
-                if file_path:
-                    files.append({
-                        "type": "audio",
-                        "path": file_path,
-                        "duration": msg.audio.duration,
-                        "size": msg.audio.file_size
-                    })
-
-            # 음성 메시지
-            if msg.voice:
-                file_path = await download_file(
-                    bot,
-                    msg.voice.file_id,
-                    msg.message_id,
-                    'voice'
-                )
-                if file_path:
-                    files.append({
-                        "type": "voice",
-                        "path": file_path,
-                        "duration": msg.voice.duration,
-                        "size": msg.voice.file_size
-                    })
-
-            # 🆕 위치 정보 (Location)
-            location_info = None
-            if msg.location:
-                location_info = {
-                    "latitude": msg.location.latitude,
-                    "longitude": msg.location.longitude
-                }
-
-                # 선택적 정보 (있으면 추가)
-                if hasattr(msg.location, 'horizontal_accuracy') and msg.location.horizontal_accuracy:
-                    location_info["accuracy"] = msg.location.horizontal_accuracy
-
-                print(f"📍 위치 수신: 위도 {msg.location.latitude}, 경도 {msg.location.longitude}")
-
-            # 텍스트나 파일이나 위치가 하나라도 있어야 처리
+            msg, user, text, location_info = entry["msg"], entry["user"], entry["text"], entry["location"]
+            files = [f for f in await entry["task"] if f]
+
+            # 다운로드가 모두 실패했고 텍스트/위치도 없으면 건너뜀
             if not text and not files and not location_info:
+                if checkpoint is not None:
+                    checkpoint.commit(update.update_id, "skipped")
                 continue
 
             # 메시지 데이터 구성
@@ -302,32 +582,137 @@ async def fetch_new_messages():
                 "timestamp": msg.date.strftime("%Y-%m-%d %H:%M:%S"),
                 "processed": False
             }
+            if partition != DEFAULT_PARTITION:
+                message_data["bot"] = partition  # 🆕 수신한 봇 (응답 시 같은 봇 사용)
+
+            # 🆕 앨범(media_group_id): 먼저 저장된 대표 레코드에 파일/캡션 합치기
+            # (대표 레코드는 로그의 media_group_id 색인으로 찾으므로 재시작 후에도 같은 앨범에 합쳐짐)
+            group_id = msg.media_group_id
+            leader = log.media_group_leader(group_id) if group_id else None
+
+            if leader is not None and msg.message_id in leader.get("grouped_message_ids", []):
+                # 이미 합친 사진 (합친 뒤 체크포인트 전에 중단되어 다시 받은 업데이트)
+                status, stored_id = "merged", leader["message_id"]
+            elif leader is not None:
+                merged = dict(leader, files=list(leader["files"]),
+                              grouped_message_ids=list(leader.get("grouped_message_ids", [])))
+                _merge_media_group(merged, message_data)
+                log.update(message_key(leader), text=merged["text"], files=merged["files"],
+                           grouped_message_ids=merged["grouped_message_ids"])
+                status, stored_id = "merged", leader["message_id"]
+            else:
+                if group_id:
+                    message_data["media_group_id"] = group_id
+                    message_data["grouped_message_ids"] = [msg.message_id]
 
-            new_messages.append(message_data)
-            data["messages"].append(message_data)
+                # 새 메시지만 로그에 추가 (기존 기록 전체를 다시 쓰지 않음)
+                log.append(message_data)
+                new_messages.append(message_data)
+                status, stored_id = "stored", msg.message_id
 
-            # last_update_id 업데이트
-            if update.update_id > data["last_update_id"]:
-                data["last_update_id"] = update.update_id
+            if checkpoint is not None:
+                checkpoint.commit(update.update_id, status, stored_id)
 
-        if new_messages:
-            save_messages(data)
-            for msg in new_messages:
-                text_preview = msg['text'][:50] if msg['text'] else "(파일만)" if msg['files'] else "(위치)" if msg.get('location') else ""
-                file_info = f" + {len(msg['files'])}개 파일" if msg['files'] else ""
-                location_info = f" + 위치 정보" if msg.get('location') else ""
-                print(f"📨 새 메시지: [{msg['timestamp']}] {msg['first_name']}: {text_preview}...{file_info}{location_info}")
-            return len(new_messages)
+    finally:
+        # 중간 오류 시 남은 다운로드 취소 (다음 폴링에서 체크포인트 이후부터 재시도)
+        for entry in entries:
+            if "task" in entry and not entry["task"].done():
+                entry["task"].cancel()
 
-        return 0
+    if prefetch and lazy_specs:
+        _schedule_prefetch(bot, lazy_specs)
+
+    for msg in new_messages:
+        text_preview = msg['text'][:50] if msg['text'] else "(파일만)" if msg['files'] else "(위치)" if msg.get('location') else ""
+        file_info = f" + {len(msg['files'])}개 파일" if msg['files'] else ""
+        location_info = f" + 위치 정보" if msg.get('location') else ""
+        print(f"📨 새 메시지: [{msg['timestamp']}] {msg['first_name']}: {text_preview}...{file_info}{location_info}")
+
+    return new_messages
+
+
+async def fetch_new_messages(bot=None, timeout=5, stats=None, prefetch=False, poller=None,
+                             partition=DEFAULT_PARTITION):
+    """
+    새로운 메시지 가져오기 (텍스트 + 이미지 + 파일 지원)
+
+    Args:
+        bot: 재사용할 Bot 인스턴스 (None이면 새로 생성)
+        timeout: get_updates long polling 대기 시간 (초)
+        stats: CycleStats (상주 모드 지연 통계, 선택)
+        prefetch: 지연 모드에서 작은 파일을 백그라운드로 미리 받기 (이벤트 루프가 계속 유지되는 상주 모드 전용)
+        poller: AdaptivePoller (결과/오류를 반영하여 다음 폴링 간격 결정, 선택)
+        partition: 봇 파티션 (기본 봇 또는 TELEGRAM_BOT_TOKENS의 봇 이름)
+
+    Returns:
+        int: 새 메시지 수 (오류 시 None)
+    """
+    token = BOT_TOKEN if partition == DEFAULT_PARTITION else get_token(partition)
+    if not token or token in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
+        print(f"❌ 봇 토큰 미설정 ({partition}). 프로그램을 종료합니다.")
+        return None
+
+    if bot is None:
+        # 동시 다운로드를 위해 연결 풀 크기를 동시 실행 수 이상으로 설정
+        bot = Bot(token=token, request=HTTPXRequest(connection_pool_size=max(HTTP_POOL_SIZE, DOWNLOAD_CONCURRENCY)))
+    log = open_message_log(partition)
+    checkpoint = open_checkpoint(partition)
+    # 체크포인트 도입 이전 저장소의 last_update_id도 고려 (이전 버전 호환)
+    offset = checkpoint.next_offset(log.last_update_id)
+
+    try:
+        # 새로운 업데이트 가져오기 (long polling)
+        poll_started = time.perf_counter()
+        updates = await bot.get_updates(
+            offset=offset,
+            timeout=timeout,
+            allowed_updates=["message"]
+        )
+
+        # 앨범이 배치 끝에서 잘렸을 수 있으면 잠시 기다렸다가 나머지까지 다시 받기
+        group_wait = _pending_media_group_wait(updates)
+        if group_wait > 0:
+            await asyncio.sleep(group_wait)
+            updates = await bot.get_updates(
+                offset=offset,
+                timeout=0,
+                allowed_updates=["message"]
+            )
+        process_started = time.perf_counter()
+
+        # 배치 안의 로그/수집 기록/첨부 색인 fsync는 배치 끝에 파일마다 한 번, 체크포인트는 그 뒤에 한 번만 갱신
+        with group_commit():
+            new_messages = await process_updates(
+                bot, updates, log, prefetch=prefetch, checkpoint=checkpoint, partition=partition
+            )
+
+        if stats is not None:
+            stats.record(process_started - poll_started, time.perf_counter() - process_started, len(new_messages))
+        if poller is not None:
+            poller.record_result(len(new_messages))
+
+        return len(new_messages)
 
     except Exception as e:
         print(f"❌ 오류: {e}")
+        if poller is not None:
+            poller.record_error(e)
         return None
 
 
+def _active_partitions():
+    """토큰이 설정된 봇(파티션) 목록"""
+    return [bot["name"] for bot in load_bots()
+            if (BOT_TOKEN if bot["name"] == DEFAULT_PARTITION else bot["token"])]
+
+
+def _poller_for(partition):
+    """봇별 폴링 상태 (polling_stats.json / polling_stats_{봇이름}.json)"""
+    return AdaptivePoller(state_file=partition_file(POLL_STATS_FILE, partition))
+
+
 async def listen_loop():
-    """메시지 수신 루프"""
+    """메시지 수신 루프 (설정된 모든 봇을 차례가 된 것부터 동시에 폴링)"""
     print("=" * 60)
     print("텔레그램 메시지 수집기 시작")
     print("=" * 60)
@@ -336,33 +721,271 @@ async def listen_loop():
     if not setup_bot_token():
         return
 
-    print(f"폴링 간격: {POLLING_INTERVAL}초")
+    partitions = _active_partitions()
+    pollers = {name: _poller_for(name) for name in partitions}
+
+    print(f"폴링 간격: 적응형 (대화 중 짧게, 유휴 시 최대 {POLL_MAX_INTERVAL:.0f}초까지 증가)")
+    print(f"수신 봇: {', '.join(partitions)}")
     print(f"허용된 사용자: {ALLOWED_USERS}")
-    print(f"메시지 저장 파일: {MESSAGES_FILE}")
+    print(f"메시지 저장 위치: {MESSAGES_LOG_DIR}")
     print("\n대기 중... (Ctrl+C로 종료)\n")
 
     cycle_count = 0
 
+    # 오래된 메시지 아카이브 이동 (타이머/크기 기준 - 수집과 별도 스레드)
+    start_background_retention(partitions)
+
     try:
         while True:
             cycle_count += 1
             now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-            result = await fetch_new_messages()
+            due = [name for name in partitions if pollers[name].next_delay() <= 0]
+            results = await asyncio.gather(
+                *(fetch_new_messages(poller=pollers[name], partition=name) for name in due)
+            )
+
+            for name, result in zip(due, results):
+                label = f"#{cycle_count}" if len(partitions) == 1 else f"#{cycle_count} [{name}]"
+                if result is None:
+                    print(f"[{now}] {label} - 오류 발생, 재시도 대기...")
+                elif result > 0:
+                    print(f"[{now}] {label} - ✅ {result}개 메시지 수집")
+                else:
+                    print(f"[{now}] {label} - 대기 중... ({pollers[name].state['last_decision']})")
+
+            await asyncio.sleep(min(poller.next_delay() for poller in pollers.values()))
+
+    except KeyboardInterrupt:
+        print("\n\n종료 신호 감지. 프로그램을 종료합니다.")
+        print("=" * 60)
+
+
+async def _daemon_bot_loop(partition, stats):
+    """봇 1개의 상주 수신 루프 (봇마다 별도 Bot 세션/오프셋/폴링 상태)"""
+    token = BOT_TOKEN if partition == DEFAULT_PARTITION else get_token(partition)
+    poller = _poller_for(partition)
+    prefix = "" if partition == DEFAULT_PARTITION else f"[{partition}] "
+
+    async with create_bot(token) as bot:
+        while True:
+            result = await fetch_new_messages(
+                bot, timeout=LONG_POLL_TIMEOUT, stats=stats, prefetch=True, poller=poller,
+                partition=partition
+            )
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             if result is None:
-                print(f"[{now}] #{cycle_count} - 오류 발생, 재시도 대기...")
+                # 오류 시에만 대기 (RetryAfter/네트워크 장애 - 지터 포함 백오프)
+                print(f"[{now}] {prefix}{poller.state['last_decision']}")
+                await asyncio.sleep(poller.next_delay())
             elif result > 0:
-                print(f"[{now}] #{cycle_count} - ✅ {result}개 메시지 수집")
+                print(f"[{now}] {prefix}✅ {result}개 메시지 수집 | {stats.report()}")
+
+
+async def listen_daemon():
+    """
+    상주 모드 메시지 수신 루프
+
+    봇마다 하나의 Bot 세션(HTTP 연결 풀)을 유지한 채 sleep 없이 long polling을
+    연속 호출하므로 새 메시지가 도착하는 즉시 수집됩니다.
+    여러 봇은 같은 이벤트 루프에서 동시에 long polling 합니다.
+    """
+    print("=" * 60)
+    print("텔레그램 메시지 수집기 시작 (상주 모드)")
+    print("=" * 60)
+
+    if not setup_bot_token():
+        return
+
+    partitions = _active_partitions()
+
+    print(f"Long polling 대기: {LONG_POLL_TIMEOUT}초")
+    print(f"수신 봇: {', '.join(partitions)}")
+    print(f"허용된 사용자: {ALLOWED_USERS}")
+    print(f"메시지 저장 위치: {MESSAGES_LOG_DIR}")
+    print("\n대기 중... (Ctrl+C로 종료)\n")
+
+    stats = {name: CycleStats() for name in partitions}
+
+    # 오래된 로그 세그먼트는 백그라운드에서 압축, 오래된 메시지는 아카이브로 이동
+    for name in partitions:
+        open_message_log(name).start_background_compaction()
+    start_background_retention(partitions)
+
+    try:
+        await asyncio.gather(*(_daemon_bot_loop(name, stats[name]) for name in partitions))
+
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        print("\n\n종료 신호 감지. 프로그램을 종료합니다.")
+        for name in partitions:
+            print(f"📊 {name}: {stats[name].report()}")
+        store_stats = attachment_store.get_store_stats()
+        print(f"📦 첨부 저장소 적중률: {store_stats['hit_rate'] * 100:.1f}% "
+              f"({store_stats['hits']}/{store_stats['hits'] + store_stats['misses']})")
+        print("=" * 60)
+
+
+async def _read_http_request(reader):
+    """
+    HTTP/1.1 요청 하나 읽기 (웹훅 수신용 최소 구현)
+
+    Returns:
+        tuple: (method, path, headers, body)
+    """
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    parts = request_line.split()
+    if len(parts) < 2:
+        raise ValueError(f"잘못된 요청: {request_line!r}")
+    method, target = parts[0].upper(), parts[1]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get("content-length", "0"))
+    if length > WEBHOOK_MAX_BODY:
+        raise ValueError(f"요청 본문이 너무 큽니다: {length} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    return method, target.split("?", 1)[0], headers, body
+
+
+def _write_http_response(writer, status, reason, body=b""):
+    writer.write(
+        f"HTTP/1.1 {status} {reason}\r\n"
+        f"Content-Type: text/plain; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: close\r\n\r\n".encode("latin-1") + body
+    )
+
+
+async def start_webhook_server(bot, host=WEBHOOK_HOST, port=WEBHOOK_PORT, path=WEBHOOK_PATH,
+                               secret=WEBHOOK_SECRET, stats=None, prefetch=False):
+    """
+    웹훅 수신용 asyncio HTTP 서버 시작
+
+    POST {path}로 받은 업데이트 JSON을 폴링과 동일한 process_updates()로
+    처리하고, 메시지 로그에 저장한 뒤 200을 응답합니다. (저장 실패 시 500 →
+    텔레그램이 재전송) 앨범 사진도 도착할 때마다 바로 저장하며, 두 번째 사진부터는
+    로그의 media_group_id 색인으로 찾은 대표 레코드에 합칩니다. (응답 전에 저장되므로
+    재시작해도 사라지지 않음)
+
+    Returns:
+        asyncio.Server
+    """
+    # 업데이트를 도착 순서대로 저장하기 위한 직렬화
+    lock = asyncio.Lock()
+
+    async def store(updates):
+        async with lock:
+            started = time.perf_counter()
+            with group_commit():
+                new_messages = await process_updates(bot, updates, open_message_log(), prefetch=prefetch)
+            if stats is not None:
+                stats.record(0.0, time.perf_counter() - started, len(new_messages))
+
+    async def handle(reader, writer):
+        try:
+            method, target, headers, body = await asyncio.wait_for(_read_http_request(reader), timeout=10)
+
+            if target != path:
+                _write_http_response(writer, 404, "Not Found")
+            elif method != "POST":
+                _write_http_response(writer, 405, "Method Not Allowed")
+            elif secret and headers.get("x-telegram-bot-api-secret-token") != secret:
+                print("⚠️  웹훅 비밀 토큰 불일치 - 요청 거부")
+                _write_http_response(writer, 403, "Forbidden")
             else:
-                print(f"[{now}] #{cycle_count} - 대기 중...")
+                update = Update.de_json(json.loads(body), bot)
+                await store([update])
+                _write_http_response(writer, 200, "OK", b"OK")
 
-            await asyncio.sleep(POLLING_INTERVAL)
+        except (ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            print(f"⚠️  웹훅 잘못된 요청: {e}")
+            _write_http_response(writer, 400, "Bad Request")
+        except Exception as e:
+            print(f"❌ 웹훅 처리 오류: {e}")
+            _write_http_response(writer, 500, "Internal Server Error")
+        finally:
+            try:
+                await writer.drain()
+                writer.close()
+                await writer.wait_closed()
+            except Exception:
+                pass
 
-    except KeyboardInterrupt:
+    return await asyncio.start_server(handle, host, port)
+
+
+async def listen_webhook(register=True):
+    """
+    웹훅 모드 메시지 수신
+
+    Args:
+        register: 텔레그램에 웹훅 URL 등록 여부 (False면 로컬 서버만 실행 -
+                  기록해 둔 업데이트 JSON을 직접 POST하여 오프라인 테스트 가능)
+    """
+    print("=" * 60)
+    print("텔레그램 메시지 수집기 시작 (웹훅 모드)")
+    print("=" * 60)
+
+    if not setup_bot_token():
+        return
+
+    if register and not WEBHOOK_URL:
+        print("❌ TELEGRAM_WEBHOOK_URL 미설정. (로컬 테스트는 --no-register)")
+        return
+
+    stats = CycleStats()
+    open_message_log().start_background_compaction()
+    start_background_retention([DEFAULT_PARTITION])
+    bot = create_bot()
+
+    try:
+        if register:
+            await bot.initialize()
+            await bot.set_webhook(
+                url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET or None,
+                allowed_updates=["message"],
+                max_connections=1  # 업데이트를 순서대로 받기
+            )
+            print(f"🔗 웹훅 등록: {WEBHOOK_URL}")
+
+        server = await start_webhook_server(bot, stats=stats, prefetch=True)
+        print(f"수신 주소: http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        print(f"허용된 사용자: {ALLOWED_USERS}")
+        print("\n대기 중... (Ctrl+C로 종료)\n")
+
+        async with server:
+            await server.serve_forever()
+
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\n\n종료 신호 감지. 프로그램을 종료합니다.")
+        print(f"📊 {stats.report()}")
         print("=" * 60)
 
+    finally:
+        if register:
+            # 웹훅을 남겨두면 이후 get_updates 폴링이 실패하므로 해제
+            try:
+                await bot.delete_webhook()
+                print("🔗 웹훅 해제")
+            except Exception as e:
+                print(f"⚠️ 웹훅 해제 실패: {e}")
+        # 등록 여부와 관계없이 Bot 세션(HTTP 연결 풀) 정리 - 폴링 경로의 async with와 동일
+        await bot.shutdown()
+
 
 if __name__ == "__main__":
-    asyncio.run(listen_loop())
+    if "--webhook" in sys.argv[1:]:
+        asyncio.run(listen_webhook(register="--no-register" not in sys.argv[1:]))
+    elif "--daemon" in sys.argv[1:]:
+        asyncio.run(listen_daemon())
+    else:
+        asyncio.run(listen_loop())
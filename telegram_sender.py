@@ -14,20 +14,39 @@
 
     # 파일과 함께 전송
     await send_files(chat_id, "메시지 내용", ["파일1.txt", "파일2.png"])
+
+    # 팀별 봇으로 전송 (TELEGRAM_BOT_TOKENS에 설정한 봇 이름)
+    await send_message(chat_id, "메시지 내용", partition="team_a")
 """
 
 import os
+import atexit
 from dotenv import load_dotenv
 from telegram import Bot
 import asyncio
 
+from bot_registry import DEFAULT_PARTITION, get_token
+
 # .env 파일 로드
 load_dotenv()
 
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
 
-async def send_message(chat_id, text, parse_mode="Markdown"):
+def _resolve_token(partition=DEFAULT_PARTITION):
+    """파티션(봇)의 토큰 (미설정 시 안내 출력 후 None)"""
+    token = BOT_TOKEN if not partition or partition == DEFAULT_PARTITION else get_token(partition)
+    if not token or token in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
+        if not partition or partition == DEFAULT_PARTITION:
+            print("❌ TELEGRAM_BOT_TOKEN 미설정.")
+            print("   먼저 'python telegram_listener.py'를 실행하여 토큰을 설정해주세요.")
+        else:
+            print(f"❌ 봇 '{partition}' 토큰 미설정. (TELEGRAM_BOT_TOKENS 확인)")
+        return None
+    return token
+
+
+async def send_message(chat_id, text, parse_mode="Markdown", partition=DEFAULT_PARTITION):
     """
     텔레그램 메시지 전송
 
@@ -35,17 +54,17 @@ async def send_message(chat_id, text, parse_mode="Markdown"):
         chat_id: 채팅 ID (사용자 ID)
         text: 전송할 메시지
         parse_mode: 파싱 모드 (Markdown, HTML, None)
+        partition: 전송할 봇 (메시지를 받은 봇 - 기본 봇이면 생략)
 
     Returns:
         bool: 성공 여부
     """
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print("❌ TELEGRAM_BOT_TOKEN 미설정.")
-        print("   먼저 'python telegram_listener.py'를 실행하여 토큰을 설정해주세요.")
+    token = _resolve_token(partition)
+    if not token:
         return False
 
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = Bot(token=token)
 
         # 텔레그램 메시지 길이 제한 (4096자)
         if len(text) > 4000:
@@ -73,7 +92,7 @@ async def send_message(chat_id, text, parse_mode="Markdown"):
         return False
 
 
-async def send_file(chat_id, file_path, caption=None):
+async def send_file(chat_id, file_path, caption=None, partition=DEFAULT_PARTITION):
     """
     텔레그램 파일 전송
 
@@ -81,13 +100,13 @@ async def send_file(chat_id, file_path, caption=None):
         chat_id: 채팅 ID
         file_path: 파일 경로
         caption: 파일 설명 (선택)
+        partition: 전송할 봇 (기본 봇이면 생략)
 
     Returns:
         bool: 성공 여부
     """
-    if not BOT_TOKEN or BOT_TOKEN in ("your_bot_token_here", "YOUR_BOT_TOKEN"):
-        print("❌ TELEGRAM_BOT_TOKEN 미설정.")
-        print("   먼저 'python telegram_listener.py'를 실행하여 토큰을 설정해주세요.")
+    token = _resolve_token(partition)
+    if not token:
         return False
 
     if not os.path.exists(file_path):
@@ -95,7 +114,7 @@ async def send_file(chat_id, file_path, caption=None):
         return False
 
     try:
-        bot = Bot(token=BOT_TOKEN)
+        bot = Bot(token=token)
 
         # 파일 크기 확인 (텔레그램 제한: 50MB)
         file_size = os.path.getsize(file_path)
@@ -118,7 +137,7 @@ async def send_file(chat_id, file_path, caption=None):
         return False
 
 
-async def send_files(chat_id, text, file_paths):
+async def send_files(chat_id, text, file_paths, partition=DEFAULT_PARTITION):
     """
     텔레그램 메시지 + 여러 파일 전송
 
@@ -126,12 +145,13 @@ async def send_files(chat_id, text, file_paths):
         chat_id: 채팅 ID
         text: 메시지 내용
         file_paths: 파일 경로 리스트
+        partition: 전송할 봇 (기본 봇이면 생략)
 
     Returns:
         bool: 성공 여부
     """
     # 먼저 메시지 전송
-    success = await send_message(chat_id, text)
+    success = await send_message(chat_id, text, partition=partition)
 
     if not success:
         return False
@@ -148,7 +168,7 @@ async def send_files(chat_id, text, file_paths):
         file_name = os.path.basename(file_path)
         print(f"📎 파일 전송 중: {file_name}")
 
-        success = await send_file(chat_id, file_path, caption=f"📎 {file_name}")
+        success = await send_file(chat_id, file_path, caption=f"📎 {file_name}", partition=partition)
 
         if success:
             print(f"✅ 파일 전송 완료: {file_name}")
@@ -171,43 +191,82 @@ def run_async_safe(coro):
         return asyncio.run(coro)
 
 
+_exit_report = None  # 종료 시 새 메시지를 보고할 채팅 (chat_id, parse_mode, partition) - 마지막 전송 기준
+
+
+def _report_new_messages(chat_id, parse_mode, partition):
+    """감시가 찾아 둔 새 메시지를 진행 중 작업에 합치고 저장/알림"""
+    from telegram_bot import claim_new_messages, save_new_instructions
+    from message_watcher import get_watcher
+
+    new_msgs = claim_new_messages(get_watcher().take())
+    if not new_msgs:
+        return
+
+    # 파일에 저장
+    save_new_instructions(new_msgs)
+
+    # 알림 전송
+    alert_text = f"✅ **새로운 요청 {len(new_msgs)}개 확인**\n\n"
+    for i, msg in enumerate(new_msgs, 1):
+        alert_text += f"{i}. {msg['instruction'][:50]}...\n"
+    alert_text += "\n진행 중인 작업에 반영하겠습니다."
+
+    # 재귀 호출 방지 (알림은 활동 갱신만 하고 새 메시지 확인 안 함)
+    run_async_safe(send_message(chat_id, alert_text, parse_mode, partition))
+
+
+def _report_on_exit():
+    """프로세스 종료 시: 진행 중인 확인을 잠시(EXIT_WAIT) 기다린 뒤 찾아 둔 메시지 보고 (못 끝낸 확인은 다음 프로세스가 이어받음)"""
+    from message_watcher import get_watcher
+
+    try:
+        watcher = get_watcher()
+        watcher.wait_idle()
+        if watcher.new_count():
+            _report_new_messages(*_exit_report)
+    except Exception:
+        pass
+
+
 # 동기 함수 래퍼
-def send_message_sync(chat_id, text, parse_mode="Markdown"):
+def send_message_sync(chat_id, text, parse_mode="Markdown", partition=DEFAULT_PARTITION):
     """
     동기 방식 메시지 전송
 
     메시지 전송 시마다:
-    1. working.json의 last_activity 갱신
-    2. 새 메시지 확인 및 저장 (작업 중일 때만)
+    1. 다음 확인 요청 - 폴링은 감시 스레드가 최소 간격(MYBOT_WATCH_INTERVAL, 프로세스 간 공유)마다 한 번만 수행
+       (전송 전에 요청 → 한 번만 전송하고 끝나는 프로세스도 전송과 확인이 함께 진행됨)
+    2. 작업 대기열 임대 연장 (하트비트, 같은 프로세스에서는 몇 초에 한 번)
+    3. 백그라운드 감시(message_watcher)가 찾아 둔 같은 채팅의 새 메시지가 있으면 가져와서 저장/알림
     """
-    result = run_async_safe(send_message(chat_id, text, parse_mode))
+    global _exit_report
+
+    try:
+        from message_watcher import get_watcher
+
+        # 1. 다음 확인 요청 (종료 시에는 진행 중인 확인만 잠시 기다린 뒤 찾아 둔 결과 보고)
+        watcher = get_watcher()
+        if _exit_report is None:
+            atexit.register(_report_on_exit)
+        _exit_report = (chat_id, parse_mode, partition)
+        watcher.poke()
+    except Exception:
+        watcher = None
+
+    result = run_async_safe(send_message(chat_id, text, parse_mode, partition))
 
     # 메시지 전송 성공 시
     if result:
         try:
-            from telegram_bot import (
-                update_working_activity,
-                check_new_messages_during_work,
-                save_new_instructions
-            )
+            from telegram_bot import update_working_activity
 
-            # 1. 활동 시각 갱신
+            # 2. 활동 시각 갱신
             update_working_activity()
 
-            # 2. 🆕 새 메시지 확인
-            new_msgs = check_new_messages_during_work()
-            if new_msgs:
-                # 파일에 저장
-                save_new_instructions(new_msgs)
-
-                # 알림 전송
-                alert_text = f"✅ **새로운 요청 {len(new_msgs)}개 확인**\n\n"
-                for i, msg in enumerate(new_msgs, 1):
-                    alert_text += f"{i}. {msg['instruction'][:50]}...\n"
-                alert_text += "\n진행 중인 작업에 반영하겠습니다."
-
-                # 재귀 호출 방지 (알림은 활동 갱신만 하고 새 메시지 확인 안 함)
-                run_async_safe(send_message(chat_id, alert_text, parse_mode))
+            # 3. 🆕 새 메시지 확인 (메모리의 개수만 읽음)
+            if watcher is not None and watcher.new_count():
+                _report_new_messages(chat_id, parse_mode, partition)
 
         except Exception as e:
             # 갱신 실패해도 메시지 전송 결과에는 영향 없음
@@ -216,9 +275,9 @@ def send_message_sync(chat_id, text, parse_mode="Markdown"):
     return result
 
 
-def send_files_sync(chat_id, text, file_paths):
+def send_files_sync(chat_id, text, file_paths, partition=DEFAULT_PARTITION):
     """동기 방식 파일 전송"""
-    return run_async_safe(send_files(chat_id, text, file_paths))
+    return run_async_safe(send_files(chat_id, text, file_paths, partition))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,66 @@
+"""
+테스트 공통 설정
+
+- 저장소 루트의 모듈(telegram_listener, message_log 등)을 import 할 수 있도록 경로 추가
+- 합성 텔레그램 업데이트 생성 도우미 (네트워크 없이 process_updates 등에 전달)
+- 저장소 복사본 (상태 파일이 모듈 위치 기준이므로 여러 프로세스가 얽힌 테스트는 임시 복사본에서 실행)
+"""
+
+import os
+import sys
+import glob
+import shutil
+import subprocess
+from datetime import datetime, timezone
+
+import pytest
+from telegram import Chat, Message, Update, User
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from message_log import MessageLog  # noqa: E402
+
+
+def make_update(update_id, chat_id, message_id, text, user_id=1000):
+    """텍스트 메시지 하나를 담은 합성 Update"""
+    message = Message(
+        message_id=message_id,
+        date=datetime(2026, 1, 1, tzinfo=timezone.utc),
+        chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        from_user=User(id=user_id, first_name="tester", is_bot=False),
+        text=text,
+    )
+    return Update(update_id=update_id, message=message)
+
+
+@pytest.fixture
+def message_log(tmp_path):
+    """임시 디렉토리의 메시지 로그"""
+    return MessageLog(log_dir=str(tmp_path / "messages"), legacy_file=str(tmp_path / "telegram_messages.json"))
+
+
+class RepoCopy:
+    """임시 디렉토리에 복사한 저장소 (jobs.db, telegram_messages/ 등이 이 안에 생김)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def run(self, code, env=None):
+        """복사본에서 python -c 실행 (봇 토큰 없이 - 네트워크 접근 없음)"""
+        run_env = {k: v for k, v in os.environ.items() if not k.startswith(("TELEGRAM_", "MYBOT_"))}
+        run_env.update(env or {})
+        result = subprocess.run([sys.executable, "-c", code], cwd=self.path, env=run_env,
+                                capture_output=True, text=True, encoding="utf-8", timeout=60)
+        assert result.returncode == 0, result.stdout + result.stderr
+        return result.stdout
+
+
+@pytest.fixture
+def repo_copy(tmp_path):
+    """저장소의 최상위 모듈만 복사한 임시 저장소"""
+    path = tmp_path / "repo"
+    path.mkdir()
+    for module in glob.glob(os.path.join(REPO_DIR, "*.py")):
+        shutil.copy(module, path)
+    return RepoCopy(str(path))
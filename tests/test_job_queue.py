@@ -0,0 +1,30 @@
+"""job_queue - 임대 회수 (한 번 실행하고 끝나는 스크립트가 가져간 작업)"""
+
+import sqlite3
+
+import pytest
+
+LEASE_LIKE_PROCESS_TELEGRAM = """
+from telegram_bot import create_working_lock
+assert create_working_lock([5], "보고서 작성", partition=None, chat_id=111{extra})
+"""
+AGENT_PROGRESS = "from telegram_bot import update_working_activity; update_working_activity()"
+CHECK = "from telegram_bot import check_telegram; check_telegram()"
+
+
+def _jobs(repo_copy):
+    with sqlite3.connect(f"{repo_copy.path}/jobs.db") as conn:
+        return conn.execute("SELECT state, attempts, worker FROM jobs").fetchall()
+
+
+@pytest.mark.parametrize("extra", ["", ", heartbeat=True"], ids=["process_telegram", "dead_owner_recorded"])
+def test_exited_script_lease_not_requeued_while_heartbeat_fresh(repo_copy, extra):
+    # process_telegram.py처럼 작업을 가져가고 프로세스 종료
+    repo_copy.run(LEASE_LIKE_PROCESS_TELEGRAM.format(extra=extra))
+
+    # 에이전트의 경과 보고(하트비트) 후 quick_check처럼 확인
+    repo_copy.run(AGENT_PROGRESS)
+    output = repo_copy.run(CHECK)
+
+    assert "스탈 작업 회수" not in output
+    assert _jobs(repo_copy) == [("running", 0, "default")]
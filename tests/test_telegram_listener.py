@@ -0,0 +1,78 @@
+"""telegram_listener.process_updates - 네트워크 없이 합성 업데이트로 확인"""
+
+import asyncio
+import json
+
+from telegram import Bot
+
+import telegram_listener
+from conftest import make_update
+
+
+def _process(log, updates):
+    return asyncio.run(telegram_listener.process_updates(None, updates, log))
+
+
+def test_same_message_id_in_two_chats_kept_separately(message_log, monkeypatch):
+    monkeypatch.setattr(telegram_listener, "ALLOWED_USERS", [])
+
+    _process(message_log, [make_update(1, 111, 5, "첫 번째 채팅")])
+    message_log.update((111, 5), processed=True)
+
+    # 다른 채팅의 같은 message_id는 새 메시지로 저장 (기존 기록을 덮어쓰지 않음)
+    stored = _process(message_log, [make_update(2, 222, 5, "두 번째 채팅")])
+    assert [(msg["chat_id"], msg["message_id"]) for msg in stored] == [(222, 5)]
+    assert message_log.get((111, 5))["processed"] is True
+    assert message_log.get((111, 5))["text"] == "첫 번째 채팅"
+    assert message_log.get((222, 5))["processed"] is False
+
+    # 첫 채팅 메시지가 다시 전달되어도(웹훅 재전송) 건너뜀 - 처리 완료 표시가 초기화되지 않음
+    assert _process(message_log, [make_update(1, 111, 5, "첫 번째 채팅")]) == []
+    assert message_log.get((111, 5))["processed"] is True
+    assert len(message_log) == 2
+    assert [msg["chat_id"] for msg in message_log.pending_messages()] == [222]
+
+
+def test_webhook_server_stores_synthetic_update(message_log, monkeypatch):
+    monkeypatch.setattr(telegram_listener, "ALLOWED_USERS", [])
+    monkeypatch.setattr(telegram_listener, "open_message_log", lambda partition=None: message_log)
+    body = json.dumps(make_update(7, 111, 42, "웹훅 메시지").to_dict()).encode("utf-8")
+
+    async def post():
+        bot = Bot(token="123456:TEST")
+        server = await telegram_listener.start_webhook_server(bot, host="127.0.0.1", port=0, path="/telegram",
+                                                              secret="")
+        async with server:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /telegram HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                         b"Content-Length: %d\r\n\r\n%s" % (len(body), body))
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+    response = asyncio.run(post())
+    assert response.startswith(b"HTTP/1.1 200")
+    assert message_log.get((111, 42))["text"] == "웹훅 메시지"
+
+
+def test_listen_webhook_without_register_shuts_down_bot(message_log, monkeypatch):
+    events = []
+
+    class FakeBot:
+        async def shutdown(self):
+            events.append("shutdown")
+
+    async def stopped_server(bot, **kwargs):
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(telegram_listener, "setup_bot_token", lambda: True)
+    monkeypatch.setattr(telegram_listener, "create_bot", lambda token=None: FakeBot())
+    monkeypatch.setattr(telegram_listener, "open_message_log", lambda partition=None: message_log)
+    monkeypatch.setattr(message_log, "start_background_compaction", lambda interval=300: None)
+    monkeypatch.setattr(telegram_listener, "start_background_retention", lambda partitions: None)
+    monkeypatch.setattr(telegram_listener, "start_webhook_server", stopped_server)
+
+    asyncio.run(telegram_listener.listen_webhook(register=False))
+    assert events == ["shutdown"]